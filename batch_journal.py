@@ -0,0 +1,181 @@
+"""Crash-safe journal of per-file batch outcomes, for resuming batches.
+
+A batch of thousands of PDFs that dies part way (a bad file, running out
+of memory, the laptop going to sleep) used to lose everything. The journal
+is a JSON Lines file: a header naming the batch's files, then one record
+per file as its outcome is committed - the file's size and modification
+time, its status ('ok', 'duplicate' or 'error') and, when asked to, the
+result itself. Records are flushed and fsync'ed before the caller moves on,
+and a torn last line from a crash mid-write is dropped when the journal is
+read back.
+
+Resuming skips every file recorded as 'ok' or 'duplicate' whose size and
+mtime are unchanged, so restart cost is reading the journal plus the files
+still to do. Files that failed are retried unless the caller asks to keep
+their earlier outcome, since a resume is when transient failures (a file
+still being copied, a worker running out of memory) should get another go.
+Files that were being processed when the batch died have no record and run
+again. A finished batch removes its journal.
+"""
+import json
+import os
+import time
+
+JOURNAL_VERSION = 1
+JOURNAL_DIRECTORY = 'batch_journals'
+# Outcomes that need no further work on resume; 'error' files are retried by default
+DONE_STATUSES = ('ok', 'duplicate')
+# Result fields a journal keeps; tables, timings and stats only matter while the file is processed
+RESULT_FIELDS = ['file', 'content_hash', 'summary', 'services', 'raw_text', 'seconds']
+
+
+def file_identity(path):
+    """(size, mtime in ns) - a changed file is processed again on resume"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class BatchJournal:
+    def __init__(self, path, files, keep_results, done=None):
+        self.path = path
+        self.files = list(files)
+        self.keep_results = keep_results
+        self.done = done or {}  # absolute path -> record
+        self._file = None
+
+    @classmethod
+    def start(cls, path, files, keep_results=True):
+        """Begin a new journal at ``path`` (replacing any old one)"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        journal = cls(path, files, keep_results)
+        header = {'journal': JOURNAL_VERSION, 'started': time.time(), 'keep_results': keep_results,
+                  'files': [os.path.abspath(file_path) for file_path in journal.files]}
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(header) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return journal
+
+    @classmethod
+    def resume(cls, path):
+        """Read the journal at ``path``; None if there is none or it is unreadable"""
+        try:
+            f = open(path, 'r+b')
+        except OSError:
+            return None
+        with f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                return None
+            if not isinstance(header, dict) or header.get('journal') != JOURNAL_VERSION:
+                return None
+
+            done = {}
+            valid_end = f.tell()
+            for line in iter(f.readline, b''):
+                if not line.endswith(b"\n"):
+                    # Torn write from a crash
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                done[record['file']] = record
+                valid_end = f.tell()
+            # Drop the torn tail so new records do not follow a broken line
+            f.truncate(valid_end)
+        return cls(path, header['files'], header.get('keep_results', True), done)
+
+    def is_done(self, file_path, retry_failed=True):
+        record = self.done.get(os.path.abspath(file_path))
+        if record is None or (retry_failed and record['status'] not in DONE_STATUSES):
+            return False
+        try:
+            return record['identity'] == file_identity(file_path)
+        except OSError:
+            # Gone since it was processed: nothing left to do for it
+            return True
+
+    def pending(self, files=None, retry_failed=True):
+        """Files (the batch's, by default) still to process: those without a
+        committed outcome and, with ``retry_failed``, those that failed"""
+        return [file_path for file_path in (self.files if files is None else files)
+                if not self.is_done(file_path, retry_failed)]
+
+    def failed(self, files=None):
+        """Files (the batch's, by default) whose committed outcome is 'error' and that are unchanged since"""
+        failed = []
+        for file_path in (self.files if files is None else files):
+            record = self.done.get(os.path.abspath(file_path))
+            if record is not None and record['status'] == 'error' and self.is_done(file_path, retry_failed=False):
+                failed.append(file_path)
+        return failed
+
+    def results(self):
+        """Results recorded as 'ok' for files still done, in batch order (none unless the journal keeps results)"""
+        results = []
+        for file_path in self.files:
+            record = self.done.get(os.path.abspath(file_path))
+            if record is not None and record['status'] == 'ok' and 'result' in record and self.is_done(file_path):
+                results.append(record['result'])
+        return results
+
+    def record(self, outcomes):
+        """Commit (file_path, status, result) outcomes; durable once this returns"""
+        if not outcomes:
+            return
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        for file_path, status, result in outcomes:
+            key = os.path.abspath(file_path)
+            try:
+                identity = file_identity(file_path)
+            except OSError:
+                identity = None
+            record = {'file': key, 'identity': identity, 'status': status}
+            if self.keep_results and status == 'ok' and result is not None:
+                record['result'] = {field: result.get(field) for field in RESULT_FIELDS}
+            self._file.write(json.dumps(record) + "\n")
+            self.done[key] = record
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def finish(self):
+        """The batch is complete: remove the journal"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def new_journal_path(directory=JOURNAL_DIRECTORY):
+    """A fresh journal file name for a GUI batch"""
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(directory, f"batch_{stamp}.jsonl")
+    n = 1
+    while os.path.exists(path):
+        n += 1
+        path = os.path.join(directory, f"batch_{stamp}_{n}.jsonl")
+    return path
+
+
+def unfinished_journals(directory=JOURNAL_DIRECTORY):
+    """Journals left behind by interrupted GUI batches, oldest first"""
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith('.jsonl'))
+    except OSError:
+        return []
+    journals = []
+    for name in names:
+        journal = BatchJournal.resume(os.path.join(directory, name))
+        if journal is not None:
+            journals.append(journal)
+    return journals
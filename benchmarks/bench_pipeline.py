@@ -0,0 +1,368 @@
+"""Extraction benchmark suite built on the sample invoices (invoice1-4.pdf).
+
+Scenarios, each run in a fresh interpreter so peak RSS is per scenario:
+
+  files      every sample invoice through invoice_pipeline.process_invoice
+             (the ver1.py / invosync path), cache off, --repeat times each;
+             per-stage p50/p95/max from pipeline_stats
+  bbox       the OCR-bbox pipeline from yesinterface (ocr_layout.extract_fields,
+             extract_table) on every page of every sample
+  batch-N    the samples replicated to N documents and run through
+             invoice_pipeline.run_batch on --workers processes, cache off
+
+Every scenario reports wall time, throughput in pages/sec and peak RSS.
+The bbox pipeline needs word boxes: they come from tesseract when it is
+installed and from the PDF text layer otherwise (--bbox-source), so the
+bbox functions can be measured on machines without an OCR engine.
+
+    python benchmarks/bench_pipeline.py                       # files, bbox, batch-100
+    python benchmarks/bench_pipeline.py --batches 100 1000
+    python benchmarks/bench_pipeline.py --save-baseline       # store benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --tolerance 0.15      # compare against it
+
+When a baseline exists the run is compared against it and the script exits
+1 if wall time, stage p50 or peak RSS grew, or pages/sec dropped, by more
+than the tolerance. Baselines are machine-specific; store one per release
+machine rather than sharing it.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from importlib.machinery import SourceFileLoader
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+SAMPLES = [os.path.join(REPO_ROOT, f"invoice{i}.pdf") for i in range(1, 5)]
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, 'benchmarks', 'baseline.json')
+# yesinterface renders at 200 dpi; text-layer boxes are scaled to match
+BBOX_DPI = 200
+# Second-valued metrics that moved by less than this are noise, whatever the ratio
+MIN_DELTA_S = 0.005
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its reaped children, in MB"""
+    try:
+        import resource
+    except ImportError:
+        return _windows_peak_rss_mb(), None
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return own / (1024 * 1024), children / (1024 * 1024)
+
+
+def _windows_peak_rss_mb():
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb)
+    return counters.PeakWorkingSetSize / (1024 * 1024)
+
+
+def benchmark_config():
+    import invoice_pipeline
+
+    config = invoice_pipeline.load_config(os.path.join(REPO_ROOT, invoice_pipeline.CONFIG_FILE))
+    config['use_cache'] = False
+    invoice_pipeline.apply_tesseract_path(config)
+    return config
+
+
+def stage_metrics(batch_stats):
+    """Flatten a BatchStats stage summary into stage.<name>.<stat>_s metrics"""
+    metrics = {}
+    for stage, row in batch_stats.stage_summary().items():
+        for stat in ('p50', 'p95', 'max'):
+            metrics[f"stage.{stage}.{stat}_s"] = row[stat]
+    return metrics
+
+
+def run_files(args):
+    import invoice_pipeline
+    from pipeline_stats import BatchStats
+
+    config = benchmark_config()
+    config['max_workers'] = 1
+    metrics, errors = {}, []
+    overall = BatchStats()
+    pages = 0
+    started = time.perf_counter()
+    for pdf_path in SAMPLES:
+        name = os.path.basename(pdf_path)
+        per_file = BatchStats()
+        for _ in range(args.repeat):
+            try:
+                result = invoice_pipeline.process_invoice(pdf_path, config)
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                break
+            per_file.add_file(result['stats'])
+            overall.add_file(result['stats'])
+            pages += result['stats']['counters']['pages']
+        if per_file.files:
+            seconds = [f['seconds'] for f in per_file.files]
+            metrics[f"{name}.p50_s"] = sorted(seconds)[len(seconds) // 2]
+    metrics['wall_s'] = time.perf_counter() - started
+    metrics['pages_per_s'] = pages / metrics['wall_s'] if metrics['wall_s'] else 0.0
+    metrics.update(stage_metrics(overall))
+    return metrics, errors
+
+
+def load_bbox_module():
+    """Import yesinterface (an extension-less script) as a module"""
+    path = os.path.join(REPO_ROOT, 'yesinterface')
+    loader = SourceFileLoader('yesinterface', path)
+    spec = importlib.util.spec_from_loader('yesinterface', loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+def ocr_words_tesseract(pdf_path, config):
+    """Word boxes for every page the way yesinterface.process_file produces them"""
+    from ocr_layout import ocr_pdf_words
+
+    return ocr_pdf_words(pdf_path, dpi=BBOX_DPI, poppler_path=config.get('poppler_path') or None)
+
+
+def ocr_words_text_layer(pdf_path, max_pages=None):
+    """Word boxes from the PDF text layer, in BBOX_DPI pixels, shaped like merged image_to_data pages"""
+    import pandas as pd
+    import pdfplumber
+    from ocr_layout import merge_pages
+
+    scale = BBOX_DPI / 72.0
+    pages = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages[:max_pages]:
+            rows, line_num, line_top = [], 0, None
+            for word in sorted(page.extract_words(), key=lambda w: (round(w['top']), w['x0'])):
+                if line_top is None or abs(word['top'] - line_top) > 3:
+                    line_num += 1
+                    line_top = word['top']
+                rows.append({
+                    'line_num': line_num, 'left': int(word['x0'] * scale), 'top': int(word['top'] * scale),
+                    'width': int((word['x1'] - word['x0']) * scale),
+                    'height': int((word['bottom'] - word['top']) * scale),
+                    'conf': 96.0, 'text': word['text']
+                })
+            frame = pd.DataFrame(rows, columns=['line_num', 'left', 'top', 'width', 'height', 'conf', 'text'])
+            pages.append((frame, int(page.height * scale)))
+    return merge_pages(pages)
+
+
+def run_bbox(args):
+    import shutil
+    import ocr_layout
+    from pipeline_stats import BatchStats, FileStats
+
+    bbox = load_bbox_module()
+    config = benchmark_config()
+    source = args.bbox_source
+    if source == 'auto':
+        source = 'ocr' if shutil.which(config.get('tesseract_path') or 'tesseract') else 'text-layer'
+
+    metrics, errors = {'bbox_source': source}, []
+    batch = BatchStats()
+    pages = 0
+    started = time.perf_counter()
+    for pdf_path in SAMPLES:
+        name = os.path.basename(pdf_path)
+        for _ in range(args.repeat):
+            stats = FileStats(pdf_path)
+            file_started = time.perf_counter()
+            try:
+                with stats.timed('ocr_words'):
+                    if source == 'ocr':
+                        ocr_df = ocr_words_tesseract(pdf_path, config)
+                    else:
+                        ocr_df = ocr_words_text_layer(pdf_path)
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                break
+            if ocr_df.empty:
+                errors.append(f"{name}: no words ({source})")
+                break
+            with stats.timed('fields'):
+                ocr_layout.extract_fields(ocr_df)
+            with stats.timed('extract_table'):
+                bbox.extract_table(ocr_df)
+            stats.count('pages', int(ocr_df['page_num'].max()))
+            stats.seconds = time.perf_counter() - file_started
+            batch.add_file(stats.as_dict())
+            pages += int(ocr_df['page_num'].max())
+    metrics['wall_s'] = time.perf_counter() - started
+    metrics['pages_per_s'] = pages / metrics['wall_s'] if metrics['wall_s'] else 0.0
+    metrics.update(stage_metrics(batch))
+    return metrics, errors
+
+
+def run_batch_scenario(args, size):
+    import invoice_pipeline
+    from pipeline_stats import BatchStats
+
+    config = benchmark_config()
+    files = [SAMPLES[i % len(SAMPLES)] for i in range(size)]
+    batch = BatchStats()
+    errors = []
+    started = time.perf_counter()
+    for file_path, result, error in invoice_pipeline.run_batch(files, config, args.workers):
+        if error is None:
+            batch.add_file(result['stats'])
+        else:
+            message = f"{os.path.basename(file_path)}: {error}"
+            if message not in errors:
+                errors.append(message)
+    wall = time.perf_counter() - started
+    pages = batch.counter_totals()['pages']
+    metrics = {
+        'documents': size,
+        'failed': size - len(batch.files),
+        'wall_s': wall,
+        'pages_per_s': pages / wall if wall else 0.0
+    }
+    metrics.update(stage_metrics(batch))
+    return metrics, errors
+
+
+def run_scenario(args):
+    """Child side: run one scenario and print its metrics as JSON"""
+    if args.scenario == 'files':
+        metrics, errors = run_files(args)
+    elif args.scenario == 'bbox':
+        metrics, errors = run_bbox(args)
+    else:
+        metrics, errors = run_batch_scenario(args, int(args.scenario.split('-', 1)[1]))
+    own_mb, children_mb = peak_rss_mb()
+    metrics['peak_rss_mb'] = own_mb
+    if children_mb is not None and args.scenario.startswith('batch-') and args.workers > 1:
+        metrics['peak_worker_rss_mb'] = children_mb
+    print(json.dumps({'metrics': metrics, 'errors': errors}), flush=True)
+
+
+def spawn_scenario(name, args):
+    cmd = [sys.executable, os.path.abspath(__file__), '--scenario', name,
+           '--repeat', str(args.repeat), '--workers', str(args.workers), '--bbox-source', args.bbox_source]
+    proc = subprocess.run(cmd, cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True)
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return {'metrics': {}, 'errors': [f"scenario exited with code {proc.returncode}"]}
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of results against a baseline, as printable lines"""
+    regressions = []
+    for scenario, run in results.items():
+        base = baseline.get(scenario, {}).get('metrics', {})
+        for key, value in run['metrics'].items():
+            old = base.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            if key.endswith('_per_s'):
+                if value < old * (1 - tolerance):
+                    regressions.append(f"{scenario} {key}: {old:.2f} -> {value:.2f}")
+            elif key.endswith('_s'):
+                if value > old * (1 + tolerance) and value - old > MIN_DELTA_S:
+                    regressions.append(f"{scenario} {key}: {old:.4f}s -> {value:.4f}s")
+            elif key.endswith('_mb'):
+                if value > old * (1 + tolerance):
+                    regressions.append(f"{scenario} {key}: {old:.0f} MB -> {value:.0f} MB")
+    return regressions
+
+
+def print_report(results):
+    for scenario, run in results.items():
+        metrics = run['metrics']
+        headline = f"{scenario:<12} wall {metrics.get('wall_s', 0):8.2f}s"
+        headline += f"  {metrics.get('pages_per_s', 0):8.1f} pages/s"
+        headline += f"  peak RSS {metrics.get('peak_rss_mb', 0):6.0f} MB"
+        if 'peak_worker_rss_mb' in metrics:
+            headline += f" (worker {metrics['peak_worker_rss_mb']:.0f} MB)"
+        print(headline)
+        for key in sorted(k for k in metrics if k.startswith('stage.') and k.endswith('.p50_s')):
+            stage = key[len('stage.'):-len('.p50_s')]
+            print(f"    {stage:<18} p50 {metrics[key] * 1000:9.2f} ms"
+                  f"  p95 {metrics[f'stage.{stage}.p95_s'] * 1000:9.2f} ms")
+        for error in run['errors']:
+            print(f"    error: {error.splitlines()[0]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the extraction pipelines on the sample invoices")
+    parser.add_argument('--scenarios', nargs='+', default=['files', 'bbox', 'batches'],
+                        help="Any of files, bbox, batches")
+    parser.add_argument('--batches', nargs='+', type=int, default=[100],
+                        help="Replicated batch sizes (e.g. 100 1000)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per sample in the files and bbox scenarios")
+    parser.add_argument('--bbox-source', choices=['auto', 'ocr', 'text-layer'], default='auto')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown before failing (0.2 = 20%%)")
+    parser.add_argument('--output', help="Also write the full results as JSON")
+    parser.add_argument('--scenario', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.scenario:
+        run_scenario(args)
+        return 0
+
+    names = []
+    for scenario in args.scenarios:
+        if scenario == 'batches':
+            names.extend(f"batch-{size}" for size in args.batches)
+        else:
+            names.append(scenario)
+
+    results = {name: spawn_scenario(name, args) for name in names}
+    print_report(results)
+
+    report = {
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'cpus': os.cpu_count(), 'workers': args.workers},
+        'scenarios': results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline.get('scenarios', {}), args.tolerance)
+        if regressions:
+            print(f"FAIL: {len(regressions)} regression(s) against {args.baseline}")
+            for line in regressions:
+                print(f"    {line}")
+            return 1
+        print(f"OK: no regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Cold-start benchmark for the ver1.py desktop app.
+
+Launches a fresh interpreter that imports ver1, builds InvoiceProcessorGUI
+and reports once the window has been drawn, then checks the median time
+against a budget. It also fails if any of the heavy extraction/export
+dependencies were imported during startup.
+
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 500
+
+Needs a display (or Xvfb) because it creates a real Tk window.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must stay out of the startup path
+HEAVY_MODULES = ['pandas', 'numpy', 'pdfplumber', 'pytesseract', 'pdf2image', 'PIL', 'openpyxl']
+
+CHILD_SCRIPT = """
+import json, sys
+import ver1
+
+app = ver1.InvoiceProcessorGUI()
+
+def report():
+    app.root.update_idletasks()
+    heavy = [name for name in {heavy!r} if name in sys.modules]
+    print(json.dumps({{'visible': True, 'heavy_modules': heavy}}), flush=True)
+    app.root.destroy()
+
+app.root.after(0, report)
+app.run()
+"""
+
+
+def measure_once():
+    """Seconds from process launch until the window is drawn, plus eagerly loaded heavy modules"""
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-c', CHILD_SCRIPT.format(heavy=HEAVY_MODULES)],
+                            cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True)
+    report = None
+    for line in proc.stdout:
+        if line.startswith('{'):
+            report = json.loads(line)
+            elapsed = time.perf_counter() - started
+            break
+    proc.wait()
+    if report is None:
+        raise RuntimeError(f"GUI did not start (exit code {proc.returncode})")
+    return elapsed, report['heavy_modules']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure ver1.py time-to-window")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=500.0)
+    args = parser.parse_args(argv)
+
+    timings = []
+    heavy = set()
+    for _ in range(args.runs):
+        elapsed, loaded = measure_once()
+        timings.append(elapsed * 1000)
+        heavy.update(loaded)
+
+    median_ms = statistics.median(timings)
+    print(f"Startup: median {median_ms:.0f} ms, min {min(timings):.0f} ms, max {max(timings):.0f} ms "
+          f"over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(sorted(heavy))}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL: startup over budget by {median_ms - args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Table reconstruction benchmark for ocr_layout.extract_table.
+
+Builds synthetic statement-style word frames (a header row, N line items
+of seven words, a footer) shaped like tesseract image_to_data output, and
+times ocr_layout.extract_table against the row-by-row implementation it
+replaced (kept below as extract_table_rowwise). Every frame, and page 1 of
+each sample invoice read from its text layer, must give identical output.
+
+    python benchmarks/bench_table.py                      # 100, 1000, 5000 rows
+    python benchmarks/bench_table.py --rows 20000 --min-speedup 10
+
+Exits 1 if any output differs, or if the speedup on the largest table is
+below --min-speedup.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# x of each column header and of the words under it, in pixels
+COLUMN_X = {'S.No': 40, 'Description': 140, 'Quantity': 900, 'Rate': 1100, 'Amount': 1300}
+LINE_HEIGHT = 30
+
+
+def extract_table_rowwise(ocr_df):
+    """The previous extract_table: one header match per column, iterrows over every word"""
+    from ocr_layout import HEADER_MAP
+
+    items = []
+    all_header_keywords = [item for sublist in HEADER_MAP.values() for item in sublist]
+    header_candidates = ocr_df[ocr_df['text'].str.lower().isin(all_header_keywords)]
+    if header_candidates.empty:
+        return []
+
+    header_line_num = header_candidates['line_num'].mode()[0]
+    header_df = ocr_df[ocr_df['line_num'] == header_line_num]
+
+    column_boundaries = {}
+    sorted_headers = []
+    for col_name, keywords in HEADER_MAP.items():
+        matches = header_df[header_df['text'].str.lower().str.contains('|'.join(keywords))]
+        if not matches.empty:
+            header_pos = matches.iloc[0]
+            column_boundaries[col_name] = {'start': header_pos['left']}
+            sorted_headers.append((header_pos['left'], col_name))
+
+    sorted_headers.sort()
+    for i in range(len(sorted_headers)):
+        _, current_col = sorted_headers[i]
+        if i + 1 < len(sorted_headers):
+            next_x, _ = sorted_headers[i + 1]
+            column_boundaries[current_col]['end'] = next_x - 5
+        else:
+            column_boundaries[current_col]['end'] = ocr_df['left'].max() + 100
+
+    footer_keywords = ['total', 'sub-total', 'subtotal']
+    footer_candidates = ocr_df[ocr_df['text'].str.lower().isin(footer_keywords)]
+
+    table_start_y = header_df['top'].mean()
+    table_end_y = footer_candidates.iloc[0]['top'] if not footer_candidates.empty else ocr_df['top'].max()
+
+    table_content_df = ocr_df[(ocr_df['top'] > table_start_y) & (ocr_df['top'] < table_end_y)]
+
+    for line_num in sorted(table_content_df['line_num'].unique()):
+        line_df = table_content_df[table_content_df['line_num'] == line_num]
+        if line_df.empty or len(line_df) < 2:
+            continue
+
+        row_data = {col: [] for col in HEADER_MAP.keys()}
+        for _, word_data in line_df.iterrows():
+            word_x_center = word_data['left'] + word_data['width'] / 2
+            for col_name, bounds in column_boundaries.items():
+                if 'start' in bounds and 'end' in bounds and bounds['start'] <= word_x_center < bounds['end']:
+                    row_data[col_name].append(word_data['text'])
+                    break
+
+        final_row = {col_name: ' '.join(words) for col_name, words in row_data.items()}
+        if final_row.get('Description of Services') or final_row.get('S.No'):
+            items.append(final_row)
+    return items
+
+
+def statement_frame(rows, seed=0):
+    """Word frame of a statement with ``rows`` line items, in image_to_data's reading order"""
+    import pandas as pd
+
+    rng = random.Random(seed)
+    words = []
+
+    def add(line_num, left, top, text):
+        words.append((line_num, left, top, 8 * len(text), 20, 95.0, text))
+
+    for text, left in COLUMN_X.items():
+        add(1, left, 100, text)
+    for row in range(rows):
+        line_num, top = row + 2, 100 + (row + 1) * LINE_HEIGHT
+        amount = rng.randint(100, 999999)
+        add(line_num, COLUMN_X['S.No'], top, str(row + 1))
+        add(line_num, COLUMN_X['Description'], top, rng.choice(['AMC', 'Service', 'Printer', 'Network']))
+        add(line_num, COLUMN_X['Description'] + 120, top, rng.choice(['support', 'rental', 'charges']))
+        add(line_num, COLUMN_X['Quantity'] + rng.randint(-20, 20), top, f"{rng.randint(1, 9)}.00")
+        add(line_num, COLUMN_X['Quantity'] + 60, top, 'Nos')
+        add(line_num, COLUMN_X['Rate'], top, f"{amount:,}.00")
+        add(line_num, COLUMN_X['Amount'], top, f"{amount:,}.00")
+    add(rows + 2, COLUMN_X['Rate'], 100 + (rows + 1) * LINE_HEIGHT, 'Total')
+    return pd.DataFrame(words, columns=['line_num', 'left', 'top', 'width', 'height', 'conf', 'text'])
+
+
+def best_of(fn, frame, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(frame)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def check_samples():
+    """Sample invoices whose page 1 table differs between the two implementations"""
+    from bench_pipeline import SAMPLES, ocr_words_text_layer
+    from ocr_layout import extract_table
+
+    differing = []
+    for pdf_path in SAMPLES:
+        try:
+            frame = ocr_words_text_layer(pdf_path, max_pages=1)
+        except Exception as e:
+            print(f"    {os.path.basename(pdf_path)}: skipped ({e})")
+            continue
+        if extract_table(frame) != extract_table_rowwise(frame):
+            differing.append(os.path.basename(pdf_path))
+    return differing
+
+
+def main(argv=None):
+    from ocr_layout import extract_table
+
+    parser = argparse.ArgumentParser(description="Benchmark ocr_layout.extract_table against the row-by-row version")
+    parser.add_argument('--rows', nargs='+', type=int, default=[100, 1000, 5000], help="Line items per table")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--min-speedup', type=float, default=10.0,
+                        help="Fail if the largest table is sped up less than this")
+    args = parser.parse_args(argv)
+
+    failed = False
+    speedup = None
+    for rows in args.rows:
+        frame = statement_frame(rows)
+        old_s, old_items = best_of(extract_table_rowwise, frame, args.repeat)
+        new_s, new_items = best_of(extract_table, frame, args.repeat)
+        speedup = old_s / new_s if new_s else float('inf')
+        same = old_items == new_items
+        print(f"{rows:>7} rows {len(frame):>7} words   row-by-row {old_s * 1000:9.1f} ms   "
+              f"vectorized {new_s * 1000:7.1f} ms   {speedup:6.1f}x   {'same output' if same else 'OUTPUT DIFFERS'}")
+        if not same or len(new_items) != rows:
+            failed = True
+
+    differing = check_samples()
+    print(f"Sample invoices: {'output differs for ' + ', '.join(differing) if differing else 'same output'}")
+    if differing:
+        failed = True
+    if speedup is not None and speedup < args.min_speedup:
+        print(f"FAIL: {speedup:.1f}x on {args.rows[-1]} rows is below the required {args.min_speedup:.0f}x")
+        failed = True
+    print("FAIL" if failed else "OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Duplicate-invoice detection at ingest.
+
+Month-end re-drops add the same invoices again and double-count every
+total. DuplicateIndex remembers two keys for every invoice it has seen:
+
+  content   SHA-256 of the PDF bytes - the same file under any name
+  invoice   (invoice no, GSTIN, total amount), normalized - the same invoice
+            re-scanned or re-exported to a different file
+
+Both are dict lookups, so checking a file is O(1) however many invoices are
+indexed; both keys are kept as short digests so hundreds of thousands of
+invoices fit in a few tens of MB. Invoices whose number was not extracted
+only get the content key, since an empty number would make unrelated
+invoices look alike.
+"""
+import hashlib
+import os
+from collections import namedtuple
+
+from invoice_pipeline import SERVICE_COLUMNS
+from invoice_store import parse_scaled
+
+AMOUNT_INDEX = SERVICE_COLUMNS.index('Total Amount')
+
+# ``reason`` is 'same file' or 'same invoice'; ``original`` is the file first seen with that key
+Duplicate = namedtuple('Duplicate', ['file', 'reason', 'original'])
+
+
+def normalize(value):
+    """Upper case with all whitespace removed"""
+    return ''.join(str(value or '').split()).upper()
+
+
+def invoice_key(summary, services):
+    """(invoice no, GSTIN, total in paise) or None if the invoice number is missing"""
+    total = sum(parse_scaled(service[AMOUNT_INDEX]) or 0 for service in services if len(service) > AMOUNT_INDEX)
+    return make_invoice_key(summary.get('Invoice No'), summary.get('GSTIN'), total)
+
+
+def make_invoice_key(invoice_no, gstin, total):
+    """invoice_key from fields already read, e.g. from the invoice database"""
+    invoice_no = normalize(invoice_no)
+    if not invoice_no:
+        return None
+    return invoice_no, normalize(gstin), total
+
+
+class DuplicateIndex:
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.by_content = {}
+        self.by_invoice = {}
+
+    def __len__(self):
+        return len(self.by_content) + len(self.by_invoice)
+
+    def _keys(self, result):
+        return self._digests(result.get('content_hash'), invoice_key(result['summary'], result['services']))
+
+    def _digests(self, content_hash, invoice):
+        # 16 bytes per key: collisions are negligible at this scale (~1e-27 for a million invoices)
+        content = bytes.fromhex(content_hash)[:16] if content_hash else None
+        if invoice is not None:
+            invoice = hashlib.blake2b(repr(invoice).encode('utf-8'), digest_size=16).digest()
+        return content, invoice
+
+    def check(self, result):
+        """Duplicate describing the earlier copy of ``result``, or None if it is new"""
+        return self._check(result, *self._keys(result))
+
+    def _check(self, result, content, invoice):
+        if content is not None and content in self.by_content:
+            return Duplicate(result.get('file', ''), 'same file', self.by_content[content])
+        if invoice is not None and invoice in self.by_invoice:
+            return Duplicate(result.get('file', ''), 'same invoice', self.by_invoice[invoice])
+        return None
+
+    def add(self, result):
+        """Remember ``result``'s keys (the first file seen keeps them)"""
+        self._add(result, *self._keys(result))
+
+    def _add(self, result, content, invoice):
+        file_path = result.get('file', '')
+        if content is not None:
+            self.by_content.setdefault(content, file_path)
+        if invoice is not None:
+            self.by_invoice.setdefault(invoice, file_path)
+
+    def add_saved(self, file_path, content_hash, invoice_no, gstin, total):
+        """Remember a saved invoice from its keys alone (see InvoiceDatabase.iter_duplicate_keys)"""
+        content, invoice = self._digests(content_hash, make_invoice_key(invoice_no, gstin, total))
+        self._add({'file': file_path}, content, invoice)
+
+    def merge_older(self, other):
+        """Take ``other``'s keys, which belong to earlier invoices, over this index's own"""
+        self.by_content.update(other.by_content)
+        self.by_invoice.update(other.by_invoice)
+
+    def check_and_add(self, result):
+        """check(), and add() the result if it is new"""
+        keys = self._keys(result)
+        duplicate = self._check(result, *keys)
+        if duplicate is None:
+            self._add(result, *keys)
+        return duplicate
+
+
+def describe_duplicates(duplicates, limit=10):
+    """One line per skipped file, for the batch summary"""
+    lines = [f"{os.path.basename(d.file)}: {d.reason} as {os.path.basename(d.original)}"
+             for d in duplicates[:limit]]
+    if len(duplicates) > limit:
+        lines.append(f"...and {len(duplicates) - limit} more")
+    return "\n".join(lines)
+
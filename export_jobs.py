@@ -0,0 +1,124 @@
+"""Background export queue.
+
+Exports used to run on the Tk main thread, so the window froze while a
+large workbook was written. ExportQueue runs them one at a time on a worker
+thread instead; any number can be queued while one is running. Each job's
+sheets must already be a snapshot (InvoiceStore's sheet methods take one)
+because the GUI keeps adding invoices while the job runs.
+
+Nothing here touches tkinter: ``notify(job)`` is called from the worker
+thread whenever a job changes, and the GUI forwards that to its main loop
+with root.after.
+"""
+import itertools
+import queue
+import threading
+
+import export_writers
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+class ExportJob:
+    def __init__(self, job_id, label, base_path, fmt, sheets):
+        self.id = job_id
+        self.label = label
+        self.base_path = base_path
+        self.format = fmt
+        self.sheets = sheets
+        self.state = QUEUED
+        self.rows_written = 0
+        counts = [sheet.count for sheet in sheets]
+        self.total_rows = None if None in counts else sum(counts)
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    def fraction(self):
+        """Share of rows written, 0..1 (0 while the total is unknown)"""
+        if self.state == DONE:
+            return 1.0
+        if not self.total_rows:
+            return 0.0
+        return min(1.0, self.rows_written / self.total_rows)
+
+
+class ExportQueue:
+    def __init__(self, notify=None):
+        self.notify = notify or (lambda job: None)
+        self.jobs = []
+        self._ids = itertools.count(1)
+        self._pending = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, label, base_path, fmt, sheets):
+        """Queue an export; returns its ExportJob"""
+        job = ExportJob(next(self._ids), label, base_path, fmt, sheets)
+        with self._lock:
+            self.jobs.append(job)
+            self._pending.put(job)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+        self.notify(job)
+        return job
+
+    def cancel(self, job):
+        """Stop a running job at its next row batch, or drop a queued one"""
+        job.cancel_event.set()
+        if job.state == QUEUED:
+            job.state = CANCELLED
+            self.notify(job)
+
+    def cancel_all(self):
+        for job in self.active():
+            self.cancel(job)
+
+    def active(self):
+        """Jobs queued or running, oldest first"""
+        return [job for job in self.jobs if not job.finished]
+
+    def wait(self, timeout=None):
+        """Block until the worker has finished (or ``timeout`` seconds pass)"""
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def forget_finished(self):
+        self.jobs = [job for job in self.jobs if not job.finished]
+
+    def _run(self):
+        while True:
+            with self._lock:
+                try:
+                    job = self._pending.get_nowait()
+                except queue.Empty:
+                    self._worker = None
+                    return
+            if job.cancel_event.is_set():
+                continue
+            self._execute(job)
+
+    def _execute(self, job):
+        job.state = RUNNING
+        self.notify(job)
+
+        def progress(rows_written, total_rows):
+            job.rows_written = rows_written
+            self.notify(job)
+
+        try:
+            job.result = export_writers.write_export(job.base_path, job.format, job.sheets,
+                                                     progress=progress, cancel=job.cancel_event)
+            job.state = DONE
+        except export_writers.ExportCancelled:
+            job.state = CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.state = FAILED
+        self.notify(job)
@@ -0,0 +1,175 @@
+"""Streaming export writers: Excel, CSV and Parquet.
+
+pd.ExcelWriter with openpyxl builds the whole workbook in memory before it
+saves. These writers take each sheet as an iterable of row tuples and
+write rows as they are produced, so memory stays flat however many line
+items there are:
+
+  xlsx     openpyxl write-only workbook, one worksheet per sheet
+  csv      one UTF-8 (with BOM, so Excel detects it) file per sheet
+  parquet  one file per sheet, written in row groups (needs pyarrow)
+
+write_export returns the files written with their sizes and the elapsed
+time, for the GUI and invosync to report. It can also report progress and
+be cancelled between rows, which export_jobs uses to run exports in the
+background.
+"""
+import csv
+import os
+import time
+from collections import namedtuple
+
+FORMATS = ['xlsx', 'csv', 'parquet']
+FORMAT_LABELS = {'xlsx': 'Excel (.xlsx)', 'csv': 'CSV', 'parquet': 'Parquet'}
+# Rows buffered per Parquet row group
+PARQUET_CHUNK_ROWS = 50000
+# Rows written between progress reports / cancellation checks
+PROGRESS_EVERY = 2000
+
+# ``rows`` is any iterable of tuples in ``columns`` order; ``int_columns`` are typed as integers in Parquet;
+# ``count`` is the number of rows, when known up front, for progress reporting
+Sheet = namedtuple('Sheet', ['name', 'columns', 'rows', 'int_columns', 'count'], defaults=[(), None])
+ExportResult = namedtuple('ExportResult', ['format', 'files', 'seconds'])
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def write_xlsx(path, sheets):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for sheet in sheets:
+        worksheet = workbook.create_sheet(title=sheet.name[:31])
+        worksheet.append(list(sheet.columns))
+        for row in sheet.rows:
+            worksheet.append(list(row))
+    workbook.save(path)
+    return [path]
+
+
+def write_csv(base_path, sheets):
+    paths = []
+    for sheet in sheets:
+        path = f"{base_path}_{sheet.name}.csv"
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(sheet.columns)
+            writer.writerows(sheet.rows)
+        paths.append(path)
+    return paths
+
+
+def write_parquet(base_path, sheets, chunk_rows=PARQUET_CHUNK_ROWS):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+
+    paths = []
+    for sheet in sheets:
+        path = f"{base_path}_{sheet.name}.parquet"
+        schema = pa.schema([(col, pa.int64() if col in sheet.int_columns else pa.string())
+                            for col in sheet.columns])
+        converters = [_to_int if col in sheet.int_columns else _to_str for col in sheet.columns]
+        with pq.ParquetWriter(path, schema) as writer:
+            chunk = []
+            for row in sheet.rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_rows:
+                    writer.write_table(_parquet_table(pa, schema, converters, chunk))
+                    chunk = []
+            if chunk:
+                writer.write_table(_parquet_table(pa, schema, converters, chunk))
+        paths.append(path)
+    return paths
+
+
+def _parquet_table(pa, schema, converters, rows):
+    columns = [[convert(row[i]) for row in rows] for i, convert in enumerate(converters)]
+    return pa.Table.from_arrays([pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                                schema=schema)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_str(value):
+    return None if value is None else str(value)
+
+
+def export_paths(base_path, fmt, sheets):
+    """Files write_export writes for ``fmt``"""
+    if fmt == 'xlsx':
+        return [base_path + '.xlsx']
+    return [f"{base_path}_{sheet.name}.{fmt}" for sheet in sheets]
+
+
+def write_export(base_path, fmt, sheets, progress=None, cancel=None):
+    """Write ``sheets`` as ``fmt`` next to ``base_path`` (no extension).
+
+    ``progress(rows_written, total_rows)`` is called every PROGRESS_EVERY
+    rows (``total_rows`` is None unless every sheet has a count). When
+    ``cancel`` (a threading.Event) is set, writing stops, partial files are
+    removed and ExportCancelled is raised.
+
+    Returns an ExportResult whose ``files`` is a list of (path, size_bytes).
+    """
+    writers = {'xlsx': lambda: write_xlsx(base_path + '.xlsx', sheets),
+               'csv': lambda: write_csv(base_path, sheets),
+               'parquet': lambda: write_parquet(base_path, sheets)}
+    if fmt not in writers:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if progress is not None or cancel is not None:
+        sheets = _watched(sheets, progress, cancel)
+
+    started = time.perf_counter()
+    try:
+        paths = writers[fmt]()
+    except BaseException:
+        for path in export_paths(base_path, fmt, sheets):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    seconds = time.perf_counter() - started
+    return ExportResult(fmt, [(path, os.path.getsize(path)) for path in paths], seconds)
+
+
+def _watched(sheets, progress, cancel):
+    """Sheets whose rows report progress and check for cancellation as they are consumed"""
+    counts = [sheet.count for sheet in sheets]
+    total = None if None in counts else sum(counts)
+    written = [0]
+
+    def rows(sheet_rows):
+        for row in sheet_rows:
+            written[0] += 1
+            if written[0] % PROGRESS_EVERY == 0:
+                if cancel is not None and cancel.is_set():
+                    raise ExportCancelled()
+                if progress is not None:
+                    progress(written[0], total)
+            yield row
+
+    return [sheet._replace(rows=rows(sheet.rows)) for sheet in sheets]
+
+
+def format_size(size_bytes):
+    for unit in ('B', 'KB', 'MB'):
+        if size_bytes < 1024:
+            return f"{size_bytes:.0f} {unit}" if unit == 'B' else f"{size_bytes:.1f} {unit}"
+        size_bytes /= 1024
+    return f"{size_bytes:.1f} GB"
+
+
+def describe_export(result):
+    """One line per file: path, size, and the format's total write time"""
+    lines = [f"{path} ({format_size(size)})" for path, size in result.files]
+    lines.append(f"{FORMAT_LABELS.get(result.format, result.format)} written in {result.seconds:.2f}s")
+    return "\n".join(lines)
@@ -0,0 +1,142 @@
+"""Precompiled, anchor-windowed field extraction for invoice header fields.
+
+Patterns live in a registry file (field_patterns.json) instead of the code:
+a "default" rule set plus per-vendor rule sets that are switched on when
+one of the vendor's "match" strings appears in the text. Each rule has a
+regex and, optionally, an anchor keyword and a window size. Anchored rules
+are only tried in the ``window`` characters starting at each occurrence of
+their anchor, so a pattern like ``Buyer.*?\\n...`` can no longer backtrack
+across a whole OCR'd document. The text is lowercased once per extraction
+and anchor positions are found with str.find on demand, then shared by
+every rule and field that uses the same anchor.
+
+Rule order per field: vendor rules marked "before_default", then the
+default rules, then the remaining vendor rules. The first rule that matches
+wins, as with the old list-of-patterns extract_field.
+"""
+import hashlib
+import json
+import os
+import re
+
+DEFAULT_REGISTRY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'field_patterns.json')
+
+
+class Rule:
+    def __init__(self, spec):
+        self.pattern = re.compile(spec['pattern'], re.IGNORECASE)
+        self.anchor = spec.get('anchor', '').lower() or None
+        self.window = int(spec.get('window', 200))
+        self.before_default = bool(spec.get('before_default', False))
+
+    def search(self, text, anchors):
+        """Return the first match of this rule, or None"""
+        if self.anchor is None:
+            m = self.pattern.search(text)
+            return _match_value(m)
+        for pos in anchors.positions(self.anchor):
+            m = self.pattern.search(text, pos, pos + self.window)
+            if m:
+                return _match_value(m)
+        return None
+
+
+def _match_value(m):
+    if not m:
+        return None
+    # Return the first group if the pattern has one, else the entire match
+    return (m.group(1) if m.groups() else m.group(0)).strip()
+
+
+class AnchorIndex:
+    """Lazily computed, cached positions of anchor keywords in one text"""
+
+    def __init__(self, text):
+        self.lowered = text.lower()
+        # A few characters change length when lowercased; fall back to a regex scan for those texts
+        self.fallback_text = text if len(self.lowered) != len(text) else None
+        self.cache = {}
+
+    def positions(self, anchor):
+        if anchor not in self.cache:
+            if self.fallback_text is not None:
+                pattern = re.compile('(?=' + re.escape(anchor) + ')', re.IGNORECASE)
+                found = [m.start() for m in pattern.finditer(self.fallback_text)]
+            else:
+                found = []
+                pos = self.lowered.find(anchor)
+                while pos != -1:
+                    found.append(pos)
+                    pos = self.lowered.find(anchor, pos + 1)
+            self.cache[anchor] = found
+        return self.cache[anchor]
+
+
+class FieldEngine:
+    def __init__(self, registry):
+        self.fields = list(registry['fields'])
+        self.default_rules = {field: [Rule(spec) for spec in registry['default'].get(field, [])]
+                              for field in self.fields}
+
+        self.vendors = {}
+        for name, vendor in registry.get('vendors', {}).items():
+            match = re.compile('|'.join(re.escape(m) for m in vendor['match']), re.IGNORECASE)
+            rules = {field: [Rule(spec) for spec in specs] for field, specs in vendor.get('fields', {}).items()}
+            self.vendors[name] = (match, rules)
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_REGISTRY):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def detect_vendors(self, text):
+        """Names of the registry vendors whose match strings occur in the text"""
+        return [name for name, (match, _) in self.vendors.items() if match.search(text)]
+
+    def rules_for(self, field, vendors):
+        """Ordered rules for a field given the detected vendors"""
+        first, last = [], []
+        for name in vendors:
+            for rule in self.vendors[name][1].get(field, []):
+                (first if rule.before_default else last).append(rule)
+        return first + self.default_rules[field] + last
+
+    def extract(self, text):
+        """Extract every registry field from the text. Missing fields are ''"""
+        anchors = AnchorIndex(text)
+        vendors = self.detect_vendors(text)
+        result = {}
+        for field in self.fields:
+            value = None
+            for rule in self.rules_for(field, vendors):
+                value = rule.search(text, anchors)
+                if value is not None:
+                    break
+            result[field] = value or ""
+        return result
+
+
+# path -> (fingerprint, engine)
+_engines = {}
+
+
+def get_engine(path=None):
+    """Load and compile a registry once per process, and again when the file changes"""
+    path = path or DEFAULT_REGISTRY
+    with open(path, 'rb') as f:
+        data = f.read()
+    fingerprint = _fingerprint(data)
+    cached = _engines.get(path)
+    if cached is None or cached[0] != fingerprint:
+        cached = _engines[path] = (fingerprint, FieldEngine(json.loads(data.decode('utf-8'))))
+    return cached[1]
+
+
+def registry_fingerprint(path=None):
+    """Hash of the registry file, so cached results follow pattern edits"""
+    with open(path or DEFAULT_REGISTRY, 'rb') as f:
+        return _fingerprint(f.read())
+
+
+def _fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:16]
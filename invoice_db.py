@@ -0,0 +1,302 @@
+"""Persistent SQLite archive of processed invoices.
+
+Every extraction result is saved here - summary fields, line items and the
+raw text - so closing the app no longer throws the work away and questions
+about past batches do not need the PDFs re-OCR'd. Results are written in
+one transaction per batch. Invoice number, GSTIN, buyer and invoice date
+are indexed (text columns compare case-insensitively, and prefix searches
+are index range scans), and dates are also stored as ISO yyyy-mm-dd for
+range queries.
+
+The GUI does not load the working set up front: it pages invoices in with
+working_set_page as its tables scroll, and a search fetches the saved
+invoices that match it with find_working_set, so filters run in SQLite
+(minimum amounts off their index) rather than over Python lists. Duplicate
+detection only needs each saved invoice's keys, which iter_duplicate_keys
+reads without the line items or text.
+
+"Clear All Data" in the GUI only hides invoices from the working set
+(``cleared = 1``); they stay in the archive for queries.
+
+Only stdlib sqlite3 is used. A connection belongs to the thread that
+opened it, so background readers open their own InvoiceDatabase.
+"""
+import os
+import sqlite3
+from datetime import datetime
+
+from invoice_pipeline import SERVICE_COLUMNS
+from invoice_store import NUMERIC_COLUMNS, parse_scaled
+from table_sort import parse_date
+
+DEFAULT_DATABASE_FILE = 'invoices.db'
+SCHEMA_VERSION = 2
+# Invoices per chunk (or page) when loading the working set
+LOAD_CHUNK = 500
+# Sorts after any text that starts with a given prefix (highest code point)
+PREFIX_END = '\U0010ffff'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    id INTEGER PRIMARY KEY,
+    invoice_no TEXT COLLATE NOCASE,
+    invoice_date TEXT,
+    invoice_day TEXT,
+    buyer TEXT COLLATE NOCASE,
+    gstin TEXT COLLATE NOCASE,
+    line_items_count INTEGER,
+    source_file TEXT,
+    content_hash TEXT,
+    processed_at TEXT,
+    cleared INTEGER NOT NULL DEFAULT 0
+);
+-- Cells are stored untyped, exactly as extracted; *_scaled are parse_scaled values (NULL if unparsed)
+CREATE TABLE IF NOT EXISTS line_items (
+    id INTEGER PRIMARY KEY,
+    invoice_id INTEGER NOT NULL REFERENCES invoices(id) ON DELETE CASCADE,
+    s_no, description, quantity, rate, total_amount,
+    quantity_scaled INTEGER,
+    rate_scaled INTEGER,
+    amount_scaled INTEGER
+);
+CREATE TABLE IF NOT EXISTS raw_texts (
+    invoice_id INTEGER PRIMARY KEY REFERENCES invoices(id) ON DELETE CASCADE,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS invoices_invoice_no ON invoices(invoice_no);
+CREATE INDEX IF NOT EXISTS invoices_gstin ON invoices(gstin);
+CREATE INDEX IF NOT EXISTS invoices_buyer ON invoices(buyer);
+CREATE INDEX IF NOT EXISTS invoices_invoice_day ON invoices(invoice_day);
+CREATE INDEX IF NOT EXISTS line_items_invoice ON line_items(invoice_id);
+CREATE INDEX IF NOT EXISTS line_items_amount ON line_items(amount_scaled);
+"""
+
+SUMMARY_FIELDS = [('Invoice No', 'invoice_no'), ('Invoice Date', 'invoice_date'), ('Buyer', 'buyer'),
+                  ('GSTIN', 'gstin'), ('Line Items Count', 'line_items_count')]
+LINE_ITEM_FIELDS = ['s_no', 'description', 'quantity', 'rate', 'total_amount']
+
+
+def database_path(config):
+    return config.get('database_file') or DEFAULT_DATABASE_FILE
+
+
+def like_pattern(text):
+    """LIKE pattern (with ESCAPE '\\') matching ``text`` anywhere"""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def iso_day(value):
+    """Invoice date as yyyy-mm-dd, or None if it does not parse"""
+    parsed = parse_date(value) if value else None
+    return parsed.strftime('%Y-%m-%d') if parsed else None
+
+
+class InvoiceDatabase:
+    def __init__(self, path=DEFAULT_DATABASE_FILE):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        # WAL lets the working-set loader read while the GUI writes new results
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            # Version 1 databases predate the content hash used for duplicate detection
+            columns = {row['name'] for row in self.conn.execute('PRAGMA table_info(invoices)')}
+            if 'content_hash' not in columns:
+                self.conn.execute('ALTER TABLE invoices ADD COLUMN content_hash TEXT')
+            self.conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+
+    def close(self):
+        self.conn.close()
+
+    # Writing
+
+    def add_results(self, results):
+        """Save extraction results (process_invoice dicts) in one transaction; returns their ids"""
+        processed_at = datetime.now().isoformat(timespec='seconds')
+        ids = []
+        with self.conn:
+            for result in results:
+                summary = result['summary']
+                cursor = self.conn.execute(
+                    "INSERT INTO invoices (invoice_no, invoice_date, invoice_day, buyer, gstin, line_items_count, "
+                    "source_file, content_hash, processed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (summary.get('Invoice No', ''), summary.get('Invoice Date', ''),
+                     iso_day(summary.get('Invoice Date')), summary.get('Buyer', ''), summary.get('GSTIN', ''),
+                     int(summary.get('Line Items Count', len(result['services'])) or 0),
+                     result.get('file', ''), result.get('content_hash'), processed_at))
+                invoice_id = cursor.lastrowid
+                self.conn.executemany(
+                    "INSERT INTO line_items (invoice_id, s_no, description, quantity, rate, total_amount, "
+                    "quantity_scaled, rate_scaled, amount_scaled) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(invoice_id,) + line_item for line_item in map(_line_item_row, result['services'])])
+                self.conn.execute("INSERT INTO raw_texts (invoice_id, text) VALUES (?, ?)",
+                                  (invoice_id, result.get('raw_text', '')))
+                ids.append(invoice_id)
+        return ids
+
+    def clear_working_set(self):
+        """Hide every invoice from the working set; they stay queryable"""
+        with self.conn:
+            self.conn.execute("UPDATE invoices SET cleared = 1 WHERE cleared = 0")
+
+    # Reading
+
+    def working_set_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM invoices WHERE cleared = 0").fetchone()[0]
+
+    def working_set_end(self):
+        """Highest id in the working set (0 if it is empty)"""
+        return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM invoices WHERE cleared = 0").fetchone()[0]
+
+    def working_set_page(self, after_id=0, up_to=None, limit=LOAD_CHUNK):
+        """Up to ``limit`` result dicts with ids in (after_id, up_to], in insertion order.
+
+        Each result is a dict of db_id, file, content_hash, summary and services.
+        """
+        sql = "SELECT * FROM invoices WHERE cleared = 0 AND id > ?"
+        params = [after_id]
+        if up_to is not None:
+            sql += " AND id <= ?"
+            params.append(up_to)
+        sql += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        return self._results(self.conn.execute(sql, params).fetchall())
+
+    def iter_working_set(self, chunk=LOAD_CHUNK):
+        """Yield lists of up to ``chunk`` result dicts (see working_set_page) in insertion order"""
+        last_id = 0
+        while True:
+            results = self.working_set_page(last_id, limit=chunk)
+            if not results:
+                return
+            last_id = results[-1]['db_id']
+            yield results
+
+    def find_working_set(self, after_id=0, up_to=None, invoice_no=None, text=None, line_item_text=None,
+                         min_amount=None):
+        """Working-set invoices with ids in (after_id, up_to] that match every filter, as result dicts.
+
+        ``invoice_no`` is a case-insensitive substring of the invoice number,
+        as in the GUI's in-memory filter. ``text`` is a substring of the
+        summary row (its fields joined by spaces, as the GUI searches them).
+        An invoice matches ``line_item_text``/``min_amount`` when one of its
+        line items contains the text and has a Total Amount of at least
+        ``min_amount`` (in paise) or one that did not parse.
+        """
+        clauses, params = ["cleared = 0", "id > ?"], [after_id]
+        if up_to is not None:
+            clauses.append("id <= ?")
+            params.append(up_to)
+        if invoice_no:
+            clauses.append("invoice_no LIKE ? ESCAPE '\\'")
+            params.append(like_pattern(invoice_no))
+        if text:
+            clauses.append("(IFNULL(invoice_no, '') || ' ' || IFNULL(invoice_date, '') || ' ' || IFNULL(buyer, '') "
+                           "|| ' ' || IFNULL(gstin, '') || ' ' || IFNULL(line_items_count, '')) LIKE ? ESCAPE '\\'")
+            params.append(like_pattern(text))
+        item_clauses, item_params = [], []
+        if line_item_text:
+            item_clauses.append(" || ' ' || ".join(f"IFNULL({field}, '')" for field in LINE_ITEM_FIELDS)
+                                + " LIKE ? ESCAPE '\\'")
+            item_params.append(like_pattern(line_item_text))
+        if min_amount is not None:
+            item_clauses.append("(amount_scaled >= ? OR amount_scaled IS NULL)")
+            item_params.append(min_amount)
+        if item_clauses:
+            clauses.append("id IN (SELECT invoice_id FROM line_items WHERE " + " AND ".join(item_clauses) + ")")
+            params.extend(item_params)
+        sql = "SELECT * FROM invoices WHERE " + " AND ".join(clauses) + " ORDER BY id"
+        return self._results(self.conn.execute(sql, params).fetchall())
+
+    def iter_duplicate_keys(self, chunk=LOAD_CHUNK * 10):
+        """Yield lists of (source file, content hash, invoice no, GSTIN, total in paise) for the working set"""
+        last_id = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, source_file, content_hash, invoice_no, gstin, "
+                "(SELECT COALESCE(SUM(amount_scaled), 0) FROM line_items WHERE invoice_id = invoices.id) "
+                "FROM invoices WHERE cleared = 0 AND id > ? ORDER BY id LIMIT ?", (last_id, chunk)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [tuple(row)[1:] for row in rows]
+
+    def find_invoices(self, invoice_no=None, gstin=None, buyer=None, date_from=None, date_to=None,
+                      exact=False, include_cleared=True, limit=None):
+        """Invoices matching every given filter, newest first, as sqlite3.Rows.
+
+        ``invoice_no``, ``gstin`` and ``buyer`` match case-insensitively, as
+        prefixes unless ``exact``; dates are yyyy-mm-dd bounds, inclusive.
+        Each filter is answered from its index.
+        """
+        clauses, params = [], []
+        for column, value in (('invoice_no', invoice_no), ('gstin', gstin), ('buyer', buyer)):
+            if value and exact:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+            elif value:
+                # A range rather than LIKE 'x%', which SQLite only runs off an index without ESCAPE
+                clauses.append(f"{column} >= ? AND {column} < ?")
+                params.extend([value, value + PREFIX_END])
+        if date_from:
+            clauses.append("invoice_day >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("invoice_day <= ?")
+            params.append(date_to)
+        if not include_cleared:
+            clauses.append("cleared = 0")
+        sql = "SELECT * FROM invoices"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self.conn.execute(sql, params).fetchall()
+
+    def invoice_totals(self, invoice_ids):
+        """{invoice id: (amount_scaled sum, line items, line items whose amount did not parse)}"""
+        totals = {}
+        for start in range(0, len(invoice_ids), 500):
+            ids = list(invoice_ids[start:start + 500])
+            placeholders = ', '.join('?' * len(ids))
+            for row in self.conn.execute(
+                    f"SELECT invoice_id, COALESCE(SUM(amount_scaled), 0), COUNT(*), COUNT(*) - COUNT(amount_scaled) "
+                    f"FROM line_items WHERE invoice_id IN ({placeholders}) GROUP BY invoice_id", ids):
+                totals[row[0]] = (row[1], row[2], row[3])
+        return totals
+
+    def raw_text(self, invoice_id):
+        row = self.conn.execute("SELECT text FROM raw_texts WHERE invoice_id = ?", (invoice_id,)).fetchone()
+        return row[0] if row else None
+
+    def _results(self, rows):
+        """Result dicts for invoice rows, with their line items"""
+        services = {}
+        for start in range(0, len(rows), 500):
+            ids = [row['id'] for row in rows[start:start + 500]]
+            placeholders = ', '.join('?' * len(ids))
+            for item in self.conn.execute(
+                    f"SELECT invoice_id, s_no, description, quantity, rate, total_amount FROM line_items "
+                    f"WHERE invoice_id IN ({placeholders}) ORDER BY id", ids):
+                services.setdefault(item['invoice_id'], []).append([item[field] for field in LINE_ITEM_FIELDS])
+        return [{'db_id': row['id'], 'file': row['source_file'], 'content_hash': row['content_hash'],
+                 'summary': _summary(row), 'services': services.get(row['id'], [])} for row in rows]
+
+
+def _line_item_row(service):
+    width = len(SERVICE_COLUMNS)
+    service = list(service[:width]) + [''] * (width - len(service))
+    scaled = [parse_scaled(service[SERVICE_COLUMNS.index(col)], places) for col, places in NUMERIC_COLUMNS.items()]
+    return tuple(service) + tuple(scaled)
+
+
+def _summary(row):
+    return {name: row[column] for name, column in SUMMARY_FIELDS}
+
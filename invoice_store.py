@@ -0,0 +1,222 @@
+"""Columnar in-memory store for processed invoices.
+
+Every extraction result is written here once, when it arrives, and is the
+single source of truth afterwards: the GUI tables render from it, and the
+exporters stream their rows from it directly. Invoices and line
+items each get a row id (0, 1, 2, ... in arrival order). Line items carry
+their invoice's row id as a foreign key, and each invoice records where its
+(contiguous) line items start, so both directions of the join are O(1).
+
+Text columns are plain lists. Integer columns (line counts, foreign keys)
+are ``array`` columns, so a large batch does not hold one Python int
+object per cell.
+
+Quantity, Rate and Total Amount are also parsed once, as they are stored,
+into exact integers in fixed minor units (paise for money, thousandths for
+quantities) - "4,06,450.00" is 40645000 - with a per-row flag for cells
+that did not parse. Totals and thresholds are integer array operations
+rather than re-parsing text with float() on every use.
+"""
+import re
+from array import array
+
+from export_writers import Sheet
+from invoice_pipeline import SUMMARY_COLUMNS, SERVICE_COLUMNS
+
+# Summary columns held as text; 'Line Items Count' is the integer column line_counts
+SUMMARY_TEXT_COLUMNS = [col for col in SUMMARY_COLUMNS if col != 'Line Items Count']
+
+# Numeric line item columns and the decimal places kept for each
+NUMERIC_COLUMNS = {'Quantity': 3, 'Rate': 2, 'Total Amount': 2}
+
+# First number in a cell: digits with any comma grouping (Indian "4,06,450" or
+# Western "406,450"), optional decimals; currency symbols and units around it are ignored
+NUMBER_RE = re.compile(r"(-)?\s*(\d[\d,]*)(?:\.(\d+))?")
+
+# Range of the integer columns
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def parse_scaled(value, places=2):
+    """Cell as an exact integer count of 10**-places units, or None if it has no number.
+
+    Rounds half up beyond ``places`` decimals: parse_scaled("₹1,200.505") == 120051.
+    Values that do not fit a signed 64-bit integer (the store's array columns
+    and SQLite INTEGER) are None too, like any other cell that does not parse.
+    """
+    if isinstance(value, int):
+        scaled = value * 10 ** places
+    else:
+        m = NUMBER_RE.search(str(value))
+        if not m:
+            return None
+        sign, whole, fraction = m.group(1), m.group(2).replace(',', ''), m.group(3) or ''
+        scaled = int(whole) * 10 ** places + int((fraction + '0' * places)[:places] or 0)
+        if len(fraction) > places and fraction[places] >= '5':
+            scaled += 1
+        if sign:
+            scaled = -scaled
+    return scaled if INT64_MIN <= scaled <= INT64_MAX else None
+
+
+def format_scaled(scaled, places=2):
+    """Exact decimal text for a parse_scaled value, with thousands separators"""
+    whole, fraction = divmod(abs(scaled), 10 ** places)
+    text = f"{whole:,}.{fraction:0{places}d}" if places else f"{whole:,}"
+    return '-' + text if scaled < 0 else text
+
+
+class InvoiceStore:
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.summary = {col: [] for col in SUMMARY_TEXT_COLUMNS}
+        self.line_counts = array('q')
+        self.source_files = []
+        self.first_service = array('q')
+
+        self.services = {col: [] for col in SERVICE_COLUMNS}
+        self.service_invoice = array('q')
+        # Parsed numeric columns (0 where the cell did not parse) and their parse-failure flags
+        self.numbers = {col: array('q') for col in NUMERIC_COLUMNS}
+        self.parse_failed = {col: bytearray() for col in NUMERIC_COLUMNS}
+
+    @property
+    def invoice_count(self):
+        return len(self.line_counts)
+
+    @property
+    def service_count(self):
+        return len(self.service_invoice)
+
+    def add_invoice(self, summary_row, services, source_file=''):
+        """Store one invoice and its line items; returns (invoice_id, range of service ids)"""
+        invoice_id = self.invoice_count
+        for col in SUMMARY_TEXT_COLUMNS:
+            self.summary[col].append(summary_row.get(col, ''))
+        self.line_counts.append(int(summary_row.get('Line Items Count', len(services)) or 0))
+        self.source_files.append(source_file)
+
+        first = self.service_count
+        self.first_service.append(first)
+        width = len(SERVICE_COLUMNS)
+        for service in services:
+            service = list(service[:width]) + [''] * (width - len(service))
+            for col, value in zip(SERVICE_COLUMNS, service):
+                self.services[col].append(value)
+            self.service_invoice.append(invoice_id)
+            for col, places in NUMERIC_COLUMNS.items():
+                scaled = parse_scaled(service[SERVICE_COLUMNS.index(col)], places)
+                self.numbers[col].append(scaled or 0)
+                self.parse_failed[col].append(scaled is None)
+        return invoice_id, range(first, self.service_count)
+
+    # Row access for the views
+
+    def summary_value(self, invoice_id, col):
+        if col == 'Line Items Count':
+            return self.line_counts[invoice_id]
+        return self.summary[col][invoice_id]
+
+    def summary_values(self, invoice_id):
+        """One summary row, in SUMMARY_COLUMNS order"""
+        return tuple(self.summary_value(invoice_id, col) for col in SUMMARY_COLUMNS)
+
+    def service_value(self, service_id, col):
+        return self.services[col][service_id]
+
+    def service_values(self, service_id):
+        """One line item, in SERVICE_COLUMNS order"""
+        return tuple(self.services[col][service_id] for col in SERVICE_COLUMNS)
+
+    def invoice_services(self, invoice_id):
+        """Service ids belonging to an invoice"""
+        first = self.first_service[invoice_id]
+        end = self.first_service[invoice_id + 1] if invoice_id + 1 < self.invoice_count else self.service_count
+        return range(first, end)
+
+    def invoice_of(self, service_id):
+        return self.service_invoice[service_id]
+
+    # Streaming rows for the export writers. The row ids and the column
+    # objects are taken when the sheet is built, so a background export
+    # writes a consistent snapshot: later add_invoice calls only append past
+    # the snapshot, and clear() swaps in new columns rather than emptying these.
+
+    def summary_sheet(self, name, rows=None, with_source=False):
+        """Summary rows (all, or the given invoice ids in order) as an export Sheet"""
+        rows = range(self.invoice_count) if rows is None else rows
+        columns = (['Source File'] if with_source else []) + SUMMARY_COLUMNS
+        sources = [self.summary[col] if col in self.summary else self.line_counts for col in SUMMARY_COLUMNS]
+        if with_source:
+            sources.insert(0, self.source_files)
+        return Sheet(name, columns, _rows(sources, rows), int_columns=('Line Items Count',), count=len(rows))
+
+    def services_sheet(self, name, rows=None, with_invoice=False, with_source=False):
+        """Line items (all, or the given service ids in order) as an export Sheet.
+
+        ``with_invoice``/``with_source`` prepend the owning invoice's number
+        and source file, joined through the foreign key.
+        """
+        rows = range(self.service_count) if rows is None else rows
+        columns = ((['Source File'] if with_source else []) + (['Invoice No'] if with_invoice else [])
+                   + SERVICE_COLUMNS)
+        sources = [self.services[col] for col in SERVICE_COLUMNS]
+        invoice_sources = (([self.source_files] if with_source else [])
+                           + ([self.summary['Invoice No']] if with_invoice else []))
+        if invoice_sources:
+            return Sheet(name, columns, _joined_rows(invoice_sources, self.service_invoice, sources, rows),
+                         count=len(rows))
+        return Sheet(name, columns, _rows(sources, rows), count=len(rows))
+
+    # Numeric columns
+
+    def number_arrays(self, col, rows=None):
+        """(values, failed) numpy arrays of a numeric column, for all rows or the given service ids"""
+        import numpy as np
+
+        # Copies, not buffer views: a live view would stop the arrays from growing
+        values = np.array(self.numbers[col], dtype=np.int64)
+        failed = np.array(self.parse_failed[col], dtype=np.bool_)
+        if rows is not None:
+            index = np.fromiter(rows, dtype=np.int64, count=len(rows))
+            values, failed = values[index], failed[index]
+        return values, failed
+
+    def service_number(self, service_id, col):
+        """Parsed value of a numeric line item cell, or None if it did not parse"""
+        if self.parse_failed[col][service_id]:
+            return None
+        return self.numbers[col][service_id]
+
+    def rows_at_least(self, col, minimum, rows=None):
+        """Row ids (all, or those in ``rows``, in order) whose parsed value is at least ``minimum``.
+
+        Rows whose cell did not parse are kept.
+        """
+        import numpy as np
+
+        values, failed = self.number_arrays(col, rows)
+        keep = failed | (values >= minimum)
+        if rows is None:
+            return np.flatnonzero(keep).tolist()
+        return np.fromiter(rows, dtype=np.int64, count=len(rows))[keep].tolist()
+
+    def column_total(self, col, rows=None):
+        """(sum of the parsed values, rows parsed, rows not parsed) for a numeric column"""
+        values, failed = self.number_arrays(col, rows)
+        failed_count = int(failed.sum())
+        return int(values.sum()), len(values) - failed_count, failed_count
+
+
+def _rows(sources, rows):
+    for row_id in rows:
+        yield tuple(column[row_id] for column in sources)
+
+
+def _joined_rows(invoice_sources, service_invoice, sources, rows):
+    for service_id in rows:
+        invoice_id = service_invoice[service_id]
+        yield (tuple(column[invoice_id] for column in invoice_sources)
+               + tuple(column[service_id] for column in sources))
@@ -0,0 +1,261 @@
+"""Headless command line entry point for the invoice extraction pipeline.
+
+Runs the same extraction as the desktop app (invoice_pipeline) without
+importing tkinter, so it can be scheduled on servers, e.g. from cron:
+
+    python invosync.py batch /data/invoices/2025-02 -o feb.xlsx --workers 8
+
+Writes one consolidated workbook (or per-sheet CSV/Parquet files) plus a
+JSON Lines log with one record per input file. With --save the results also
+go to the invoice database, which ``invosync query`` searches:
+
+    python invosync.py query --gstin 36AAACL4102B --from 2025-02-01
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import invoice_pipeline
+from batch_journal import BatchJournal
+from dedupe import DuplicateIndex, describe_duplicates
+from export_writers import FORMATS, describe_export, write_export
+from invoice_db import InvoiceDatabase, database_path
+from invoice_store import InvoiceStore, format_scaled
+from pipeline_stats import BatchStats, format_stage_table
+
+
+def find_pdfs(directory, recursive=False):
+    """List the PDF files in a directory, sorted by path"""
+    pdf_files = []
+    if recursive:
+        for root, _, names in os.walk(directory):
+            pdf_files.extend(os.path.join(root, name) for name in names if name.lower().endswith('.pdf'))
+    else:
+        pdf_files = [os.path.join(directory, name) for name in os.listdir(directory)
+                     if name.lower().endswith('.pdf') and os.path.isfile(os.path.join(directory, name))]
+    return sorted(pdf_files)
+
+
+def write_workbook(base_path, fmt, results):
+    """Stream the consolidated Summary and Services sheets; returns the ExportResult"""
+    store = InvoiceStore()
+    for result in results:
+        store.add_invoice(result['summary'], result['services'], os.path.basename(result['file']))
+
+    return write_export(base_path, fmt, [
+        store.summary_sheet('Summary', with_source=True),
+        store.services_sheet('Services', with_invoice=True, with_source=True),
+    ])
+
+
+def log_record(file_path, result, error, duplicate=None, skipped=False):
+    """One results-log entry for a processed file"""
+    record = {
+        'file': file_path,
+        'status': 'error' if error is not None else 'duplicate' if skipped else 'ok'
+    }
+    if duplicate is not None:
+        record['duplicate_of'] = duplicate.original
+        record['duplicate_reason'] = duplicate.reason
+    if error is None:
+        record.update({
+            'seconds': round(result['seconds'], 3),
+            'invoice_no': result['summary']['Invoice No'],
+            'invoice_date': result['summary']['Invoice Date'],
+            'buyer': result['summary']['Buyer'],
+            'gstin': result['summary']['GSTIN'],
+            'line_items': result['summary']['Line Items Count'],
+            'cache_hit': result.get('cache_hit', False)
+        })
+    else:
+        record['error'] = str(error)
+    return record
+
+
+def run_batch_command(args):
+    """Handle ``invosync batch``"""
+    if not os.path.isdir(args.directory):
+        print(f"Not a directory: {args.directory}", file=sys.stderr)
+        return 2
+
+    config = invoice_pipeline.load_config(args.config)
+    if args.no_cache:
+        config['use_cache'] = False
+    workers = args.workers or config.get('max_workers') or 1
+
+    files = find_pdfs(args.directory, args.recursive)
+    if not files:
+        print(f"No PDF files found in {args.directory}", file=sys.stderr)
+        return 2
+
+    # --format wins, then the output's extension, then the GUI's export format
+    base_path, ext = os.path.splitext(args.output or f"Batch_Export_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    fmt = args.format or (ext[1:].lower() if ext[1:].lower() in FORMATS else config.get('export_format', 'xlsx'))
+    log_path = args.log or base_path + '.jsonl'
+    stats_path = args.stats or base_path + '.stats.json'
+
+    # An interrupted run with the same output left a journal: carry on from it
+    journal_path = base_path + '.journal.jsonl'
+    journal = None if args.restart else BatchJournal.resume(journal_path)
+    if journal is not None:
+        pending = journal.pending(files, retry_failed=not args.no_retry)
+        resumed = journal.results()
+        # Failures kept from the interrupted run still count against this one
+        earlier_failures = journal.failed(files) if args.no_retry else []
+        print(f"Resuming {journal_path}: {len(files) - len(pending)} of {len(files)} files already done"
+              + (f", {len(earlier_failures)} of them failed" if earlier_failures else ""), file=sys.stderr)
+    else:
+        journal = BatchJournal.start(journal_path, files)
+        pending, resumed, earlier_failures = files, [], []
+
+    database = InvoiceDatabase(args.db or database_path(config)) if args.db is not None or args.save else None
+
+    # Duplicates of files earlier in the batch (or, when saving, already in the database's working set)
+    skip_duplicates = config.get('skip_duplicates', True) and not args.keep_duplicates
+    duplicate_index = DuplicateIndex()
+    if database is not None:
+        for chunk in database.iter_duplicate_keys():
+            for keys in chunk:
+                duplicate_index.add_saved(*keys)
+    for result in resumed:
+        duplicate_index.add(result)
+    duplicates = []
+
+    batch_stats = BatchStats()
+    results = list(resumed)
+    failures = len(earlier_failures)
+    started = time.perf_counter()
+    # A resumed run adds to the log of the interrupted one
+    with open(log_path, 'a' if len(pending) < len(files) else 'w', encoding='utf-8') as log:
+        batch = invoice_pipeline.run_batch(pending, config, workers)
+        for done, (file_path, result, error) in enumerate(batch, start=1):
+            duplicate = duplicate_index.check_and_add(result) if error is None else None
+            if duplicate is not None:
+                duplicates.append(duplicate)
+            skipped = duplicate is not None and skip_duplicates
+            record = log_record(file_path, result, error, duplicate, skipped)
+            log.write(json.dumps(record) + "\n")
+            log.flush()
+            journal.record([(file_path, record['status'], result)])
+
+            if error is None:
+                batch_stats.add_file(result.get('stats'))
+                if not skipped:
+                    results.append(result)
+            else:
+                failures += 1
+                print(f"Error processing {file_path}: {error}", file=sys.stderr)
+            print(f"[{done}/{len(pending)}] {os.path.basename(file_path)}", file=sys.stderr)
+
+    # Keep the workbook in directory order regardless of completion order
+    results.sort(key=lambda r: r['file'])
+    # Export before saving: a failed export leaves the journal open, and the
+    # resumed run would otherwise save the same invoices to the database twice
+    try:
+        export = write_workbook(base_path, fmt, results)
+    except RuntimeError as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        if database is not None:
+            database.close()
+        return 2
+    if database is not None:
+        database.add_results(results)
+        database.close()
+    batch_stats.add_batch_time('export', export.seconds)
+    batch_stats.write_json(stats_path)
+    journal.finish()
+
+    elapsed = time.perf_counter() - started
+    print(format_stage_table(batch_stats.stage_summary()), file=sys.stderr)
+    print(f"Processed {len(pending)} files ({failures - len(earlier_failures)} failed) in {elapsed:.1f}s"
+          + (f", {len(files) - len(pending)} done before resuming" if len(pending) < len(files) else "")
+          + (f" ({len(earlier_failures)} failed)" if earlier_failures else ""),
+          file=sys.stderr)
+    if duplicates:
+        verb = "Skipped" if skip_duplicates else "Kept"
+        print(f"{verb} {len(duplicates)} duplicate invoice(s):\n{describe_duplicates(duplicates)}", file=sys.stderr)
+    print(describe_export(export), file=sys.stderr)
+    print(f"Results log: {log_path}", file=sys.stderr)
+    print(f"Stage timings: {stats_path}", file=sys.stderr)
+    if database is not None:
+        print(f"Saved {len(results)} invoices to {database.path}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def run_query_command(args):
+    """Handle ``invosync query``: look invoices up in the database without re-processing them"""
+    config = invoice_pipeline.load_config(args.config)
+    path = args.db or database_path(config)
+    if not os.path.exists(path):
+        print(f"No invoice database at {path}", file=sys.stderr)
+        return 2
+
+    database = InvoiceDatabase(path)
+    rows = database.find_invoices(invoice_no=args.invoice_no, gstin=args.gstin, buyer=args.buyer,
+                                  date_from=args.date_from, date_to=args.date_to, exact=args.exact,
+                                  limit=args.limit)
+    totals = database.invoice_totals([row['id'] for row in rows])
+    any_unparsed = False
+    for row in rows:
+        total, items, unparsed = totals.get(row['id'], (0, 0, 0))
+        any_unparsed = any_unparsed or unparsed > 0
+        fields = [row['invoice_no'], row['invoice_date'], row['buyer'], row['gstin'], items,
+                  format_scaled(total) + (' *' if unparsed else ''), row['source_file']]
+        # One line per invoice: extracted fields can contain tabs and newlines
+        print("\t".join(' '.join(str(field or '').split()) for field in fields))
+    print(f"{len(rows)} invoice(s)" + ("; * = some amounts could not be read" if any_unparsed else ""),
+          file=sys.stderr)
+    database.close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='invosync', description="Invoice extraction without the GUI")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    batch = subparsers.add_parser('batch', help="Extract every PDF in a directory into one workbook")
+    batch.add_argument('directory', help="Directory containing PDF invoices")
+    batch.add_argument('-o', '--output', help="Output file (default: Batch_Export_<timestamp>.xlsx); "
+                                                 "CSV and Parquet write one <name>_<sheet> file per sheet")
+    batch.add_argument('--format', choices=FORMATS,
+                       help="Output format (default: from the output's extension, else the config)")
+    batch.add_argument('--workers', type=int, help="Worker processes (default: max_workers from the config)")
+    batch.add_argument('--log', help="Per-file results log, JSON Lines (default: next to the workbook)")
+    batch.add_argument('--stats', help="Per-stage timing report, JSON (default: next to the workbook)")
+    batch.add_argument('--config', default=invoice_pipeline.CONFIG_FILE, help="Settings file saved by the GUI")
+    batch.add_argument('--recursive', action='store_true', help="Include PDFs in subdirectories")
+    batch.add_argument('--no-cache', action='store_true', help="Ignore the result cache")
+    batch.add_argument('--restart', action='store_true',
+                       help="Ignore the journal of an interrupted run with the same output and start over")
+    batch.add_argument('--no-retry', action='store_true',
+                       help="When resuming, keep the errors of the interrupted run instead of retrying those files")
+    batch.add_argument('--keep-duplicates', action='store_true',
+                       help="Keep invoices already seen (same file, or same number, GSTIN and total) in the output")
+    batch.add_argument('--save', action='store_true', help="Also save the results to the invoice database")
+    batch.add_argument('--db', help="Invoice database to save to (implies --save; default: from the config)")
+    batch.set_defaults(func=run_batch_command)
+
+    query = subparsers.add_parser('query', help="Look up saved invoices in the invoice database")
+    query.add_argument('--invoice-no', help="Invoice number prefix")
+    query.add_argument('--gstin', help="GSTIN prefix")
+    query.add_argument('--buyer', help="Buyer name prefix")
+    query.add_argument('--from', dest='date_from', help="Earliest invoice date, YYYY-MM-DD")
+    query.add_argument('--to', dest='date_to', help="Latest invoice date, YYYY-MM-DD")
+    query.add_argument('--exact', action='store_true', help="Match invoice number, GSTIN and buyer exactly")
+    query.add_argument('--limit', type=int, default=100, help="Most invoices to list (default: 100, 0 for all)")
+    query.add_argument('--db', help="Invoice database (default: from the config)")
+    query.add_argument('--config', default=invoice_pipeline.CONFIG_FILE, help="Settings file saved by the GUI")
+    query.set_defaults(func=run_query_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
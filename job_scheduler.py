@@ -0,0 +1,326 @@
+"""Central scheduler for file processing jobs.
+
+Every drop (or file selection) becomes one FileJob. Jobs wait in two
+priority lanes: a drop of a few files is interactive and goes ahead of the
+files still waiting in a bulk backfill, so checking one invoice does not mean
+waiting for thousands. A single pool of workers serves both lanes, so two
+drops share the workers instead of running uncoordinated threads.
+
+Backpressure: a file is handed to the pool only when a worker is free, so
+at most ``workers`` files are in flight and the rest wait here as paths.
+The number of waiting files is bounded; submit raises SchedulerFull past it.
+
+Cancellation is cooperative. Cancelling a job drops its waiting files at
+once and sets its cancel events; the task receives one as ``cancel`` so a
+long OCR job can stop between pages by calling check_cancelled. The event
+is made when a file is dispatched, to suit the pool that will run it: a
+threading Event for a thread pool, a multiprocessing manager Event (which
+can be passed to worker processes) for a process pool. A job that spans a
+switch between the two gets one of each.
+
+Nothing here touches tkinter: ``on_result(job, file_path, result, error)``
+and ``on_job(job)`` are called from pool threads, and the GUI forwards them
+to its main loop. A job's on_result calls all return before the on_job call
+that reports it finished.
+"""
+import itertools
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+INTERACTIVE, BULK = 0, 1
+LANE_NAMES = {INTERACTIVE: 'interactive', BULK: 'bulk'}
+# Drops of up to this many files go in the interactive lane
+INTERACTIVE_MAX_FILES = 5
+# Files allowed to wait across all jobs
+MAX_QUEUED_FILES = 100000
+# Dispatch waits averaged for the UI
+WAIT_SAMPLES = 50
+
+QUEUED, RUNNING, DONE, CANCELLED = 'queued', 'running', 'done', 'cancelled'
+
+# Waiting files per lane, files running, pool size, oldest current wait and recent average wait (seconds)
+QueueStats = namedtuple('QueueStats', ['interactive', 'bulk', 'running', 'workers', 'oldest_wait',
+                                       'average_wait', 'completed', 'total'])
+
+
+class SchedulerFull(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    """Raised inside a task whose job was cancelled"""
+
+
+def check_cancelled(cancel):
+    """Raise JobCancelled if ``cancel`` (an Event, or None) is set.
+
+    A manager Event whose manager has shut down (the app is closing) counts
+    as set.
+    """
+    if cancel is None:
+        return
+    try:
+        cancelled = cancel.is_set()
+    except (EOFError, OSError):
+        cancelled = True
+    if cancelled:
+        raise JobCancelled()
+
+
+def lane_for(file_count):
+    return INTERACTIVE if file_count <= INTERACTIVE_MAX_FILES else BULK
+
+
+class FileJob:
+    def __init__(self, job_id, label, files, lane, args, context):
+        self.id = job_id
+        self.label = label
+        self.files = list(files)
+        self.lane = lane
+        self.args = args
+        self.context = context
+        self.state = QUEUED
+        self.submitted = time.monotonic()
+        self.next_file = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        # Checked locally so the scheduler never waits on a manager Event
+        self.cancel_requested = False
+        # Cancel events handed to the pools, keyed by whether the pool runs processes
+        self.cancel_events = {}
+
+    @property
+    def finished(self):
+        return self.state in (DONE, CANCELLED)
+
+    @property
+    def waiting(self):
+        """Files not yet handed to a worker"""
+        return 0 if self.cancel_requested else len(self.files) - self.next_file
+
+    def fraction(self):
+        return (self.completed + self.cancelled) / len(self.files) if self.files else 1.0
+
+
+class JobScheduler:
+    def __init__(self, task, workers=1, use_processes=False, max_queued_files=MAX_QUEUED_FILES,
+                 on_result=None, on_job=None, initializer=None, initargs=()):
+        """``task(file_path, *job.args, cancel=event)`` runs each file; it must be picklable with processes"""
+        self.task = task
+        self.on_result = on_result or (lambda job, file_path, result, error: None)
+        self.on_job = on_job or (lambda job: None)
+        self.jobs = []
+        self._ids = itertools.count(1)
+        self._lanes = {INTERACTIVE: deque(), BULK: deque()}
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._running = 0
+        self._executor = None
+        self._executor_processes = False
+        self._manager = None
+        self._stale = False
+        self._closed = False
+        self._dispatcher = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.configure(workers, use_processes, max_queued_files, initializer, initargs)
+
+    def configure(self, workers, use_processes=False, max_queued_files=MAX_QUEUED_FILES,
+                  initializer=None, initargs=()):
+        """New pool settings; the pool is rebuilt with them once the files in flight finish"""
+        with self._lock:
+            self.workers = max(1, int(workers or 1))
+            self.use_processes = use_processes
+            self.max_queued_files = max_queued_files
+            self.initializer = initializer
+            self.initargs = initargs
+            self._stale = self._executor is not None
+            self._changed.notify_all()
+
+    def submit(self, files, lane=None, label='', args=(), context=None):
+        """Queue a job; returns its FileJob. Raises SchedulerFull if too many files are waiting."""
+        lane = lane_for(len(files)) if lane is None else lane
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Scheduler is shut down")
+            waiting = sum(job.waiting for lane_jobs in self._lanes.values() for job in lane_jobs)
+            if waiting + len(files) > self.max_queued_files:
+                raise SchedulerFull(f"{waiting} files are already waiting (limit {self.max_queued_files})")
+            job = FileJob(next(self._ids), label, files, lane, args, context)
+            self.jobs.append(job)
+            self._lanes[lane].append(job)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+                self._dispatcher.start()
+            self._job_done(job)
+            self._changed.notify_all()
+        self.on_job(job)
+        return job
+
+    def cancel(self, job):
+        """Drop the job's waiting files and ask its running ones to stop"""
+        with self._lock:
+            job.cancel_requested = True
+            events = list(job.cancel_events.values())
+            dropped = len(job.files) - job.next_file
+            job.next_file = len(job.files)
+            job.cancelled += dropped
+            done = self._job_done(job)
+            self._changed.notify_all()
+        for event in events:
+            event.set()
+        if done:
+            self.on_job(job)
+
+    def cancel_all(self):
+        for job in self.active():
+            self.cancel(job)
+
+    def active(self):
+        """Jobs queued or running, oldest first"""
+        return [job for job in self.jobs if not job.finished]
+
+    def forget_finished(self):
+        with self._lock:
+            self.jobs = [job for job in self.jobs if not job.finished]
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            waiting = {lane: [job for job in jobs if job.waiting] for lane, jobs in self._lanes.items()}
+            oldest = min((job.submitted for jobs in waiting.values() for job in jobs), default=None)
+            active = [job for job in self.jobs if not job.finished]
+            return QueueStats(sum(job.waiting for job in waiting[INTERACTIVE]),
+                              sum(job.waiting for job in waiting[BULK]),
+                              self._running, self.workers,
+                              now - oldest if oldest is not None else 0.0,
+                              sum(self._waits) / len(self._waits) if self._waits else 0.0,
+                              sum(job.completed + job.cancelled for job in active),
+                              sum(len(job.files) for job in active))
+
+    def shutdown(self):
+        """Cancel everything and stop the pool without waiting for running files.
+
+        Files still running see their cancel events as set once the manager
+        is gone (see check_cancelled), so they stop as cancelled.
+        """
+        self.cancel_all()
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+            manager, self._manager = self._manager, None
+            self._changed.notify_all()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if manager is not None:
+            manager.shutdown()
+
+    # Internals
+
+    def _cancel_event(self, job, processes):
+        """The job's cancel event for a thread (or process) pool, made on first use"""
+        event = job.cancel_events.get(processes)
+        if event is None:
+            if not processes:
+                event = threading.Event()
+            else:
+                if self._manager is None:
+                    import multiprocessing
+                    self._manager = multiprocessing.Manager()
+                event = self._manager.Event()
+            if job.cancel_requested:
+                event.set()
+            job.cancel_events[processes] = event
+        return event
+
+    def _next_file(self):
+        """(job, file) from the highest-priority lane, oldest job first; None if nothing waits"""
+        for lane in (INTERACTIVE, BULK):
+            jobs = self._lanes[lane]
+            while jobs and not jobs[0].waiting:
+                jobs.popleft()
+            if jobs:
+                job = jobs[0]
+                file_path = job.files[job.next_file]
+                job.next_file += 1
+                return job, file_path
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                while not self._closed and (self._running >= self.workers or not self._has_waiting()):
+                    self._changed.wait()
+                if self._closed:
+                    return
+                if self._stale and self._running == 0:
+                    self._executor.shutdown(wait=False)
+                    self._executor, self._stale = None, False
+                if self._executor is None:
+                    self._executor = self._new_executor()
+                    self._executor_processes = self.use_processes
+                job, file_path = self._next_file()
+                cancel = self._cancel_event(job, self._executor_processes)
+                self._running += 1
+                job.running += 1
+                self._waits.append(time.monotonic() - job.submitted)
+                started = job.state == QUEUED
+                job.state = RUNNING
+                executor = self._executor
+            if started:
+                self.on_job(job)
+            try:
+                future = executor.submit(self.task, file_path, *job.args, cancel=cancel)
+            except RuntimeError as e:
+                # The pool broke or was shut down between taking the file and submitting it
+                self._complete(job, file_path, None, e)
+                continue
+            future.add_done_callback(lambda future, job=job, file_path=file_path:
+                                     self._file_done(job, file_path, future))
+
+    def _has_waiting(self):
+        return any(job.waiting for jobs in self._lanes.values() for job in jobs)
+
+    def _new_executor(self):
+        if self.use_processes:
+            return ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer,
+                                       initargs=self.initargs)
+        return ThreadPoolExecutor(max_workers=self.workers, initializer=self.initializer, initargs=self.initargs)
+
+    def _file_done(self, job, file_path, future):
+        try:
+            result, error = future.result(), None
+        except BaseException as e:
+            result, error = None, e
+        if isinstance(error, BrokenProcessPool):
+            # A worker process died; start a fresh pool for the next file
+            with self._lock:
+                self._stale = True
+        self._complete(job, file_path, result, error)
+
+    def _complete(self, job, file_path, result, error):
+        self.on_result(job, file_path, result, error)
+        with self._lock:
+            self._running -= 1
+            job.running -= 1
+            if isinstance(error, JobCancelled):
+                job.cancelled += 1
+            else:
+                job.completed += 1
+                if error is not None:
+                    job.failed += 1
+            done = self._job_done(job)
+            self._changed.notify_all()
+        if done:
+            self.on_job(job)
+
+    def _job_done(self, job):
+        """Mark the job finished if nothing of it is left; True the one time that happens"""
+        if job.finished or job.running or job.next_file < len(job.files):
+            return False
+        job.state = CANCELLED if job.cancel_requested else DONE
+        return True
@@ -0,0 +1,374 @@
+"""Spatial index over tesseract word boxes, shared by the OCR-bbox scripts.
+
+dashboard, yesinterface and "no interface smart invoce" read invoice fields
+off the ``image_to_data`` word frame: find a label word, then take the
+words to its right on the same line, or the company name below it. Done
+with DataFrame filters, every label lowercased and regex-scanned the whole
+frame, and every neighbourhood query scanned it again.
+
+WordIndex reads the frame once. It keeps the lowercased tokens, maps each
+distinct token to the positions where it occurs (so a label pattern is
+tested once per distinct word, not once per word), and keeps the words
+sorted by vertical centre and by top so same-line and below-label queries
+are bisections. extract_fields resolves every label pattern in one pass
+over the distinct tokens and then answers each field from the index.
+
+Results are the same as the DataFrame version: positions are frame rows
+(the scripts reset the index), and "first match" means the first row.
+
+extract_table rebuilds the line item table under the header row. Every
+word is assigned to a column at once, by searching the sorted column start
+positions, and the words are joined into cells with a single groupby.
+
+Documents are read page by page: ocr_pdf_words OCRs the pages concurrently
+(tesseract runs out of process, so threads are enough) and merge_pages
+stacks their frames as one tall page, with ``page_num`` set, ``top``
+shifted by the height of the pages above and ``line_num`` continued, so
+lines on different pages never mix. extract_table follows a table onto the
+next page, below a repeated header row if the page has one.
+"""
+import os
+import re
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from job_scheduler import check_cancelled
+
+# Words whose vertical centre is within this many pixels of a label's are on its line
+LINE_TOLERANCE = 15
+# How far below the buyer label a company name is looked for, in pixels
+BUYER_SEARCH_HEIGHT = 100
+
+INVOICE_NO_LABELS = ['invoice no']
+INVOICE_DATE_LABELS = ['invoice date', 'ack date', 'date']
+GSTIN_LABELS = ['gstin/uin', 'gstin']
+BUYER_LABELS = ['buyer', 'bill to']
+COMPANY_HINTS = ['ltd', 'limited', 'electronics']
+# Fallback when no invoice number follows a label, e.g. H/AMC/2425/0289
+INVOICE_NO_PATTERN = r'\w+/\w+/\d+/\d+'
+
+# Table columns and the header words that mark them
+HEADER_MAP = {
+    'S.No': ['s.no'], 'Description of Services': ['description'],
+    'Quantity': ['quantity', 'qty'], 'Rate': ['rate'], 'Total Amount': ['amount']
+}
+FOOTER_KEYWORDS = ['total', 'sub-total', 'subtotal']
+# A column ends this many pixels before the next column's header starts
+COLUMN_GAP = 5
+# The last column extends this far past the rightmost word
+LAST_COLUMN_MARGIN = 100
+# Header words a line on a later page needs to count as a repeated header row
+REPEATED_HEADER_MIN_WORDS = 2
+
+OCR_CONFIG = '--psm 6'
+# Columns of pytesseract's image_to_data output
+OCR_COLUMNS = ['level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+               'left', 'top', 'width', 'height', 'conf', 'text']
+
+
+def words_frame(ocr_data, min_conf=40):
+    """image_to_data output as a frame of confident, non-empty words, indexed 0..n-1"""
+    import pandas as pd
+
+    ocr_df = pd.DataFrame(ocr_data)
+    ocr_df.dropna(subset=['text'], inplace=True)
+    ocr_df = ocr_df[ocr_df['conf'].astype(float) > min_conf]
+    ocr_df['text'] = ocr_df['text'].str.strip()
+    ocr_df = ocr_df[ocr_df['text'] != '']
+    return ocr_df.reset_index(drop=True)
+
+
+def ocr_words(image, config=OCR_CONFIG):
+    """Word frame of one page image (a numpy array)"""
+    import pytesseract
+    from pytesseract import Output
+
+    return words_frame(pytesseract.image_to_data(image, config=config, output_type=Output.DICT))
+
+
+def merge_pages(pages):
+    """One word frame from (word frame, page height in pixels) per page, in page order.
+
+    Page 1 is unchanged apart from ``page_num``; later pages are moved below
+    it and their line numbers follow on from the previous page's. No pages
+    give an empty frame with the image_to_data columns.
+    """
+    import pandas as pd
+
+    frames = []
+    top_offset = line_offset = 0
+    for page_number, (frame, height) in enumerate(pages, 1):
+        frame = frame.assign(page_num=page_number, top=frame['top'] + top_offset,
+                             line_num=frame['line_num'] + line_offset)
+        frames.append(frame)
+        top_offset += height
+        if not frame.empty:
+            line_offset = max(line_offset, int(frame['line_num'].max()))
+    if not frames:
+        return pd.DataFrame(columns=OCR_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def ocr_pdf_words(pdf_path, dpi, poppler_path=None, config=OCR_CONFIG, workers=None, cancel=None):
+    """Word frame of every page of a PDF, merged with merge_pages.
+
+    Pages are rendered by iter_pdf_pages and OCR'd on up to ``workers``
+    threads (default: one per CPU). Each page is converted to an array and
+    its PIL image closed before OCR, and no new page is taken while
+    ``workers`` arrays are queued, so memory holds at most ``workers``
+    page arrays plus the rest of the render window iter_pdf_pages is
+    yielding from (bounded by its ``max_memory_mb``). ``cancel`` is
+    checked between pages.
+    """
+    import numpy as np
+    from page_raster import iter_pdf_pages
+
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    pages = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for page_number, page_image in iter_pdf_pages(pdf_path, dpi=dpi, poppler_path=poppler_path):
+            check_cancelled(cancel)
+            image = np.array(page_image)
+            page_image.close()
+            pending[executor.submit(ocr_words, image, config)] = (page_number, image.shape[0])
+            del image
+            if len(pending) >= workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page_number, height = pending.pop(future)
+                    pages[page_number] = (future.result(), height)
+        for future, (page_number, height) in pending.items():
+            pages[page_number] = (future.result(), height)
+    return merge_pages(pages[page_number] for page_number in sorted(pages))
+
+
+class WordIndex:
+    def __init__(self, ocr_df):
+        self.text = ocr_df['text'].astype(str).tolist()
+        self.lower = [text.lower() for text in self.text]
+        self.left = ocr_df['left'].tolist()
+        self.top = ocr_df['top'].tolist()
+        self.width = ocr_df['width'].tolist()
+        self.height = ocr_df['height'].tolist()
+        self.line_num = ocr_df['line_num'].tolist()
+
+        # Distinct token -> positions, in frame order
+        self.positions = {}
+        for position, text in enumerate(self.text):
+            self.positions.setdefault(text, []).append(position)
+        # line_num -> positions, in frame order
+        self.lines = {}
+        for position, line_num in enumerate(self.line_num):
+            self.lines.setdefault(line_num, []).append(position)
+
+        # Positions sorted by vertical centre and by top, with the sorted keys for bisecting
+        centres = [top + height / 2 for top, height in zip(self.top, self.height)]
+        self.by_centre = sorted(range(len(centres)), key=centres.__getitem__)
+        self.centres = [centres[position] for position in self.by_centre]
+        self.by_top = sorted(range(len(self.top)), key=self.top.__getitem__)
+        self.tops = [self.top[position] for position in self.by_top]
+
+        self._matches = {}
+
+    def __len__(self):
+        return len(self.text)
+
+    # Token matching
+
+    def resolve(self, patterns, match=False):
+        """Find the words matching each pattern, in one pass over the distinct tokens.
+
+        Patterns are regexes searched in the lowercased word (like
+        ``str.lower().str.contains``), or with ``match`` matched at its start
+        ignoring case (like ``str.match(case=False)``). Results are cached.
+        """
+        todo = [pattern for pattern in dict.fromkeys(patterns) if (pattern, match) not in self._matches]
+        if not todo:
+            return
+        compiled = [re.compile(pattern, re.IGNORECASE).match if match else re.compile(pattern).search
+                    for pattern in todo]
+        found = [[] for _ in todo]
+        for text, positions in self.positions.items():
+            subject = text if match else self.lower[positions[0]]
+            for test, hits in zip(compiled, found):
+                if test(subject):
+                    hits.extend(positions)
+        for pattern, hits in zip(todo, found):
+            self._matches[pattern, match] = sorted(hits)
+
+    def matches(self, pattern, match=False):
+        """Positions of the words matching ``pattern``, in frame order"""
+        self.resolve([pattern], match)
+        return self._matches[pattern, match]
+
+    def first(self, pattern, match=False):
+        """Position of the first word matching ``pattern``, or None"""
+        hits = self.matches(pattern, match)
+        return hits[0] if hits else None
+
+    # Neighbourhoods
+
+    def right_of(self, position, max_distance):
+        """Words on the same line as ``position`` that start within ``max_distance`` to its right, left to right"""
+        centre = self.top[position] + self.height[position] / 2
+        x_end = self.left[position] + self.width[position]
+        band = self.by_centre[bisect_right(self.centres, centre - LINE_TOLERANCE):
+                              bisect_left(self.centres, centre + LINE_TOLERANCE)]
+        return sorted((p for p in band if x_end < self.left[p] < x_end + max_distance),
+                      key=lambda p: (self.left[p], p))
+
+    def tops_between(self, low, high):
+        """Positions whose top is strictly between ``low`` and ``high``, in frame order"""
+        return sorted(self.by_top[bisect_right(self.tops, low):bisect_left(self.tops, high)])
+
+    def line_text(self, line_num):
+        return ' '.join(self.text[position] for position in self.lines.get(line_num, []))
+
+    # Fields
+
+    def value_nearby(self, label_keywords, max_words=3, max_distance=400):
+        """Up to ``max_words`` words to the right of the first label word on its line, or None"""
+        label = self.first('|'.join(label_keywords))
+        if label is None:
+            return None
+        words = self.right_of(label, max_distance)
+        if not words:
+            return None
+        return ' '.join(self.text[position] for position in words[:max_words]).replace(':', '').strip()
+
+    def buyer(self, company_hints=COMPANY_HINTS):
+        """The line holding the first company-like word just below the buyer label, or None"""
+        label = self.first('|'.join(BUYER_LABELS))
+        if label is None:
+            return None
+        search_top = self.top[label] + self.height[label]
+        area = set(self.tops_between(search_top, search_top + BUYER_SEARCH_HEIGHT))
+        company = next((p for p in self.matches('|'.join(company_hints)) if p in area), None)
+        if company is None:
+            return None
+        return self.line_text(self.line_num[company])
+
+
+def extract_fields(ocr_df):
+    """(invoice no, invoice date, buyer, GSTIN) from a word frame; None for fields not found"""
+    index = WordIndex(ocr_df)
+    index.resolve(['|'.join(labels) for labels in
+                   (INVOICE_NO_LABELS, INVOICE_DATE_LABELS, GSTIN_LABELS, BUYER_LABELS, COMPANY_HINTS)])
+
+    invoice_no = index.value_nearby(INVOICE_NO_LABELS)
+    if not invoice_no:
+        first = index.first(INVOICE_NO_PATTERN, match=True)
+        if first is not None:
+            invoice_no = index.text[first]
+    invoice_date = index.value_nearby(INVOICE_DATE_LABELS)
+    gstin = index.value_nearby(GSTIN_LABELS)
+    buyer = index.buyer()
+    return invoice_no, invoice_date, buyer, gstin
+
+
+def column_bounds(header_df, page_right):
+    """Sorted column names with their start and end x, from the header row's words"""
+    lowered = header_df['text'].str.lower()
+    headers = []
+    for col_name, keywords in HEADER_MAP.items():
+        matches = header_df[lowered.str.contains('|'.join(keywords))]
+        if not matches.empty:
+            headers.append((matches.iloc[0]['left'], col_name))
+    headers.sort()
+    names = [col_name for _, col_name in headers]
+    starts = [left for left, _ in headers]
+    ends = [next_left - COLUMN_GAP for next_left in starts[1:]] + [page_right + LAST_COLUMN_MARGIN]
+    return names, starts, ends
+
+
+def header_line(page_df, lowered, min_words=1):
+    """Words of the page's header row: the line holding the most header words, if it holds ``min_words``"""
+    all_header_keywords = [keyword for keywords in HEADER_MAP.values() for keyword in keywords]
+    header_candidates = page_df[lowered.isin(all_header_keywords)]
+    if header_candidates.empty:
+        return None
+    header_line_num = header_candidates['line_num'].mode()[0]
+    if (header_candidates['line_num'] == header_line_num).sum() < min_words:
+        return None
+    return page_df[page_df['line_num'] == header_line_num]
+
+
+def split_pages(ocr_df):
+    """Word frame of each page, in page order (the whole frame if it has no ``page_num``)"""
+    if 'page_num' not in ocr_df or ocr_df['page_num'].nunique() < 2:
+        return [ocr_df]
+    return [page_df for _, page_df in ocr_df.groupby('page_num', sort=True)]
+
+
+def extract_table(ocr_df):
+    """Line items (dicts keyed by the HEADER_MAP columns) between the header row and the footer.
+
+    The table starts under the first header row and ends at the first
+    footer word below it. A page without a footer continues the table on
+    the next page, from its top or from under its header row if it repeats
+    one; a page that repeats the header row also continues a table whose
+    previous page ended with a (page) total. Each page's columns come from
+    its own header row, or the last one seen.
+    """
+    items = []
+    page_right = ocr_df['left'].max()
+    pages = split_pages(ocr_df)
+    columns = None
+    ended = False
+    for number, page_df in enumerate(pages, 1):
+        lowered = page_df['text'].str.lower()
+        header_df = header_line(page_df, lowered, 1 if columns is None else REPEATED_HEADER_MIN_WORDS)
+        if header_df is None and (columns is None or ended):
+            if columns is None:
+                continue
+            break
+        if header_df is not None:
+            columns = column_bounds(header_df, page_right)
+            table_start_y = header_df['top'].mean()
+        else:
+            table_start_y = page_df['top'].min() - 1
+
+        footer_candidates = page_df[lowered.isin(FOOTER_KEYWORDS) & (page_df['top'] > table_start_y)]
+        ended = not footer_candidates.empty
+        if ended:
+            table_end_y = footer_candidates.iloc[0]['top']
+        elif number == len(pages):
+            table_end_y = page_df['top'].max()
+        else:
+            table_end_y = page_df['top'].max() + 1
+        content = page_df[(page_df['top'] > table_start_y) & (page_df['top'] < table_end_y)]
+        items.extend(table_rows(content, *columns))
+    return items
+
+
+def table_rows(content, names, starts, ends):
+    """Rows of the table words in ``content``, in line order.
+
+    Rows are OCR lines with at least two words; a word belongs to the
+    column whose [start, end) holds its horizontal centre, and rows without
+    an S.No or description are dropped.
+    """
+    import numpy as np
+
+    # Lines of one word are not rows
+    line_sizes = content.groupby('line_num')['text'].transform('size')
+    content = content[line_sizes.to_numpy() >= 2]
+    if content.empty or not names:
+        return []
+
+    # Column of every word at once: the last start at or before its centre, if the centre is before that column's end
+    centres = (content['left'] + content['width'] / 2).to_numpy()
+    column = np.searchsorted(np.asarray(starts), centres, side='right') - 1
+    inside = column >= 0
+    inside[inside] = centres[inside] < np.asarray(ends)[column[inside]]
+    words = content[inside].assign(column=column[inside])
+
+    # One groupby joins every cell: summing "word " strings keeps the words' frame order and runs
+    # in pandas rather than calling ' '.join per cell; the trailing space is then cut off
+    cells = (words['text'].astype(object) + ' ').groupby([words['line_num'], words['column']], sort=True).sum()
+    cells = cells.str[:-1]
+    rows = {}
+    for (line_num, col), text in cells.items():
+        rows.setdefault(line_num, dict.fromkeys(HEADER_MAP, ''))[names[col]] = text
+    return [row for row in rows.values() if row['Description of Services'] or row['S.No']]
@@ -0,0 +1,91 @@
+"""Bounded-memory page rasterization for the OCR paths.
+
+convert_from_path on a whole document renders every page up front and keeps
+them all in memory as PIL images; a long scanned contract at 300 dpi runs
+into gigabytes. iter_pdf_pages renders a small window of pages at a time,
+sized so the window stays under a memory ceiling, and drops its own
+reference to each page as soon as it has been handed out.
+"""
+import re
+
+DEFAULT_DPI = 300
+# Peak memory allowed for rendered pages held by one iterator
+DEFAULT_MAX_MEMORY_MB = 256
+# Used when pdfinfo does not report a page size (A4 in points)
+DEFAULT_PAGE_SIZE_PTS = (595.0, 842.0)
+
+
+def pdf_info(pdf_path, poppler_path=None):
+    """Return (page_count, (width_pts, height_pts)) for a PDF"""
+    from pdf2image import pdfinfo_from_path
+
+    info = pdfinfo_from_path(pdf_path, poppler_path=poppler_path)
+    page_size = DEFAULT_PAGE_SIZE_PTS
+    m = re.match(r"\s*([\d.]+)\s*x\s*([\d.]+)", str(info.get('Page size', '')))
+    if m:
+        page_size = (float(m.group(1)), float(m.group(2)))
+    return int(info['Pages']), page_size
+
+
+def estimate_page_bytes(page_size, dpi=DEFAULT_DPI, grayscale=True):
+    """Approximate decoded size of one rendered page"""
+    width_px = page_size[0] / 72 * dpi
+    height_px = page_size[1] / 72 * dpi
+    return int(width_px * height_px * (1 if grayscale else 3))
+
+
+def window_size(page_bytes, max_memory_mb=DEFAULT_MAX_MEMORY_MB):
+    """How many pages can be rendered together under the memory ceiling"""
+    return max(1, int(max_memory_mb * 1024 * 1024 // max(1, page_bytes)))
+
+
+def _page_runs(page_numbers, window):
+    """Split page numbers into consecutive runs no longer than ``window``"""
+    run = []
+    for page_number in page_numbers:
+        if run and (page_number != run[-1] + 1 or len(run) >= window):
+            yield run[0], run[-1]
+            run = []
+        run.append(page_number)
+    if run:
+        yield run[0], run[-1]
+
+
+def iter_pdf_pages(pdf_path, page_numbers=None, dpi=DEFAULT_DPI, poppler_path=None, grayscale=True,
+                   max_memory_mb=DEFAULT_MAX_MEMORY_MB):
+    """Yield (page_number, image) for the requested 1-based pages of a PDF.
+
+    Pages are rendered in windows of consecutive pages that fit within
+    ``max_memory_mb``. The iterator keeps no reference to a page once it has
+    been yielded, so the image is freed as soon as the caller is done with
+    it (callers should close() it after OCR). Grayscale rendering is the
+    default because tesseract does not need colour and it is a third of
+    the size.
+    """
+    from pdf2image import convert_from_path
+
+    page_count, page_size = pdf_info(pdf_path, poppler_path)
+    if page_numbers is None:
+        page_numbers = range(1, page_count + 1)
+    page_numbers = sorted(n for n in set(page_numbers) if 1 <= n <= page_count)
+
+    window = window_size(estimate_page_bytes(page_size, dpi, grayscale), max_memory_mb)
+    for first_page, last_page in _page_runs(page_numbers, window):
+        images = convert_from_path(pdf_path, dpi=dpi, poppler_path=poppler_path, grayscale=grayscale,
+                                   first_page=first_page, last_page=last_page)
+        for offset in range(len(images)):
+            image = images[offset]
+            images[offset] = None
+            yield first_page + offset, image
+            del image
+
+
+def render_page(pdf_path, page_number=1, dpi=DEFAULT_DPI, poppler_path=None, grayscale=True):
+    """Render a single 1-based page of a PDF"""
+    from pdf2image import convert_from_path
+
+    images = convert_from_path(pdf_path, dpi=dpi, poppler_path=poppler_path, grayscale=grayscale,
+                               first_page=page_number, last_page=page_number)
+    if not images:
+        raise ValueError(f"Page {page_number} not found in {pdf_path}")
+    return images[0]
@@ -0,0 +1,130 @@
+"""Per-stage timers and counters for the extraction pipeline.
+
+FileStats records how long each stage took for one file plus a few
+counters; it travels back from worker processes as a plain dict
+(as_dict). BatchStats collects those dicts for a batch and reports
+p50/p95/max per stage, which the GUI shows in its Diagnostics tab and both
+the GUI and invosync can write out as JSON.
+"""
+import json
+import time
+from contextlib import contextmanager
+
+# Stages in pipeline order; 'export' is timed per batch, not per file
+STAGES = ['hash', 'cache_lookup', 'pdf_text', 'tables', 'render', 'ocr', 'parse_fields', 'parse_services', 'export']
+COUNTERS = ['pages', 'ocr_pages', 'bytes_read', 'cache_hits']
+
+
+class FileStats:
+    def __init__(self, file_path):
+        self.file = file_path
+        self.seconds = 0.0
+        self.stages = {}
+        self.counters = {name: 0 for name in COUNTERS}
+
+    def add_time(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def timed(self, stage):
+        """Time a block and add it to ``stage``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def as_dict(self):
+        return {'file': self.file, 'seconds': self.seconds, 'stages': dict(self.stages),
+                'counters': dict(self.counters)}
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile (q in 0..100) of a non-empty list"""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * q / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class BatchStats:
+    def __init__(self):
+        self.files = []
+        self.batch_stages = {}
+        self.started = time.time()
+
+    def add_file(self, file_stats):
+        """Add a FileStats.as_dict() result"""
+        if file_stats:
+            self.files.append(file_stats)
+
+    def add_batch_time(self, stage, seconds):
+        """Record a stage that runs once per batch (e.g. the Excel write)"""
+        self.batch_stages.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def timed(self, stage):
+        """Time a once-per-batch block and record it under ``stage``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_batch_time(stage, time.perf_counter() - start)
+
+    def stage_summary(self):
+        """{stage: {count, total, p50, p95, max}} over the files that ran the stage"""
+        samples = {}
+        for file_stats in self.files:
+            for stage, seconds in file_stats['stages'].items():
+                samples.setdefault(stage, []).append(seconds)
+        for stage, values in self.batch_stages.items():
+            samples.setdefault(stage, []).extend(values)
+
+        summary = {}
+        for stage in STAGES + sorted(set(samples) - set(STAGES)):
+            values = samples.get(stage)
+            if not values:
+                continue
+            summary[stage] = {
+                'count': len(values),
+                'total': sum(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'max': max(values)
+            }
+        return summary
+
+    def counter_totals(self):
+        totals = {name: 0 for name in COUNTERS}
+        for file_stats in self.files:
+            for name, value in file_stats['counters'].items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def as_dict(self):
+        return {
+            'started': self.started,
+            'file_count': len(self.files),
+            'stages': self.stage_summary(),
+            'counters': self.counter_totals(),
+            'files': self.files
+        }
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+
+def format_stage_table(stage_summary):
+    """Plain-text table of a stage summary, for logs and the console"""
+    lines = [f"{'Stage':<16}{'Count':>7}{'Total s':>10}{'p50 s':>9}{'p95 s':>9}{'Max s':>9}"]
+    for stage, row in stage_summary.items():
+        lines.append(f"{stage:<16}{row['count']:>7}{row['total']:>10.3f}{row['p50']:>9.3f}"
+                     f"{row['p95']:>9.3f}{row['max']:>9.3f}")
+    return "\n".join(lines)
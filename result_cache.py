@@ -0,0 +1,128 @@
+"""Content-addressed on-disk cache for extraction results.
+
+Entries are keyed by the SHA-256 of the PDF bytes plus the extractor
+version and the OCR settings that influence the output, so renaming or
+re-dropping a file still hits while a settings change misses. Each entry is
+one JSON file; its modification time doubles as the LRU stamp and the
+least recently used entries are evicted once the directory grows past the
+size limit. Writes go through a temp file and os.replace so several worker
+processes can share one cache directory.
+
+The directory is scanned once when the cache opens; after that each write
+adds its size to a running total and the directory is only scanned again
+when that total passes the limit, or every RESCAN_EVERY writes to pick up
+entries written by other processes.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+DEFAULT_CACHE_DIRECTORY = 'invoice_cache'
+DEFAULT_MAX_MB = 512
+# Re-read the directory size after this many writes even if under the limit
+RESCAN_EVERY = 64
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hash a file's contents without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIRECTORY, max_mb=DEFAULT_MAX_MB):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(self.directory, exist_ok=True)
+        self._total = self.size_bytes()
+        self._writes_since_scan = 0
+
+    def make_key(self, content_hash, version, settings):
+        """Combine a file hash with everything else that changes the output"""
+        fingerprint = json.dumps({'version': version, 'settings': settings}, sort_keys=True)
+        return hashlib.sha256(f"{content_hash}:{fingerprint}".encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached entry or None, refreshing its LRU stamp on a hit"""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, entry):
+        """Store an entry atomically and evict old ones if over the limit"""
+        path = self._entry_path(key)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            written = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._total += written - replaced
+        self._writes_since_scan += 1
+        if self._total > self.max_bytes or self._writes_since_scan >= RESCAN_EVERY:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if item.name.endswith('.json') and item.is_file():
+                    try:
+                        stat = item.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its size limit"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        self._writes_since_scan = 0
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        self._total = total
+
+    def size_bytes(self):
+        """Total size of all cached entries"""
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        """Delete every cached entry"""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._total = self.size_bytes()
+        self._writes_since_scan = 0
@@ -0,0 +1,82 @@
+"""Precomputed search index for the summary and services tables.
+
+Each row's searchable text is lowercased once, when the row is added, and
+kept per field (e.g. the whole row, or just the invoice number). A query is
+a set of substrings per field plus an optional extra predicate. When every
+substring extends the one from the previous query and the predicate is
+unchanged - the usual case while typing - only the previous matches (and
+rows added since) are re-checked instead of the whole table. Rows added
+while a filter is active are checked on their own with query_added.
+"""
+
+
+class SearchIndex:
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self.texts = {field: [] for field in self.fields}
+        self._last = None
+
+    def __len__(self):
+        return len(self.texts[self.fields[0]])
+
+    def add(self, **texts):
+        """Index one row; returns its row id (0, 1, 2, ... in insertion order)"""
+        for field in self.fields:
+            self.texts[field].append(str(texts.get(field, '')).lower())
+        return len(self) - 1
+
+    def clear(self):
+        for field in self.fields:
+            self.texts[field] = []
+        self._last = None
+
+    def query(self, terms, predicate=None, predicate_key=None):
+        """Row ids, in insertion order, whose fields contain every term.
+
+        ``terms`` maps field -> substring (matched case-insensitively; empty
+        terms match everything). ``predicate(row_id)`` can reject further
+        rows; ``predicate_key`` must change whenever the predicate does, so
+        narrowing is only used when it is safe.
+        """
+        terms = {field: (text or '').lower() for field, text in terms.items() if text}
+        row_count = len(self)
+
+        candidates = None
+        if self._last is not None:
+            last_terms, last_key, _, last_count, last_rows = self._last
+            narrowing = (last_key == predicate_key and set(last_terms) <= set(terms) and
+                         all(terms[field].startswith(last_terms[field]) for field in last_terms))
+            if narrowing:
+                candidates = last_rows + list(range(last_count, row_count))
+
+        if candidates is None:
+            candidates = range(row_count)
+
+        rows = self._match(terms, predicate, candidates)
+        self._last = (terms, predicate_key, predicate, row_count, rows)
+        return rows
+
+    def query_added(self):
+        """Row ids added since the last query that match it, in insertion order.
+
+        The new matches are also added to the last query's result (the list
+        query returned is extended in place), so narrowing stays correct.
+        Returns an empty list if nothing has been queried yet.
+        """
+        if self._last is None:
+            return []
+        terms, predicate_key, predicate, last_count, rows = self._last
+        row_count = len(self)
+        added = self._match(terms, predicate, range(last_count, row_count))
+        rows.extend(added)
+        self._last = (terms, predicate_key, predicate, row_count, rows)
+        return added
+
+    def _match(self, terms, predicate, candidates):
+        rows = []
+        checks = [(self.texts[field], text) for field, text in terms.items()]
+        for row_id in candidates:
+            if all(text in column[row_id] for column, text in checks):
+                if predicate is None or predicate(row_id):
+                    rows.append(row_id)
+        return rows
@@ -0,0 +1,140 @@
+"""Typed, cached sort keys and stable multi-column sorting for the tables.
+
+Cells are strings as extracted ("4,06,450.00", "27-Feb-25", "1.00 Nos"),
+so sorting them as text puts "10" before "9" and dates in alphabetical
+month order. Each column gets a type - text, number, date, or scaled for the
+store's exact integer columns - and every
+cell is parsed to a sort key once; keys are cached per column by row id and
+only computed for rows added since the last sort.
+
+Clicking a column makes it the primary sort key (clicking it again flips
+the direction); the previously sorted columns are kept as tie-breakers.
+Rows added while a sort is active are inserted at their sorted position by
+binary search, so the view keeps the order its heading shows.
+Values that do not parse sort after those that do (before them when
+descending), in text order.
+"""
+import re
+from datetime import datetime
+
+NUMBER_RE = re.compile(r"[-+]?\d[\d,]*(?:\.\d+)?|[-+]?\.\d+")
+DATE_FORMATS = ['%d-%b-%y', '%d-%b-%Y', '%d/%b/%y', '%d/%b/%Y', '%d-%m-%Y', '%d/%m/%Y',
+                '%d-%m-%y', '%d/%m/%y', '%Y-%m-%d', '%d %b %Y', '%d %B %Y', '%d-%B-%Y']
+# Columns kept as tie-breakers behind the primary sort column
+MAX_SORT_COLUMNS = 3
+
+
+def parse_number(value):
+    """First number in a cell, ignoring currency symbols, units and Indian digit grouping"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    m = NUMBER_RE.search(str(value))
+    if not m:
+        return None
+    try:
+        return float(m.group(0).replace(',', ''))
+    except ValueError:
+        return None
+
+
+def parse_date(value):
+    text = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+PARSERS = {'number': parse_number, 'date': parse_date}
+
+
+def sort_key(value, kind):
+    """(0, typed value) when the cell parses as ``kind``, else (1, folded text)"""
+    text = '' if value is None else str(value)
+    parser = PARSERS.get(kind)
+    if parser is not None:
+        parsed = parser(value)
+        if parsed is not None:
+            return (0, parsed)
+        return (1, text.casefold())
+    return (0, text.casefold())
+
+
+class ColumnSorter:
+    """Sort state and cached keys for one table.
+
+    ``get_value(row_id, column)`` returns a cell; ``column_types`` maps a
+    column to 'text', 'number', 'date' or 'scaled' (text if missing). Row ids
+    must be 0..n-1 in insertion order, as the tables assign them.
+
+    'scaled' columns sort on ``get_scaled(row_id, column)``, the exact
+    integer the store parsed at ingest (None if the cell did not parse), so
+    the order matches the totals shown from the same integers.
+    """
+
+    def __init__(self, get_value, column_types, get_scaled=None):
+        self.get_value = get_value
+        self.get_scaled = get_scaled
+        self.column_types = dict(column_types)
+        self.sort_columns = []  # [(column, reverse)], primary first
+        self.keys = {}
+
+    def clear(self):
+        self.sort_columns = []
+        self.keys = {}
+
+    def click(self, column):
+        """Make ``column`` the primary sort column, flipping it if it already is"""
+        if self.sort_columns and self.sort_columns[0][0] == column:
+            self.sort_columns[0] = (column, not self.sort_columns[0][1])
+        else:
+            others = [entry for entry in self.sort_columns if entry[0] != column]
+            self.sort_columns = [(column, False)] + others[:MAX_SORT_COLUMNS - 1]
+        return self.sort_columns[0][1]
+
+    def column_keys(self, column, row_count):
+        """Cached sort keys for ``column``, indexed by row id"""
+        keys = self.keys.setdefault(column, [])
+        kind = self.column_types.get(column, 'text')
+        for row_id in range(len(keys), row_count):
+            if kind == 'scaled':
+                scaled = self.get_scaled(row_id, column)
+                key = (0, scaled) if scaled is not None else (1, sort_key(self.get_value(row_id, column), 'text')[1])
+            else:
+                key = sort_key(self.get_value(row_id, column), kind)
+            keys.append(key)
+        return keys
+
+    def sort(self, order, row_count):
+        """Sort a list of row ids in place by the current sort columns"""
+        # Sorting from the least significant column up relies on sort stability
+        for column, reverse in reversed(self.sort_columns):
+            keys = self.column_keys(column, row_count)
+            order.sort(key=keys.__getitem__, reverse=reverse)
+
+    def insert(self, order, row_ids, row_count):
+        """Insert new row ids into an already sorted list at their sorted positions"""
+        if not self.sort_columns:
+            order.extend(row_ids)
+            return
+        columns = [(self.column_keys(column, row_count), reverse) for column, reverse in self.sort_columns]
+
+        def precedes(new_id, row_id):
+            for keys, reverse in columns:
+                a, b = keys[new_id], keys[row_id]
+                if a != b:
+                    return a > b if reverse else a < b
+            # Equal rows keep insertion order, as the stable sort would
+            return new_id < row_id
+
+        for new_id in row_ids:
+            low, high = 0, len(order)
+            while low < high:
+                mid = (low + high) // 2
+                if precedes(new_id, order[mid]):
+                    high = mid
+                else:
+                    low = mid + 1
+            order.insert(low, new_id)
@@ -0,0 +1,30 @@
+from field_engine import get_engine
+
+
+def test_fallback_buyer_and_gstin_apply_to_any_vendor():
+    text = ("TAX INVOICE\nSupplier: Deccan Networks Pvt\nInvoice No: DN-0042\n"
+            "Delivered at Bharat Electronics Ltd, Hyderabad\nRef 36AAACB5985C1ZQ\n")
+    fields = get_engine().extract(text)
+    assert fields['invoice_no'] == 'DN-0042'
+    assert fields['buyer'] == 'Bharat Electronics Ltd'
+    assert fields['gstin'] == '36AAACB5985C1ZQ'
+
+
+def test_generic_patterns_win_over_the_fallbacks():
+    text = ("Buyer (Bill to)\nAcme Corporation\nGSTIN/UIN: 29ABCDE1234F1Z5\n"
+            "Shipped via Bharat Electronics Ltd 36AAACB5985C1ZQ\n")
+    fields = get_engine().extract(text)
+    assert fields['buyer'] == 'Acme Corporation'
+    assert fields['gstin'] == '29ABCDE1234F1Z5'
+
+
+def test_engine_is_reloaded_when_the_registry_changes(tmp_path):
+    path = str(tmp_path / 'patterns.json')
+    registry = '{"fields": ["invoice_no"], "default": {"invoice_no": [{"pattern": "(%s\\\\d+)"}]}}'
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(registry % 'A')
+    assert get_engine(path).extract('A1 B2') == {'invoice_no': 'A1'}
+    assert get_engine(path) is get_engine(path)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(registry % 'B')
+    assert get_engine(path).extract('A1 B2') == {'invoice_no': 'B2'}
@@ -0,0 +1,22 @@
+from invoice_db import InvoiceDatabase
+
+
+def test_amounts_outside_int64_are_saved_as_null(tmp_path):
+    db = InvoiceDatabase(str(tmp_path / 'invoices.db'))
+    db.add_results([{'file': 'a.pdf', 'summary': {'Invoice No': 'INV1'},
+                     'services': [['1', 'AMC', '1', '100.00', '98765432109876543210']]}])
+    row = db.conn.execute("SELECT total_amount, amount_scaled, rate_scaled FROM line_items").fetchone()
+    assert row['total_amount'] == '98765432109876543210'
+    assert row['amount_scaled'] is None
+    assert row['rate_scaled'] == 10000
+    db.close()
+
+
+def test_invoice_no_filter_matches_substrings(tmp_path):
+    db = InvoiceDatabase(str(tmp_path / 'invoices.db'))
+    db.add_results([{'file': f'{no}.pdf', 'summary': {'Invoice No': no}, 'services': []}
+                    for no in ('H/AMC/2024/101', 'INV-202', 'AMC_5%')])
+    assert [r['summary']['Invoice No'] for r in db.find_working_set(invoice_no='amc')] == \
+        ['H/AMC/2024/101', 'AMC_5%']
+    assert [r['summary']['Invoice No'] for r in db.find_working_set(invoice_no='_5%')] == ['AMC_5%']
+    db.close()
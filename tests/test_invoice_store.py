@@ -0,0 +1,26 @@
+from invoice_store import InvoiceStore, NUMERIC_COLUMNS, parse_scaled
+
+
+def test_parse_scaled_rejects_values_outside_int64():
+    assert parse_scaled('98765432109876543210') is None
+    assert parse_scaled('-98765432109876543210') is None
+    assert parse_scaled(10 ** 18) is None
+    assert parse_scaled('4,06,450.00') == 40645000
+
+
+def test_huge_amount_is_a_parse_failure_and_columns_stay_aligned():
+    store = InvoiceStore()
+    store.add_invoice({'Invoice No': 'INV1'}, [
+        ['1', 'AMC', '1', '100.00', '98765432109876543210'],
+        ['2', 'Support', '2', '50.00', '100.00'],
+    ])
+
+    lengths = {len(store.services[col]) for col in store.services}
+    lengths.add(len(store.service_invoice))
+    for col in NUMERIC_COLUMNS:
+        lengths.update({len(store.numbers[col]), len(store.parse_failed[col])})
+    assert lengths == {2}
+
+    assert store.parse_failed['Total Amount'][0]
+    assert store.numbers['Total Amount'][0] == 0
+    assert store.service_number(1, 'Total Amount') == 10000
@@ -0,0 +1,11 @@
+import pytest
+
+from ocr_layout import OCR_COLUMNS, merge_pages
+
+pd = pytest.importorskip('pandas')
+
+
+def test_merge_pages_without_pages_is_an_empty_word_frame():
+    merged = merge_pages([])
+    assert merged.empty
+    assert list(merged.columns) == OCR_COLUMNS
@@ -1,16 +1,37 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import tkinterdnd2 as tkdnd
-import os, re, subprocess
+import os, subprocess
 from datetime import datetime
-import pdfplumber
-import pytesseract
-from pdf2image import convert_from_path
-import pandas as pd
-from PIL import Image, ImageTk
+import queue
+import sqlite3
 import threading
 import json
 
+# Heavy dependencies are imported where they are first needed so the window
+# comes up quickly: openpyxl and pyarrow inside export_writers, and pdfplumber,
+# pytesseract and pdf2image inside invoice_pipeline's extraction code.
+import export_jobs
+import export_writers
+import invoice_pipeline
+import job_scheduler
+from batch_journal import BatchJournal, new_journal_path, unfinished_journals
+from dedupe import DuplicateIndex, describe_duplicates
+from export_jobs import ExportQueue
+from export_writers import Sheet
+from invoice_db import InvoiceDatabase, database_path, LOAD_CHUNK
+from invoice_store import InvoiceStore, format_scaled, parse_scaled
+from job_scheduler import JobScheduler, SchedulerFull, LANE_NAMES, lane_for
+from pipeline_stats import BatchStats, STAGES
+from table_filter import SearchIndex
+from table_sort import ColumnSorter
+from virtual_table import VirtualTable
+
+# Wait this long after the last keystroke before filtering
+FILTER_DEBOUNCE_MS = 150
+# Worker threads post results and progress to a queue the Tk loop drains this often
+UI_TICK_MS = 100
+
 
 class InvoiceProcessorGUI:
     def __init__(self):
@@ -21,12 +42,9 @@ class InvoiceProcessorGUI:
         self.root.configure(bg='#f0f0f0')
 
         # Configuration
-        self.config = {
-            'poppler_path': '',
-            'tesseract_path': '',
-            'output_directory': ''
-        }
+        self.config = dict(invoice_pipeline.DEFAULT_CONFIG)
         self.load_config()
+        invoice_pipeline.apply_tesseract_path(self.config)
 
         # Initialize data storage
         self.processed_data = {
@@ -38,9 +56,74 @@ class InvoiceProcessorGUI:
         # Current page tracking
         self.current_page = 0
 
+        # Every processed invoice and line item; the tables and exports read from here
+        self.store = InvoiceStore()
+
+        # Search indexes, display (sort) order and current filter matches for each table.
+        self.summary_index = SearchIndex(['row', 'invoice_no'])
+        self.services_index = SearchIndex(['row'])
+        self.summary_order = []
+        self.services_order = []
+        self.summary_matches = None
+        self.services_matches = None
+        # Filters behind services_matches: whether a search term is applied, and the minimum amount (paise)
+        self.services_searched = False
+        self.services_min_scaled = None
+        self._filter_jobs = {}
+
+        # Typed sorting with cached keys
+        self.summary_sorter = ColumnSorter(self.store.summary_value,
+                                           {'Invoice Date': 'date', 'Line Items Count': 'number'})
+        self.services_sorter = ColumnSorter(self.store.service_value,
+                                            {'S.No': 'number', 'Quantity': 'scaled', 'Rate': 'scaled',
+                                             'Total Amount': 'scaled'},
+                                            get_scaled=self.store.service_number)
+
+        # Result cache hits/misses since the processing queue was last idle
+        self.cache_stats = {'hits': 0, 'misses': 0}
+
+        # Per-stage timings since the processing queue was last idle (Diagnostics tab)
+        self.batch_stats = BatchStats()
+
+        # Worker threads never touch Tk: they post (kind, value) items here and
+        # drain_ui_queue applies them in batches on the Tk loop
+        self.ui_queue = queue.Queue()
+
+        # Every drop is a job on one scheduler: small drops go ahead of bulk ones,
+        # and only as many files as there are workers are processed at once
+        self.scheduler = JobScheduler(
+            invoice_pipeline.process_invoice,
+            on_result=lambda job, file_path, result, error: self.ui_queue.put(('file', (job, file_path, result, error))),
+            on_job=lambda job: self.ui_queue.put(('job', job)))
+        self.configure_scheduler()
+        self.queue_text = ""
+
+        # Exports run one at a time on a background thread
+        self.export_queue = ExportQueue(notify=lambda job: self.ui_queue.put(('export', job)))
+        self.export_titles = {}
+
+        # Line items limited to one invoice by "View Services" (None when not in that view)
+        self.services_invoice_view = None
+
+        # Invoice database: new results are saved once per UI tick. The saved working
+        # set is paged in as the tables scroll, searches fetch their matches from it
+        # with SQL, and only its duplicate-detection keys are read in full (in the background).
+        self.db = None
+        self.load_generation = 0
+        # Saved invoices with ids in (db_cursor, db_end] are not paged in yet, apart
+        # from the db_fetched ones a search brought in; db_pending counts what is left
+        self.db_cursor = self.db_end = self.db_pending = 0
+        self.db_fetched = set()
+
+        # Every invoice in the working set by content hash and (invoice no, GSTIN, total)
+        self.duplicate_index = DuplicateIndex()
+
         # Setup UI
         self.setup_styles()
         self.create_main_interface()
+        self.root.after(UI_TICK_MS, self.drain_ui_queue)
+        self.open_database()
+        self.root.after(UI_TICK_MS, self.offer_resume)
 
     def setup_styles(self):
         """Setup custom styles for the application"""
@@ -134,12 +217,26 @@ class InvoiceProcessorGUI:
         self.create_summary_tab()
         self.create_services_tab()
         self.create_settings_tab()
+        self.create_diagnostics_tab()
 
         # Modern status bar
-        status_frame = tk.Frame(self.main_frame, bg='#34495e', height=30)
+        self.status_frame = status_frame = tk.Frame(self.main_frame, bg='#34495e', height=30)
         status_frame.pack(fill=tk.X, pady=(15, 0))
         status_frame.pack_propagate(False)
 
+        # Background export progress, shown above the status bar while exports are queued or running
+        self.export_frame = tk.Frame(self.main_frame, bg='#f8f9fa', relief=tk.RAISED, bd=1)
+        self.export_label = tk.Label(self.export_frame, text="", font=('Segoe UI', 9), bg='#f8f9fa',
+                                     fg='#2c3e50', anchor=tk.W)
+        self.export_label.pack(side=tk.LEFT, padx=(15, 10), pady=6)
+        ttk.Button(self.export_frame, text="Cancel All",
+                   command=self.export_queue.cancel_all).pack(side=tk.RIGHT, padx=(5, 15), pady=6)
+        ttk.Button(self.export_frame, text="Cancel",
+                   command=self.cancel_current_export).pack(side=tk.RIGHT, padx=5, pady=6)
+        self.export_progress_var = tk.DoubleVar()
+        ttk.Progressbar(self.export_frame, variable=self.export_progress_var, maximum=100,
+                        length=250).pack(side=tk.RIGHT, padx=10, pady=6)
+
         self.status_var = tk.StringVar()
         self.status_var.set("Ready to process invoices")
         status_bar = tk.Label(status_frame, textvariable=self.status_var,
@@ -192,6 +289,13 @@ class InvoiceProcessorGUI:
         self.progress_label = tk.Label(drop_content, text="", font=('Arial', 10), bg='#e8f5e8', fg='#666')
         self.progress_label.pack()
 
+        # Processing queue: files waiting in each lane, busy workers and wait times
+        self.queue_label = tk.Label(drop_content, text="", font=('Arial', 9), bg='#e8f5e8', fg='#666')
+        self.queue_label.pack()
+        self.cancel_processing_btn = ttk.Button(drop_content, text="Cancel Processing",
+                                                command=self.cancel_processing, state=tk.DISABLED)
+        self.cancel_processing_btn.pack(pady=(5, 0))
+
         # Enhanced export buttons frame for Upload tab
         upload_export_frame = tk.Frame(upload_frame, bg='#f8f9fa', relief=tk.RAISED, bd=1)
         upload_export_frame.pack(fill=tk.X, side=tk.BOTTOM, padx=20, pady=10)
@@ -236,7 +340,7 @@ class InvoiceProcessorGUI:
         self.summary_search_var = tk.StringVar()
         search_entry = ttk.Entry(search_frame, textvariable=self.summary_search_var, font=('Segoe UI', 9), width=30)
         search_entry.pack(side=tk.LEFT, padx=(0, 20))
-        search_entry.bind('<KeyRelease>', self.filter_summary)
+        search_entry.bind('<KeyRelease>', self.schedule_summary_filter)
 
         # Filter by date range
         tk.Label(search_frame, text="Filter by Invoice No:", font=('Segoe UI', 9, 'bold'),
@@ -245,7 +349,7 @@ class InvoiceProcessorGUI:
         self.summary_filter_var = tk.StringVar()
         filter_entry = ttk.Entry(search_frame, textvariable=self.summary_filter_var, font=('Segoe UI', 9), width=20)
         filter_entry.pack(side=tk.LEFT, padx=(0, 10))
-        filter_entry.bind('<KeyRelease>', self.filter_summary)
+        filter_entry.bind('<KeyRelease>', self.schedule_summary_filter)
 
         clear_filter_btn = ttk.Button(search_frame, text="Clear", command=self.clear_summary_filter)
         clear_filter_btn.pack(side=tk.LEFT, padx=(0, 20))
@@ -259,28 +363,19 @@ class InvoiceProcessorGUI:
         data_frame = tk.Frame(summary_frame, bg='white', relief=tk.RAISED, bd=1)
         data_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
 
-        # Treeview for summary data with spreadsheet styling
+        # Virtualized table for summary data with spreadsheet styling
         columns = ('Invoice No', 'Invoice Date', 'Buyer', 'GSTIN', 'Line Items Count')
-        self.summary_tree = ttk.Treeview(data_frame, columns=columns, show='headings',
-                                         style='Spreadsheet.Treeview', height=20)
 
         # Configure columns with better widths and alignment
         widths = [140, 120, 280, 160, 120]
         alignments = ['center', 'center', 'w', 'center', 'center']
 
-        for i, col in enumerate(columns):
-            self.summary_tree.heading(col, text=col, command=lambda c=col: self.sort_summary_column(c))
-            self.summary_tree.column(col, width=widths[i], anchor=alignments[i], minwidth=50)
-
-        # Scrollbars with modern styling
-        summary_scroll_y = ttk.Scrollbar(data_frame, orient=tk.VERTICAL, command=self.summary_tree.yview)
-        summary_scroll_x = ttk.Scrollbar(data_frame, orient=tk.HORIZONTAL, command=self.summary_tree.xview)
-        self.summary_tree.configure(yscrollcommand=summary_scroll_y.set, xscrollcommand=summary_scroll_x.set)
-
-        # Pack treeview and scrollbars
-        self.summary_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
-        summary_scroll_y.pack(side=tk.RIGHT, fill=tk.Y, pady=5)
-        summary_scroll_x.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+        self.summary_table = VirtualTable(data_frame, columns, self.store.summary_values, widths=widths,
+                                          anchors=alignments, on_sort=self.sort_summary_column,
+                                          on_end=lambda: self.load_more_saved(self.summary_matches is not None),
+                                          style='Spreadsheet.Treeview')
+        self.summary_table.set_rows(self.summary_order)
+        self.summary_table.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         # Enhanced export buttons frame
         export_frame = tk.Frame(summary_frame, bg='#f8f9fa', relief=tk.RAISED, bd=1)
@@ -318,7 +413,7 @@ class InvoiceProcessorGUI:
         clear_btn.pack(side=tk.RIGHT, padx=(10, 0))
 
         # Bind selection event
-        self.summary_tree.bind('<<TreeviewSelect>>', self.on_summary_selection)
+        self.summary_table.bind('<<TableSelect>>', self.on_summary_selection)
 
     def create_services_tab(self):
         """Create the services data tab with enhanced UI"""
@@ -339,7 +434,7 @@ class InvoiceProcessorGUI:
         self.services_search_var = tk.StringVar()
         search_entry = ttk.Entry(search_frame, textvariable=self.services_search_var, font=('Segoe UI', 9), width=40)
         search_entry.pack(side=tk.LEFT, padx=(0, 20))
-        search_entry.bind('<KeyRelease>', self.filter_services)
+        search_entry.bind('<KeyRelease>', self.schedule_services_filter)
 
         # Filter by amount range
         tk.Label(search_frame, text="Min Amount:", font=('Segoe UI', 9, 'bold'),
@@ -348,7 +443,7 @@ class InvoiceProcessorGUI:
         self.services_min_amount = tk.StringVar()
         min_entry = ttk.Entry(search_frame, textvariable=self.services_min_amount, font=('Segoe UI', 9), width=10)
         min_entry.pack(side=tk.LEFT, padx=(0, 10))
-        min_entry.bind('<KeyRelease>', self.filter_services)
+        min_entry.bind('<KeyRelease>', self.schedule_services_filter)
 
         clear_services_filter_btn = ttk.Button(search_frame, text="Clear", command=self.clear_services_filter)
         clear_services_filter_btn.pack(side=tk.LEFT, padx=(0, 20))
@@ -362,28 +457,19 @@ class InvoiceProcessorGUI:
         data_frame = tk.Frame(services_frame, bg='white', relief=tk.RAISED, bd=1)
         data_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
 
-        # Treeview for services data
+        # Virtualized table for services data
         columns = ('S.No', 'Description of Services', 'Quantity', 'Rate', 'Total Amount')
-        self.services_tree = ttk.Treeview(data_frame, columns=columns, show='headings',
-                                          style='Spreadsheet.Treeview', height=20)
 
         # Configure columns with better widths
         widths = [60, 400, 100, 120, 120]
         alignments = ['center', 'w', 'center', 'e', 'e']
 
-        for i, col in enumerate(columns):
-            self.services_tree.heading(col, text=col, command=lambda c=col: self.sort_services_column(c))
-            self.services_tree.column(col, width=widths[i], anchor=alignments[i], minwidth=50)
-
-        # Scrollbars
-        services_scroll_y = ttk.Scrollbar(data_frame, orient=tk.VERTICAL, command=self.services_tree.yview)
-        services_scroll_x = ttk.Scrollbar(data_frame, orient=tk.HORIZONTAL, command=self.services_tree.xview)
-        self.services_tree.configure(yscrollcommand=services_scroll_y.set, xscrollcommand=services_scroll_x.set)
-
-        # Pack treeview and scrollbars
-        self.services_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
-        services_scroll_y.pack(side=tk.RIGHT, fill=tk.Y, pady=5)
-        services_scroll_x.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+        self.services_table = VirtualTable(data_frame, columns, self.store.service_values, widths=widths,
+                                           anchors=alignments, on_sort=self.sort_services_column,
+                                           on_end=lambda: self.load_more_saved(self.services_matches is not None),
+                                           style='Spreadsheet.Treeview')
+        self.services_table.set_rows(self.services_order)
+        self.services_table.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         # Enhanced export buttons frame
         export_frame = tk.Frame(services_frame, bg='#f8f9fa', relief=tk.RAISED, bd=1)
@@ -417,7 +503,7 @@ class InvoiceProcessorGUI:
         calculate_total_btn.pack(side=tk.RIGHT, padx=(10, 0))
 
         # Bind selection event
-        self.services_tree.bind('<<TreeviewSelect>>', self.on_services_selection)
+        self.services_table.bind('<<TableSelect>>', self.on_services_selection)
 
     def create_settings_tab(self):
         """Create the settings tab"""
@@ -468,6 +554,86 @@ class InvoiceProcessorGUI:
                                    command=lambda: self.browse_directory(self.output_var))
         output_browse.pack(side=tk.RIGHT, padx=10, pady=10)
 
+        # Batch processing
+        batch_frame = ttk.LabelFrame(settings_content, text="Batch Processing")
+        batch_frame.pack(fill=tk.X, pady=(0, 20))
+
+        self.use_pool_var = tk.BooleanVar(value=self.config['use_process_pool'])
+        use_pool_check = ttk.Checkbutton(batch_frame, text="Process files in parallel (one process per worker)",
+                                         variable=self.use_pool_var)
+        use_pool_check.pack(side=tk.LEFT, padx=10, pady=10)
+
+        self.max_workers_var = tk.IntVar(value=self.config['max_workers'])
+        workers_spin = ttk.Spinbox(batch_frame, from_=1, to=max(64, os.cpu_count() or 1),
+                                   textvariable=self.max_workers_var, width=5)
+        workers_spin.pack(side=tk.RIGHT, padx=10, pady=10)
+        ttk.Label(batch_frame, text="Worker processes:").pack(side=tk.RIGHT, pady=10)
+
+        # OCR rasterization memory ceiling
+        ocr_frame = ttk.LabelFrame(settings_content, text="OCR Memory")
+        ocr_frame.pack(fill=tk.X, pady=(0, 20))
+
+        ttk.Label(ocr_frame, text="Max memory for rendered pages per worker (MB):").pack(side=tk.LEFT, padx=10, pady=10)
+        self.raster_memory_var = tk.IntVar(value=self.config['raster_memory_mb'])
+        raster_memory_spin = ttk.Spinbox(ocr_frame, from_=32, to=8192, increment=32,
+                                         textvariable=self.raster_memory_var, width=7)
+        raster_memory_spin.pack(side=tk.LEFT, pady=10)
+
+        # Result cache
+        cache_frame = ttk.LabelFrame(settings_content, text="Result Cache")
+        cache_frame.pack(fill=tk.X, pady=(0, 20))
+
+        self.use_cache_var = tk.BooleanVar(value=self.config['use_cache'])
+        use_cache_check = ttk.Checkbutton(cache_frame, text="Reuse results for files processed before",
+                                          variable=self.use_cache_var)
+        use_cache_check.pack(side=tk.LEFT, padx=10, pady=10)
+
+        clear_cache_btn = ttk.Button(cache_frame, text="Clear Cache", command=self.clear_result_cache)
+        clear_cache_btn.pack(side=tk.RIGHT, padx=10, pady=10)
+
+        self.cache_max_var = tk.IntVar(value=self.config['cache_max_mb'])
+        cache_max_spin = ttk.Spinbox(cache_frame, from_=16, to=65536, increment=64,
+                                     textvariable=self.cache_max_var, width=7)
+        cache_max_spin.pack(side=tk.RIGHT, pady=10)
+        ttk.Label(cache_frame, text="Max size (MB):").pack(side=tk.RIGHT, padx=(10, 0), pady=10)
+
+        # Export format
+        format_frame = ttk.LabelFrame(settings_content, text="Export Format")
+        format_frame.pack(fill=tk.X, pady=(0, 20))
+
+        self.export_format_var = tk.StringVar(
+            value=export_writers.FORMAT_LABELS.get(self.config['export_format'], export_writers.FORMAT_LABELS['xlsx']))
+        format_combo = ttk.Combobox(format_frame, textvariable=self.export_format_var, state='readonly', width=15,
+                                    values=[export_writers.FORMAT_LABELS[fmt] for fmt in export_writers.FORMATS])
+        format_combo.pack(side=tk.LEFT, padx=10, pady=10)
+        ttk.Label(format_frame, text="Excel is written row by row; CSV and Parquet write one file per sheet "
+                                     "(Parquet needs pyarrow)").pack(side=tk.LEFT, pady=10)
+
+        # Duplicate invoices
+        duplicates_frame = ttk.LabelFrame(settings_content, text="Duplicate Invoices")
+        duplicates_frame.pack(fill=tk.X, pady=(0, 10))
+
+        self.skip_duplicates_var = tk.BooleanVar(value=self.config['skip_duplicates'])
+        skip_duplicates_check = ttk.Checkbutton(
+            duplicates_frame, text="Skip files already processed, or with the same invoice no, GSTIN and total "
+                                   "(otherwise they are added and reported)", variable=self.skip_duplicates_var)
+        skip_duplicates_check.pack(side=tk.LEFT, padx=10, pady=10)
+
+        # Invoice database
+        database_frame = ttk.LabelFrame(settings_content, text="Invoice Database")
+        database_frame.pack(fill=tk.X, pady=(0, 10))
+
+        self.use_database_var = tk.BooleanVar(value=self.config['use_database'])
+        use_database_check = ttk.Checkbutton(database_frame, text="Save processed invoices and reload them at startup",
+                                             variable=self.use_database_var)
+        use_database_check.pack(side=tk.LEFT, padx=10, pady=10)
+
+        self.database_var = tk.StringVar(value=database_path(self.config))
+        database_browse = ttk.Button(database_frame, text="Browse", command=self.browse_database)
+        database_browse.pack(side=tk.RIGHT, padx=10, pady=10)
+        database_entry = ttk.Entry(database_frame, textvariable=self.database_var, width=40)
+        database_entry.pack(side=tk.RIGHT, pady=10)
+
         # Enhanced export buttons frame for Settings tab
         settings_export_frame = tk.Frame(settings_content, bg='#f8f9fa', relief=tk.RAISED, bd=1)
         settings_export_frame.pack(fill=tk.X, pady=20)
@@ -498,6 +664,100 @@ class InvoiceProcessorGUI:
                                          command=self.export_template)
         export_template_btn.pack(side=tk.RIGHT, padx=(10, 0))
 
+    def create_diagnostics_tab(self):
+        """Create the diagnostics tab with per-stage timings for the last batch"""
+        diagnostics_frame = ttk.Frame(self.notebook)
+        self.notebook.add(diagnostics_frame, text="Diagnostics")
+
+        # Control panel
+        control_panel = tk.Frame(diagnostics_frame, bg='#ecf0f1', relief=tk.RAISED, bd=1)
+        control_panel.pack(fill=tk.X, padx=10, pady=10)
+
+        info_frame = tk.Frame(control_panel, bg='#ecf0f1')
+        info_frame.pack(fill=tk.X, padx=15, pady=10)
+
+        self.diagnostics_counters_label = tk.Label(info_frame, text="No batch processed yet",
+                                                   font=('Segoe UI', 9), bg='#ecf0f1', fg='#2c3e50')
+        self.diagnostics_counters_label.pack(side=tk.LEFT)
+
+        export_stats_btn = ttk.Button(info_frame, text="Export JSON", command=self.export_diagnostics)
+        export_stats_btn.pack(side=tk.RIGHT, padx=(10, 0))
+
+        refresh_btn = ttk.Button(info_frame, text="Refresh", command=self.refresh_diagnostics)
+        refresh_btn.pack(side=tk.RIGHT)
+
+        # Aggregate per-stage timings
+        stages_frame = ttk.LabelFrame(diagnostics_frame, text="Stage Timings (seconds)")
+        stages_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+
+        columns = ('Stage', 'Count', 'Total', 'p50', 'p95', 'Max')
+        self.stages_tree = ttk.Treeview(stages_frame, columns=columns, show='headings',
+                                        style='Spreadsheet.Treeview', height=len(STAGES))
+        for col in columns:
+            self.stages_tree.heading(col, text=col)
+            self.stages_tree.column(col, width=160 if col == 'Stage' else 100,
+                                    anchor='w' if col == 'Stage' else 'e')
+        self.stages_tree.pack(fill=tk.X, padx=5, pady=5)
+
+        # Per-file breakdown
+        files_frame = ttk.LabelFrame(diagnostics_frame, text="Files")
+        files_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+
+        columns = ('File', 'Seconds', 'Pages', 'OCR Pages', 'Cache Hit', 'Slowest Stage')
+        self.diagnostics_files_tree = ttk.Treeview(files_frame, columns=columns, show='headings',
+                                                   style='Spreadsheet.Treeview')
+        widths = [300, 90, 70, 90, 80, 200]
+        for i, col in enumerate(columns):
+            self.diagnostics_files_tree.heading(col, text=col)
+            self.diagnostics_files_tree.column(col, width=widths[i], anchor='w' if i in (0, 5) else 'e')
+
+        files_scroll_y = ttk.Scrollbar(files_frame, orient=tk.VERTICAL, command=self.diagnostics_files_tree.yview)
+        self.diagnostics_files_tree.configure(yscrollcommand=files_scroll_y.set)
+        self.diagnostics_files_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+        files_scroll_y.pack(side=tk.RIGHT, fill=tk.Y, pady=5)
+
+    def refresh_diagnostics(self):
+        """Redraw the Diagnostics tab from the current batch stats"""
+        self.stages_tree.delete(*self.stages_tree.get_children())
+        for stage, row in self.batch_stats.stage_summary().items():
+            self.stages_tree.insert('', 'end', values=(
+                stage, row['count'], f"{row['total']:.3f}", f"{row['p50']:.3f}",
+                f"{row['p95']:.3f}", f"{row['max']:.3f}"
+            ))
+
+        self.diagnostics_files_tree.delete(*self.diagnostics_files_tree.get_children())
+        for file_stats in self.batch_stats.files:
+            counters = file_stats['counters']
+            stages = file_stats['stages']
+            slowest = max(stages, key=stages.get) if stages else ''
+            self.diagnostics_files_tree.insert('', 'end', values=(
+                os.path.basename(file_stats['file']), f"{file_stats['seconds']:.3f}",
+                counters.get('pages', 0), counters.get('ocr_pages', 0),
+                'Yes' if counters.get('cache_hits') else 'No',
+                f"{slowest} ({stages[slowest]:.3f}s)" if slowest else ''
+            ))
+
+        totals = self.batch_stats.counter_totals()
+        self.diagnostics_counters_label.config(
+            text=f"Files: {len(self.batch_stats.files)} | Pages: {totals['pages']} | "
+                 f"OCR pages: {totals['ocr_pages']} | Read: {totals['bytes_read'] / (1024 * 1024):.1f} MB | "
+                 f"Cache hits: {totals['cache_hits']}")
+
+    def export_diagnostics(self):
+        """Save the current batch stats as JSON"""
+        if not self.batch_stats.files and not self.batch_stats.batch_stages:
+            messagebox.showwarning("No Data", "No diagnostics to export.")
+            return
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_dir = self.config['output_directory'] or os.getcwd()
+        json_path = os.path.join(output_dir, f"Diagnostics_{timestamp}.json")
+        try:
+            self.batch_stats.write_json(json_path)
+            messagebox.showinfo("Export Complete", f"Diagnostics exported to:\n{json_path}")
+            self.status_var.set(f"Diagnostics exported to: {json_path}")
+        except Exception as e:
+            messagebox.showerror("Export Error", str(e))
+
     def on_drag_enter(self, event):
         """Handle drag enter event"""
         self.drop_frame.configure(bg='#c8e6c9')
@@ -532,188 +792,478 @@ class InvoiceProcessorGUI:
         if directory:
             var.set(directory)
 
+    def browse_database(self):
+        """Choose (or name a new) invoice database file"""
+        file = filedialog.asksaveasfilename(title="Invoice database", defaultextension=".db",
+                                            initialfile=os.path.basename(self.database_var.get()),
+                                            filetypes=[("SQLite database", "*.db"), ("All files", "*.*")],
+                                            confirmoverwrite=False)
+        if file:
+            self.database_var.set(file)
+
     def browse_file(self, var):
         """Browse for file"""
         file = filedialog.askopenfilename()
         if file:
             var.set(file)
 
-    def process_files(self, files):
-        """Process PDF files in a separate thread"""
-        self.progress_var.set(0)
-        self.progress_label.config(text="Starting processing...")
-
-        # Start processing in a separate thread
-        thread = threading.Thread(target=self._process_files_thread, args=(files,))
-        thread.daemon = True
-        thread.start()
-
-    def _process_files_thread(self, files):
-        """Process files in a separate thread"""
+    def configure_scheduler(self):
+        """Size the processing pool from the settings"""
+        workers = max(1, int(self.config.get('max_workers') or 1))
+        use_processes = bool(self.config.get('use_process_pool')) and workers > 1
+        self.scheduler.configure(workers if use_processes else 1, use_processes,
+                                 initializer=invoice_pipeline.init_worker, initargs=(dict(self.config),))
+
+    def process_files(self, files, journal=None):
+        """Queue PDF files on the scheduler, journaling each file's outcome"""
+        files = list(files)
+        if journal is None:
+            try:
+                # Results are only kept in the journal when there is no database to reload them from
+                journal = BatchJournal.start(new_journal_path(), files, keep_results=self.db is None)
+            except OSError as e:
+                self.status_var.set(f"Could not start the batch journal, this batch cannot be resumed: {e}")
+
+        if not self.scheduler.active():
+            self.cache_stats = {'hits': 0, 'misses': 0}
+            self.batch_stats = BatchStats()
+            self.progress_var.set(0)
+        lane = lane_for(len(files))
+        config = invoice_pipeline.worker_config(self.config, self.scheduler.workers)
         try:
-            total_files = len(files)
-            for i, file_path in enumerate(files):
-                file_name = os.path.basename(file_path)
-                self.root.after(0, lambda fn=file_name: self.progress_label.config(text=f"Processing: {fn}"))
-
-                # Process individual file
-                self.process_single_file(file_path)
-
-                # Update progress
-                progress = ((i + 1) / total_files) * 100
-                self.root.after(0, lambda p=progress: self.progress_var.set(p))
-
-            self.root.after(0, lambda: self.progress_label.config(text="Processing completed!"))
-            success_msg = f"Processed {total_files} files successfully"
-            self.root.after(0, lambda msg=success_msg: self.status_var.set(msg))
-
-        except Exception as e:
-            error_msg = str(e)
-            self.root.after(0, lambda msg=error_msg: messagebox.showerror("Processing Error", msg))
-            self.root.after(0, lambda: self.progress_label.config(text="Processing failed"))
-
-    def process_single_file(self, pdf_path):
-        """Process a single PDF file"""
+            self.scheduler.submit(files, lane, label=os.path.basename(files[0]) if len(files) == 1 else
+                                  f"{len(files)} files", args=(config,),
+                                  context={'journal': journal, 'duplicates': []})
+        except SchedulerFull as e:
+            if journal is not None:
+                journal.finish()
+            messagebox.showwarning("Queue Full", f"Too many files are waiting to be processed ({e}).\n\n"
+                                   "Try again once the queue has drained.")
+            return
+        self.progress_label.config(text=f"Queued {len(files)} file(s) ({LANE_NAMES[lane]})")
+
+    def cancel_processing(self):
+        """Cancel every queued and running batch"""
+        jobs = self.scheduler.active()
+        if jobs and messagebox.askyesno("Cancel Processing", f"Cancel {len(jobs)} queued or running batch(es)?"):
+            self.scheduler.cancel_all()
+            self.progress_label.config(text="Cancelling...")
+
+    def finish_batch(self, job):
+        """Report a finished batch; runs on the Tk loop after the batch's last results were added"""
+        journal, duplicates = job.context['journal'], job.context['duplicates']
+        if journal is not None:
+            journal.finish()
+        self.scheduler.forget_finished()
+        self.refresh_diagnostics()
+        if job.state == job_scheduler.CANCELLED:
+            self.progress_label.config(text="Processing cancelled")
+            self.status_var.set(f"Cancelled {job.label} after {job.completed} of {len(job.files)} files")
+            return
+        if not self.scheduler.active():
+            self.progress_var.set(100)
+            self.progress_label.config(text="Processing completed!")
+        message = f"Processed {len(job.files)} files successfully ({self.format_cache_stats()})"
+        if duplicates:
+            verb = "skipped" if self.config.get('skip_duplicates', True) else "flagged"
+            message += f"; {verb} {len(duplicates)} duplicate(s)"
+        self.status_var.set(message)
+        if duplicates:
+            messagebox.showinfo("Duplicate Invoices", f"{len(duplicates)} duplicate invoice(s) {verb}:\n\n"
+                                + describe_duplicates(duplicates))
+
+    def update_queue_panel(self, stats):
+        """Show the scheduler's queue depth and wait times under the progress bar"""
+        if stats.total:
+            text = (f"Waiting: {stats.interactive} interactive, {stats.bulk} bulk | "
+                    f"Workers: {stats.running}/{stats.workers} busy | "
+                    f"Wait: oldest {stats.oldest_wait:.0f}s, average {stats.average_wait:.1f}s")
+        else:
+            text = ""
+        if text != self.queue_text:
+            self.queue_text = text
+            self.queue_label.config(text=text)
+            self.cancel_processing_btn.config(state=tk.NORMAL if stats.total else tk.DISABLED)
+
+    def drain_ui_queue(self):
+        """Apply the queued updates, then reschedule.
+
+        The next tick is scheduled even if applying this one raised, so a
+        single failing update cannot stop the queue from being drained.
+        """
         try:
-            # OCR extraction
-            full_text = self.ocr_pdf(pdf_path)
-
-            # Table extraction
-            tables = self.extract_tables(pdf_path)
-
-            # Parse invoice data
-            invoice_no, invoice_date, buyer, gstin = self.parse_invoice(full_text)
-
-            # Parse services
-            services = self.parse_services(tables, full_text)
-
-            # Add to summary
-            summary_row = {
-                'Invoice No': invoice_no,
-                'Invoice Date': invoice_date,
-                'Buyer': buyer,
-                'GSTIN': gstin,
-                'Line Items Count': len(services)
-            }
-
-            # Update UI in main thread
-            self.root.after(0, lambda: self.add_summary_row(summary_row))
-            self.root.after(0, lambda: self.add_service_rows(services))
-
-        except Exception as e:
-            error_msg = f"Error processing {pdf_path}: {str(e)}"
-            self.root.after(0, lambda msg=error_msg: messagebox.showerror("File Processing Error", msg))
-
-    def add_summary_row(self, row):
-        """Add row to summary treeview"""
-        item_id = self.summary_tree.insert('', 'end', values=(
-            row['Invoice No'], row['Invoice Date'], row['Buyer'],
-            row['GSTIN'], row['Line Items Count']
-        ))
-
-        # Store invoice data for reference
-        if not hasattr(self, 'invoice_data'):
-            self.invoice_data = {}
-        self.invoice_data[item_id] = row
-
-        # Store data for filtering
-        if not hasattr(self, 'original_summary_data'):
-            self.original_summary_data = []
-        self.original_summary_data.append(row)
+            self.apply_ui_updates()
+        finally:
+            self.root.after(UI_TICK_MS, self.drain_ui_queue)
+
+    def apply_ui_updates(self):
+        """Apply everything worker threads posted since the last tick.
+
+        Results are added as one batch, so the tables and stats labels are
+        refreshed once per tick however many files finished; progress and the
+        queue panel are updated once, and errors are reported together.
+        Batch journals record each file's outcome only after its result has
+        been saved to the database.
+        """
+        results, unsaved, errors, exports = [], [], [], {}
+        outcomes = {}  # journal -> [(file, status, result)]
+        progress_text = status = None
+        try:
+            while True:
+                kind, value = self.ui_queue.get_nowait()
+                if kind == 'file':
+                    job, file_path, result, error = value
+                    journal = job.context['journal']
+                    if isinstance(error, job_scheduler.JobCancelled):
+                        # Left out of the journal, like a file that never started
+                        continue
+                    progress_text = f"Completed: {os.path.basename(file_path)}"
+                    if error is not None:
+                        errors.append(("File Processing Error", f"Error processing {file_path}: {str(error)}"))
+                        if journal is not None:
+                            outcomes.setdefault(journal, []).append((file_path, 'error', None))
+                        continue
+                    self.cache_stats['hits' if result.get('cache_hit') else 'misses'] += 1
+                    self.batch_stats.add_file(result.get('stats'))
+                    status = self.format_cache_stats()
+                    duplicate = self.duplicate_index.check_and_add(result)
+                    if duplicate is not None:
+                        job.context['duplicates'].append(duplicate)
+                        if self.config.get('skip_duplicates', True):
+                            if journal is not None:
+                                outcomes.setdefault(journal, []).append((file_path, 'duplicate', None))
+                            continue
+                    results.append(result)
+                    unsaved.append(result)
+                    if journal is not None:
+                        outcomes.setdefault(journal, []).append((file_path, 'ok', result))
+                elif kind == 'loaded':
+                    generation, loaded = value
+                    # Chunks read before a Clear All belong to the old working set
+                    if generation == self.load_generation:
+                        for result in loaded:
+                            self.duplicate_index.add(result)
+                        results.extend(loaded)
+                elif kind == 'saved_keys':
+                    generation, saved_index = value
+                    if generation == self.load_generation:
+                        self.duplicate_index.merge_older(saved_index)
+                elif kind == 'job':
+                    if value.finished:
+                        # Report the batch after the results posted before it
+                        self.commit_results(results, unsaved, outcomes)
+                        results, unsaved, outcomes = [], [], {}
+                        status = progress_text = None
+                        self.finish_batch(value)
+                elif kind == 'status':
+                    status = value
+                elif kind == 'error':
+                    errors.append(value)
+                elif kind == 'export':
+                    exports[value.id] = value
+        except queue.Empty:
+            pass
+
+        self.commit_results(results, unsaved, outcomes)
+        stats = self.scheduler.stats()
+        if stats.total:
+            self.progress_var.set(stats.completed / stats.total * 100)
+            if progress_text is not None:
+                progress_text = f"{stats.completed}/{stats.total} {progress_text}"
+        if progress_text is not None:
+            self.progress_label.config(text=progress_text)
+        self.update_queue_panel(stats)
+        if status is not None:
+            self.status_var.set(status)
+        for job in exports.values():
+            self.on_export_update(job)
+        if errors:
+            title = errors[0][0] if len({t for t, _ in errors}) == 1 else "Processing Errors"
+            messagebox.showerror(title, "\n\n".join(msg for _, msg in errors[:10]) +
+                                 (f"\n\n...and {len(errors) - 10} more" if len(errors) > 10 else ""))
+
+    def format_cache_stats(self):
+        """Cache hit/miss summary for the status bar"""
+        return f"Cache: {self.cache_stats['hits']} hits, {self.cache_stats['misses']} misses"
+
+    def clear_result_cache(self):
+        """Delete all cached extraction results"""
+        if messagebox.askyesno("Clear Cache", "Delete all cached extraction results?"):
+            try:
+                cache = invoice_pipeline.open_cache(dict(self.config, use_cache=True))
+                cache.clear()
+                self.status_var.set("Result cache cleared.")
+            except Exception as e:
+                messagebox.showerror("Cache Error", str(e))
+
+    def open_database(self):
+        """Open the configured invoice database, show the first page of its working set
+        and read its duplicate-detection keys in the background"""
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+        self.db_cursor = self.db_end = self.db_pending = 0
+        self.db_fetched = set()
+        if not self.config.get('use_database', True):
+            return
+        path = database_path(self.config)
+        try:
+            self.db = InvoiceDatabase(path)
+            count = self.db.working_set_count()
+            end = self.db.working_set_end()
+        except (sqlite3.Error, OSError) as e:
+            self.db = None
+            self.status_var.set(f"Invoice database unavailable: {e}")
+            return
+        if count:
+            # Results saved from now on have higher ids and are already in the store
+            self.db_end, self.db_pending = end, count
+            self.load_saved_page()
+            self.status_var.set(f"{count} saved invoices in {path}")
+            thread = threading.Thread(target=self._load_duplicate_keys_thread, args=(path, self.load_generation))
+            thread.daemon = True
+            thread.start()
+
+    def _load_duplicate_keys_thread(self, path, generation):
+        """Index the saved working set's duplicate keys and post the index to the UI queue"""
+        try:
+            db = InvoiceDatabase(path)
+            saved_index = DuplicateIndex()
+            for chunk in db.iter_duplicate_keys():
+                if generation != self.load_generation:
+                    break
+                for keys in chunk:
+                    saved_index.add_saved(*keys)
+            db.close()
+        except sqlite3.Error as e:
+            self.ui_queue.put(('error', ("Database Error", f"Could not read saved invoices: {e}")))
+            return
+        self.ui_queue.put(('saved_keys', (generation, saved_index)))
+
+    def _read_saved_pages(self, wanted=None):
+        """Saved invoices after db_cursor, page by page, until ``wanted`` (None: all) are read"""
+        results = []
+        while self.db_cursor < self.db_end and (wanted is None or len(results) < wanted):
+            page = self.db.working_set_page(self.db_cursor, self.db_end)
+            if not page:
+                self.db_cursor = self.db_end
+                break
+            self.db_cursor = page[-1]['db_id']
+            for result in page:
+                if result['db_id'] in self.db_fetched:
+                    self.db_fetched.discard(result['db_id'])
+                else:
+                    results.append(result)
+        return results
+
+    def load_saved_page(self, wanted=LOAD_CHUNK):
+        """Add the next page of the saved working set to the tables; returns how many invoices were added"""
+        if self.db is None or not self.db_pending:
+            return 0
+        try:
+            results = self._read_saved_pages(wanted)
+        except sqlite3.Error as e:
+            self.status_var.set(f"Could not load saved invoices: {e}")
+            return 0
+        self.db_pending -= len(results)
+        self.add_invoices(results)
+        return len(results)
+
+    def load_more_saved(self, filtered):
+        """Page in more saved invoices when a table is scrolled to its end"""
+        # A filtered table already holds every saved match (see fetch_saved_matches)
+        if not filtered:
+            self.load_saved_page()
+
+    def load_all_saved(self):
+        """Page in the rest of the saved working set, for sorts and exports that need every invoice"""
+        if self.db is None or not self.db_pending:
+            return
+        self.status_var.set(f"Loading {self.db_pending} saved invoices...")
+        self.root.update_idletasks()
+        self.load_saved_page(wanted=None)
+
+    def fetch_saved_matches(self, **filters):
+        """Add the saved invoices not paged in yet that match a search (see
+        InvoiceDatabase.find_working_set), so the search covers the whole working set"""
+        if self.db is None or not self.db_pending:
+            return
+        try:
+            found = self.db.find_working_set(self.db_cursor, self.db_end, **filters)
+        except sqlite3.Error as e:
+            self.status_var.set(f"Could not search saved invoices: {e}")
+            return
+        results = [result for result in found if result['db_id'] not in self.db_fetched]
+        self.db_fetched.update(result['db_id'] for result in results)
+        self.db_pending -= len(results)
+        self.add_invoices(results)
+
+    def offer_resume(self):
+        """Offer to finish batches that were interrupted by a crash or the window closing"""
+        for journal in unfinished_journals():
+            pending = journal.pending()
+            # Without a database the journal holds the only copy of the finished results
+            if journal.keep_results:
+                done = journal.results()
+            else:
+                done = []
+            if pending and messagebox.askyesno(
+                    "Resume Batch",
+                    f"A batch of {len(journal.files)} files was interrupted with {len(pending)} still to process."
+                    "\n\nResume it?"):
+                if done:
+                    self.ui_queue.put(('loaded', (self.load_generation, done)))
+                self.process_files(pending, journal)
+                continue
+            if done and not pending:
+                self.ui_queue.put(('loaded', (self.load_generation, done)))
+            journal.finish()
+
+    def commit_results(self, results, unsaved, outcomes):
+        """Save, journal and display one tick's results, in that order"""
+        if self.save_results(unsaved):
+            for journal, journal_outcomes in outcomes.items():
+                try:
+                    journal.record(journal_outcomes)
+                except OSError as e:
+                    self.status_var.set(f"Could not write the batch journal: {e}")
+        self.add_invoices(results)
+
+    def save_results(self, results):
+        """Save new extraction results to the invoice database in one transaction; False if that failed"""
+        if not results or self.db is None:
+            return True
+        try:
+            self.db.add_results(results)
+        except (sqlite3.Error, OverflowError) as e:
+            self.status_var.set(f"Could not save to the invoice database: {e}")
+            return False
+        return True
+
+    def add_invoices(self, results):
+        """Store extraction results and append them to the summary and services tables"""
+        if not results:
+            return
+        new_invoices, new_services = [], []
+        for result in results:
+            invoice_id, service_ids = self.store.add_invoice(result['summary'], result['services'],
+                                                             os.path.basename(result.get('file', '')))
+
+            # Index the rows once here so filtering never rebuilds row text
+            summary_values = self.store.summary_values(invoice_id)
+            self.summary_index.add(row=' '.join(str(v) for v in summary_values), invoice_no=summary_values[0])
+            new_invoices.append(invoice_id)
+            for service_id in service_ids:
+                self.services_index.add(row=' '.join(str(v) for v in self.store.service_values(service_id)))
+                new_services.append(service_id)
+
+        # New rows go in at their sorted position (at the end when unsorted).
+        # Unfiltered, the view is the order list itself; filtered, only the new
+        # rows are checked against the filter.
+        self.summary_sorter.insert(self.summary_order, new_invoices, self.store.invoice_count)
+        if self.summary_matches is not None:
+            added = self.summary_index.query_added()
+            self.summary_matches.update(added)
+            self.summary_sorter.insert(self.summary_table.rows, added, self.store.invoice_count)
+        self.summary_table.set_rows(self.summary_table.rows)
+        self.services_sorter.insert(self.services_order, new_services, self.store.service_count)
+        if self.services_matches is not None and self.services_invoice_view is None:
+            added = self.services_index.query_added() if self.services_searched else new_services
+            if self.services_min_scaled is not None:
+                added = self.store.rows_at_least('Total Amount', self.services_min_scaled, added)
+            self.services_matches.update(added)
+            self.services_sorter.insert(self.services_table.rows, added, self.store.service_count)
+        self.services_table.set_rows(self.services_table.rows)
         self.update_stats()
         self.update_upload_stats()
 
-    def add_service_rows(self, services):
-        """Add rows to services treeview"""
-        if not hasattr(self, 'original_services_data'):
-            self.original_services_data = []
-
-        for service in services:
-            self.services_tree.insert('', 'end', values=service)
-            self.original_services_data.append(service)
-        self.update_stats()
-
     def update_stats(self):
         """Update statistics display"""
-        total_invoices = len(self.summary_tree.get_children())
-        total_services = len(self.services_tree.get_children())
+        total_invoices = len(self.summary_table.rows)
+        total_services = len(self.services_table.rows)
 
-        self.stats_label.config(text=f"Total Invoices: {total_invoices} | Total Services: {total_services}")
+        self.stats_label.config(text=f"Total Invoices: {total_invoices} | Total Services: {total_services}"
+                                     + (f" | {self.db_pending} saved invoices not loaded yet" if self.db_pending else ""))
         self.summary_selection_label.config(text=f"Total: {total_invoices} invoices")
         self.services_selection_label.config(text=f"Total: {total_services} services")
 
     def update_upload_stats(self):
         """Update upload tab statistics"""
-        total_invoices = len(self.summary_tree.get_children()) if hasattr(self, 'summary_tree') else 0
-        total_services = len(self.services_tree.get_children()) if hasattr(self, 'services_tree') else 0
+        total_invoices = len(self.summary_table.rows) if hasattr(self, 'summary_table') else 0
+        total_services = len(self.services_table.rows) if hasattr(self, 'services_table') else 0
 
         if hasattr(self, 'upload_stats_label'):
             self.upload_stats_label.config(text=f"Processed: {total_invoices} invoices, {total_services} services")
 
     # Search and Filter Functions
+    def schedule_summary_filter(self, event=None):
+        """Filter the summary once typing pauses"""
+        self._debounce('summary', self.filter_summary)
+
+    def schedule_services_filter(self, event=None):
+        """Filter the services once typing pauses"""
+        self._debounce('services', self.filter_services)
+
+    def _debounce(self, key, callback):
+        job = self._filter_jobs.pop(key, None)
+        if job is not None:
+            self.root.after_cancel(job)
+        self._filter_jobs[key] = self.root.after(FILTER_DEBOUNCE_MS, callback)
+
+    def _cancel_pending_filter(self, key):
+        job = self._filter_jobs.pop(key, None)
+        if job is not None:
+            self.root.after_cancel(job)
+
     def filter_summary(self, event=None):
         """Filter summary data based on search criteria"""
-        search_text = self.summary_search_var.get().lower()
-        filter_text = self.summary_filter_var.get().lower()
-
-        # Clear current display
-        for item in self.summary_tree.get_children():
-            self.summary_tree.delete(item)
-
-        # Re-add filtered items
-        if hasattr(self, 'original_summary_data'):
-            filtered_count = 0
-            for row_data in self.original_summary_data:
-                row_text = ' '.join(str(v).lower() for v in row_data.values())
-
-                show_row = True
-                if search_text and search_text not in row_text:
-                    show_row = False
-                if filter_text and filter_text not in str(row_data.get('Invoice No', '')).lower():
-                    show_row = False
-
-                if show_row:
-                    self.summary_tree.insert('', 'end', values=(
-                        row_data['Invoice No'], row_data['Invoice Date'],
-                        row_data['Buyer'], row_data['GSTIN'], row_data['Line Items Count']
-                    ))
-                    filtered_count += 1
-
-            self.summary_selection_label.config(text=f"Showing: {filtered_count} invoices")
+        self._cancel_pending_filter('summary')
+        terms = {'row': self.summary_search_var.get(), 'invoice_no': self.summary_filter_var.get()}
+        if any(terms.values()):
+            self.fetch_saved_matches(invoice_no=terms['invoice_no'], text=terms['row'])
+            self.summary_matches = set(self.summary_index.query(terms))
+        else:
+            self.summary_matches = None
+        self.apply_summary_view()
+        self.summary_selection_label.config(text=f"Showing: {len(self.summary_table.rows)} invoices")
 
     def filter_services(self, event=None):
         """Filter services data"""
-        search_text = self.services_search_var.get().lower()
-        min_amount = self.services_min_amount.get()
-
-        # Clear current display
-        for item in self.services_tree.get_children():
-            self.services_tree.delete(item)
-
-        # Re-add filtered items
-        if hasattr(self, 'original_services_data'):
-            filtered_count = 0
-            for service_data in self.original_services_data:
-                row_text = ' '.join(str(v).lower() for v in service_data)
-
-                show_row = True
-                if search_text and search_text not in row_text:
-                    show_row = False
-
-                if min_amount:
-                    try:
-                        service_amount = float(str(service_data[4]).replace(',', '').replace('₹', ''))
-                        min_amt = float(min_amount)
-                        if service_amount < min_amt:
-                            show_row = False
-                    except:
-                        pass
-
-                if show_row:
-                    self.services_tree.insert('', 'end', values=service_data)
-                    filtered_count += 1
-
-            self.services_selection_label.config(text=f"Showing: {filtered_count} services")
+        self._cancel_pending_filter('services')
+        self.services_invoice_view = None
+        min_amt = parse_scaled(self.services_min_amount.get()) if self.services_min_amount.get() else None
+        search_text = self.services_search_var.get()
+        self.services_searched = bool(search_text)
+        self.services_min_scaled = min_amt
+
+        if search_text or min_amt is not None:
+            self.fetch_saved_matches(line_item_text=search_text, min_amount=min_amt)
+            rows = self.services_index.query({'row': search_text}) if search_text else None
+            if min_amt is not None:
+                # One array comparison over the amounts parsed at ingest (paise),
+                # intersected with the text matches; unparsed amounts are kept, as before
+                rows = self.store.rows_at_least('Total Amount', min_amt, rows)
+            self.services_matches = set(rows)
+        else:
+            self.services_matches = None
+        self.apply_services_view()
+        self.services_selection_label.config(text=f"Showing: {len(self.services_table.rows)} services")
+
+    def apply_summary_view(self):
+        """Show the summary rows that pass the filter, in sort order"""
+        matches = self.summary_matches
+        if matches is None:
+            self.summary_table.set_rows(self.summary_order)
+        else:
+            self.summary_table.set_rows([row_id for row_id in self.summary_order if row_id in matches])
+
+    def apply_services_view(self):
+        """Show the service rows that pass the filter, in sort order"""
+        matches = self.services_matches
+        if matches is None:
+            self.services_table.set_rows(self.services_order)
+        else:
+            self.services_table.set_rows([row_id for row_id in self.services_order if row_id in matches])
 
     def clear_summary_filter(self):
         """Clear summary filters"""
@@ -729,141 +1279,145 @@ class InvoiceProcessorGUI:
 
     # Sorting Functions
     def sort_summary_column(self, col):
-        """Sort summary by column"""
-        data = [(self.summary_tree.set(item, col), item) for item in self.summary_tree.get_children('')]
-        data.sort(reverse=getattr(self, f'summary_{col}_reverse', False))
-
-        for index, (val, item) in enumerate(data):
-            self.summary_tree.move(item, '', index)
-
-        setattr(self, f'summary_{col}_reverse', not getattr(self, f'summary_{col}_reverse', False))
+        """Sort summary by column (earlier sort columns break ties)"""
+        # Sort the whole table, filtered-out rows included, so they reappear in order
+        self.load_all_saved()
+        reverse = self.summary_sorter.click(col)
+        self.summary_sorter.sort(self.summary_order, self.store.invoice_count)
+        self.summary_table.mark_sorted(col, reverse)
+        self.apply_summary_view()
 
     def sort_services_column(self, col):
-        """Sort services by column"""
-        data = [(self.services_tree.set(item, col), item) for item in self.services_tree.get_children('')]
-        data.sort(reverse=getattr(self, f'services_{col}_reverse', False))
-
-        for index, (val, item) in enumerate(data):
-            self.services_tree.move(item, '', index)
-
-        setattr(self, f'services_{col}_reverse', not getattr(self, f'services_{col}_reverse', False))
+        """Sort services by column (earlier sort columns break ties)"""
+        self.load_all_saved()
+        reverse = self.services_sorter.click(col)
+        self.services_sorter.sort(self.services_order, self.store.service_count)
+        self.services_table.mark_sorted(col, reverse)
+        self.apply_services_view()
 
     # Selection Handlers
     def on_summary_selection(self, event):
         """Handle summary selection"""
-        selection = self.summary_tree.selection()
+        selection = self.summary_table.selection()
         if selection:
-            item = selection[0]
-            values = self.summary_tree.item(item, 'values')
+            values = self.store.summary_values(selection[0])
             self.status_var.set(f"Selected invoice: {values[0]} - {values[2]}")
 
     def on_services_selection(self, event):
         """Handle services selection"""
-        selection = self.services_tree.selection()
+        selection = self.services_table.selection()
         if selection:
-            item = selection[0]
-            values = self.services_tree.item(item, 'values')
-            self.status_var.set(f"Selected service: {values[1][:50]}...")
+            values = self.store.service_values(selection[0])
+            self.status_var.set(f"Selected service: {str(values[1])[:50]}...")
 
     # Export Functions
-    def export_to_excel(self):
-        """Export all data to Excel"""
-        try:
-            # Get data from treeviews
-            summary_data = []
-            for child in self.summary_tree.get_children():
-                summary_data.append(self.summary_tree.item(child)['values'])
+    def export_sheets(self, file_stem, sheets, title="Export Complete"):
+        """Queue sheets for a background export in the configured format"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_dir = self.config['output_directory'] or os.getcwd()
+        fmt = self.config.get('export_format', 'xlsx')
+        base_path = self._unique_base_path(os.path.join(output_dir, f"{file_stem}_{timestamp}"), fmt, sheets)
+
+        job = self.export_queue.submit(file_stem, base_path, fmt, sheets)
+        self.export_titles[job.id] = title
+        self.status_var.set(f"Queued export: {file_stem} ({export_writers.FORMAT_LABELS.get(fmt, fmt)})")
+        return job
+
+    def _unique_base_path(self, base_path, fmt, sheets):
+        """Suffix base_path if a queued export or an existing file already uses it"""
+        taken = {job.base_path for job in self.export_queue.active()}
+        candidate, n = base_path, 1
+        while candidate in taken or any(os.path.exists(path) for path in
+                                        export_writers.export_paths(candidate, fmt, sheets)):
+            n += 1
+            candidate = f"{base_path}_{n}"
+        return candidate
+
+    def on_export_update(self, job):
+        """Show export progress, and report a job when it finishes (main thread)"""
+        if job.finished and job.id in self.export_titles:
+            title = self.export_titles.pop(job.id)
+            if job.state == export_jobs.DONE:
+                result = job.result
+                self.batch_stats.add_batch_time('export', result.seconds)
+                self.refresh_diagnostics()
+                self.status_var.set(f"Exported {len(result.files)} file(s) in {result.seconds:.2f}s: "
+                                    f"{result.files[0][0]}")
+                messagebox.showinfo(title, f"Data exported to:\n{export_writers.describe_export(result)}")
+                if len(result.files) == 1 and result.format != 'parquet':
+                    self.open_file(result.files[0][0])
+            elif job.state == export_jobs.FAILED:
+                self.status_var.set(f"Export failed: {job.label}")
+                messagebox.showerror("Export Error", job.error)
+            else:
+                self.status_var.set(f"Export cancelled: {job.label}")
+        self.update_export_panel()
+
+    def update_export_panel(self):
+        active = self.export_queue.active()
+        if not active:
+            self.export_queue.forget_finished()
+            self.export_frame.pack_forget()
+            return
 
-            services_data = []
-            for child in self.services_tree.get_children():
-                services_data.append(self.services_tree.item(child)['values'])
+        current = active[0]
+        if current.state == export_jobs.RUNNING:
+            done = f"{current.rows_written:,}" + (f"/{current.total_rows:,}" if current.total_rows else "")
+            text = f"Exporting {current.label} ({export_writers.FORMAT_LABELS.get(current.format, current.format)}): {done} rows"
+        else:
+            text = f"Starting {current.label}..."
+        if len(active) > 1:
+            text += f"  |  {len(active) - 1} more queued"
+        self.export_label.config(text=text)
+        self.export_progress_var.set(current.fraction() * 100)
+        if not self.export_frame.winfo_ismapped():
+            self.export_frame.pack(fill=tk.X, pady=(10, 0), before=self.status_frame)
+
+    def cancel_current_export(self):
+        active = self.export_queue.active()
+        if active:
+            self.export_queue.cancel(active[0])
 
-            if not summary_data and not services_data:
+    def export_to_excel(self):
+        """Export all data"""
+        try:
+            self.load_all_saved()
+            if not self.store.invoice_count and not self.store.service_count:
                 messagebox.showwarning("No Data", "No data to export.")
                 return
 
-            # Create DataFrames
-            summary_df = pd.DataFrame(summary_data,
-                                      columns=['Invoice No', 'Invoice Date', 'Buyer', 'GSTIN',
-                                               'Line Items Count']) if summary_data else pd.DataFrame()
-            services_df = pd.DataFrame(services_data,
-                                       columns=['S.No', 'Description of Services', 'Quantity', 'Rate',
-                                                'Total Amount']) if services_data else pd.DataFrame()
-
-            # Save to Excel
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_dir = self.config['output_directory'] or os.getcwd()
-            excel_path = os.path.join(output_dir, f"Invoice_Export_{timestamp}.xlsx")
-
-            with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                if not summary_df.empty:
-                    summary_df.to_excel(writer, sheet_name='Summary', index=False)
-                if not services_df.empty:
-                    services_df.to_excel(writer, sheet_name='Services', index=False)
-
-            messagebox.showinfo("Export Complete", f"Data exported to: {excel_path}")
-            self.status_var.set(f"Data exported to: {excel_path}")
-
-            self.open_file(excel_path)
+            sheets = []
+            if self.store.invoice_count:
+                sheets.append(self.store.summary_sheet('Summary'))
+            if self.store.service_count:
+                sheets.append(self.store.services_sheet('Services'))
+            self.export_sheets("Invoice_Export", sheets)
 
         except Exception as e:
             messagebox.showerror("Export Error", str(e))
 
     def export_services_only(self):
-        """Export only services data to Excel"""
+        """Export only services data"""
         try:
-            services_data = []
-            for child in self.services_tree.get_children():
-                services_data.append(self.services_tree.item(child)['values'])
-
-            if not services_data:
+            self.load_all_saved()
+            if not self.store.service_count:
                 messagebox.showwarning("No Data", "No services data to export.")
                 return
 
-            services_df = pd.DataFrame(services_data,
-                                       columns=['S.No', 'Description of Services', 'Quantity', 'Rate', 'Total Amount'])
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_dir = self.config['output_directory'] or os.getcwd()
-            excel_path = os.path.join(output_dir, f"Services_Export_{timestamp}.xlsx")
-
-            services_df.to_excel(excel_path, sheet_name='Services', index=False, engine='openpyxl')
-
-            messagebox.showinfo("Export Complete", f"Services data exported to:\n{excel_path}")
-            self.status_var.set(f"Services exported to: {excel_path}")
-
-            self.open_file(excel_path)
+            self.export_sheets("Services_Export", [self.store.services_sheet('Services')])
 
         except Exception as e:
             messagebox.showerror("Export Error", str(e))
 
     def export_summary_only(self):
-        """Export only summary data to Excel"""
+        """Export only summary data"""
         try:
-            # Get data from summary treeview only
-            summary_data = []
-            for child in self.summary_tree.get_children():
-                summary_data.append(self.summary_tree.item(child)['values'])
-
-            if not summary_data:
+            self.load_all_saved()
+            if not self.store.invoice_count:
                 messagebox.showwarning("No Data", "No summary data to export.")
                 return
 
-            # Create DataFrame
-            summary_df = pd.DataFrame(summary_data,
-                                      columns=['Invoice No', 'Invoice Date', 'Buyer', 'GSTIN', 'Line Items Count'])
-
-            # Save to Excel
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_dir = self.config['output_directory'] or os.getcwd()
-            excel_path = os.path.join(output_dir, f"Invoice_Summary_{timestamp}.xlsx")
-
-            summary_df.to_excel(excel_path, sheet_name='Summary', index=False, engine='openpyxl')
-
-            messagebox.showinfo("Export Complete", f"Summary data exported to:\n{excel_path}")
-            self.status_var.set(f"Summary exported to: {excel_path}")
-
-            self.open_file(excel_path)
+            self.export_sheets("Invoice_Summary", [self.store.summary_sheet('Summary')])
 
         except Exception as e:
             messagebox.showerror("Export Error", str(e))
@@ -871,27 +1425,15 @@ class InvoiceProcessorGUI:
     def export_filtered_summary(self):
         """Export currently filtered summary data"""
         try:
-            summary_data = []
-            for child in self.summary_tree.get_children():
-                summary_data.append(self.summary_tree.item(child)['values'])
-
-            if not summary_data:
+            # Rows currently shown, in display order (unfiltered, that is every invoice)
+            if self.summary_matches is None:
+                self.load_all_saved()
+            summary_rows = list(self.summary_table.rows)
+            if not summary_rows:
                 messagebox.showwarning("No Data", "No filtered data to export.")
                 return
 
-            summary_df = pd.DataFrame(summary_data,
-                                      columns=['Invoice No', 'Invoice Date', 'Buyer', 'GSTIN', 'Line Items Count'])
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_dir = self.config['output_directory'] or os.getcwd()
-            excel_path = os.path.join(output_dir, f"Filtered_Summary_{timestamp}.xlsx")
-
-            summary_df.to_excel(excel_path, sheet_name='Filtered_Summary', index=False, engine='openpyxl')
-
-            messagebox.showinfo("Export Complete", f"Filtered summary exported to:\n{excel_path}")
-            self.status_var.set(f"Filtered data exported to: {excel_path}")
-
-            self.open_file(excel_path)
+            self.export_sheets("Filtered_Summary", [self.store.summary_sheet('Filtered_Summary', summary_rows)])
 
         except Exception as e:
             messagebox.showerror("Export Error", str(e))
@@ -899,98 +1441,45 @@ class InvoiceProcessorGUI:
     def export_filtered_services(self):
         """Export currently filtered services data"""
         try:
-            services_data = []
-            for child in self.services_tree.get_children():
-                services_data.append(self.services_tree.item(child)['values'])
-
-            if not services_data:
+            if self.services_matches is None:
+                self.load_all_saved()
+            services_rows = list(self.services_table.rows)
+            if not services_rows:
                 messagebox.showwarning("No Data", "No filtered services to export.")
                 return
 
-            services_df = pd.DataFrame(services_data,
-                                       columns=['S.No', 'Description of Services', 'Quantity', 'Rate', 'Total Amount'])
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_dir = self.config['output_directory'] or os.getcwd()
-            excel_path = os.path.join(output_dir, f"Filtered_Services_{timestamp}.xlsx")
-
-            services_df.to_excel(excel_path, sheet_name='Filtered_Services', index=False, engine='openpyxl')
-
-            messagebox.showinfo("Export Complete", f"Filtered services exported to:\n{excel_path}")
-            self.status_var.set(f"Filtered services exported to: {excel_path}")
-
-            self.open_file(excel_path)
+            self.export_sheets("Filtered_Services", [self.store.services_sheet('Filtered_Services', services_rows)])
 
         except Exception as e:
             messagebox.showerror("Export Error", str(e))
 
     def export_detailed_report(self):
-        """Export detailed report with summary and services"""
+        """Export detailed report with summary, services and statistics"""
         try:
-            # Get all data
-            summary_data = []
-            for child in self.summary_tree.get_children():
-                summary_data.append(self.summary_tree.item(child)['values'])
-
-            services_data = []
-            for child in self.services_tree.get_children():
-                services_data.append(self.services_tree.item(child)['values'])
-
-            if not summary_data and not services_data:
+            self.load_all_saved()
+            if not self.store.invoice_count and not self.store.service_count:
                 messagebox.showwarning("No Data", "No data to export.")
                 return
 
-            # Create DataFrames
-            summary_df = pd.DataFrame(summary_data, columns=['Invoice No', 'Invoice Date', 'Buyer', 'GSTIN',
-                                                             'Line Items Count']) if summary_data else pd.DataFrame()
-            services_df = pd.DataFrame(services_data, columns=['S.No', 'Description of Services', 'Quantity', 'Rate',
-                                                               'Total Amount']) if services_data else pd.DataFrame()
-
-            # Calculate totals
-            if not services_df.empty:
-                try:
-                    # Clean and calculate totals
-                    services_df['Amount_Numeric'] = services_df['Total Amount'].astype(str).str.replace(',',
-                                                                                                        '').str.replace(
-                        '₹', '').astype(float)
-                    total_amount = services_df['Amount_Numeric'].sum()
-                    total_services = len(services_df)
-
-                    # Create summary statistics
-                    stats_data = [
-                        ['Total Invoices', len(summary_df) if not summary_df.empty else 0],
-                        ['Total Services', total_services],
-                        ['Total Amount', f"₹{total_amount:,.2f}"],
-                        ['Average Amount per Service',
-                         f"₹{total_amount / total_services:,.2f}" if total_services > 0 else "₹0.00"]
-                    ]
-                    stats_df = pd.DataFrame(stats_data, columns=['Metric', 'Value'])
-
-                except Exception as e:
-                    print(f"Error calculating totals: {e}")
-                    stats_df = pd.DataFrame()
-            else:
-                stats_df = pd.DataFrame()
+            sheets = []
+            if self.store.invoice_count:
+                sheets.append(self.store.summary_sheet('Invoice_Summary'))
+            if self.store.service_count:
+                sheets.append(self.store.services_sheet('Service_Details'))
 
-            # Save to Excel
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_dir = self.config['output_directory'] or os.getcwd()
-            excel_path = os.path.join(output_dir, f"Detailed_Report_{timestamp}.xlsx")
-
-            with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                if not summary_df.empty:
-                    summary_df.to_excel(writer, sheet_name='Invoice_Summary', index=False)
-                if not services_df.empty:
-                    services_df.drop('Amount_Numeric', axis=1, errors='ignore').to_excel(writer,
-                                                                                         sheet_name='Service_Details',
-                                                                                         index=False)
-                if not stats_df.empty:
-                    stats_df.to_excel(writer, sheet_name='Statistics', index=False)
-
-            messagebox.showinfo("Export Complete", f"Detailed report exported to:\n{excel_path}")
-            self.status_var.set(f"Detailed report exported to: {excel_path}")
+                # Amounts were parsed once when the invoices were stored
+                total_amount, parsed, unparsed = self.store.column_total('Total Amount')
+                avg_amount = round(total_amount / parsed) if parsed else 0
+                stats_data = [
+                    ('Total Invoices', self.store.invoice_count),
+                    ('Total Services', self.store.service_count),
+                    ('Total Amount', f"₹{format_scaled(total_amount)}"),
+                    ('Average Amount per Service', f"₹{format_scaled(avg_amount)}"),
+                    ('Amounts Not Parsed', unparsed)
+                ]
+                sheets.append(Sheet('Statistics', ['Metric', 'Value'], stats_data))
 
-            self.open_file(excel_path)
+            self.export_sheets("Detailed_Report", sheets)
 
         except Exception as e:
             messagebox.showerror("Export Error", str(e))
@@ -998,57 +1487,30 @@ class InvoiceProcessorGUI:
     def quick_export_all(self):
         """Quick export all data with default settings"""
         try:
+            self.load_all_saved()
             # Check if we have any data
-            summary_count = len(self.summary_tree.get_children()) if hasattr(self, 'summary_tree') else 0
-            services_count = len(self.services_tree.get_children()) if hasattr(self, 'services_tree') else 0
+            summary_count = self.store.invoice_count
+            services_count = self.store.service_count
 
             if summary_count == 0 and services_count == 0:
                 messagebox.showwarning("No Data", "No data available to export. Please process some invoices first.")
                 return
 
-            # Export with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_dir = self.config['output_directory'] or os.getcwd()
+            sheets = []
+            if summary_count:
+                sheets.append(self.store.summary_sheet('Invoice_Summary'))
+            if services_count:
+                sheets.append(self.store.services_sheet('Service_Details'))
 
-            # Get data
-            summary_data = []
-            if hasattr(self, 'summary_tree'):
-                for child in self.summary_tree.get_children():
-                    summary_data.append(self.summary_tree.item(child)['values'])
-
-            services_data = []
-            if hasattr(self, 'services_tree'):
-                for child in self.services_tree.get_children():
-                    services_data.append(self.services_tree.item(child)['values'])
-
-            # Create file path
-            excel_path = os.path.join(output_dir, f"Quick_Export_{timestamp}.xlsx")
-
-            # Export to Excel
-            with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                if summary_data:
-                    summary_df = pd.DataFrame(summary_data, columns=['Invoice No', 'Invoice Date', 'Buyer', 'GSTIN',
-                                                                     'Line Items Count'])
-                    summary_df.to_excel(writer, sheet_name='Invoice_Summary', index=False)
-
-                if services_data:
-                    services_df = pd.DataFrame(services_data,
-                                               columns=['S.No', 'Description of Services', 'Quantity', 'Rate',
-                                                        'Total Amount'])
-                    services_df.to_excel(writer, sheet_name='Service_Details', index=False)
-
-                # Add summary statistics
-                stats_data = [
-                    ['Total Invoices', summary_count],
-                    ['Total Services', services_count],
-                    ['Export Date', datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-                ]
-                stats_df = pd.DataFrame(stats_data, columns=['Metric', 'Value'])
-                stats_df.to_excel(writer, sheet_name='Export_Info', index=False)
+            # Add summary statistics
+            stats_data = [
+                ('Total Invoices', summary_count),
+                ('Total Services', services_count),
+                ('Export Date', datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            ]
+            sheets.append(Sheet('Export_Info', ['Metric', 'Value'], stats_data))
 
-            messagebox.showinfo("Quick Export Complete", f"Data exported to:\n{excel_path}")
-            self.status_var.set(f"Quick export completed: {excel_path}")
-            self.open_file(excel_path)
+            self.export_sheets("Quick_Export", sheets, title="Quick Export Complete")
 
         except Exception as e:
             messagebox.showerror("Quick Export Error", str(e))
@@ -1056,70 +1518,88 @@ class InvoiceProcessorGUI:
     def calculate_service_totals(self):
         """Calculate and display service totals"""
         try:
-            services_data = []
-            for child in self.services_tree.get_children():
-                services_data.append(self.services_tree.item(child)['values'])
-
-            if not services_data:
+            # Totals over the rows currently shown (unfiltered, that is every line item)
+            if self.services_matches is None:
+                self.load_all_saved()
+            services_rows = self.services_table.rows
+            if not services_rows:
                 messagebox.showinfo("No Data", "No services data to calculate.")
                 return
 
-            total_amount = 0
-            total_services = len(services_data)
+            total_services = len(services_rows)
+            total_amount, parsed, unparsed = self.store.column_total('Total Amount', services_rows)
 
-            for service in services_data:
-                try:
-                    amount_str = str(service[4]).replace(',', '').replace('₹', '')
-                    amount = float(amount_str)
-                    total_amount += amount
-                except:
-                    pass
-
-            avg_amount = total_amount / total_services if total_services > 0 else 0
+            # Average over the amounts that parsed; the rest are counted, not silently dropped
+            avg_amount = round(total_amount / parsed) if parsed else 0
 
             result_msg = f"""Service Totals Summary:
 
 Total Services: {total_services}
-Total Amount: ₹{total_amount:,.2f}  
-Average Amount: ₹{avg_amount:,.2f}
+Total Amount: ₹{format_scaled(total_amount)}
+Average Amount: ₹{format_scaled(avg_amount)}
             """
+            if unparsed:
+                result_msg += f"\n{unparsed} amount(s) could not be read and are not included."
 
             messagebox.showinfo("Service Totals", result_msg)
-            self.status_var.set(f"Calculated totals: {total_services} services, ₹{total_amount:,.2f}")
+            self.status_var.set(f"Calculated totals: {total_services} services, ₹{format_scaled(total_amount)}")
 
         except Exception as e:
             messagebox.showerror("Calculation Error", str(e))
 
     def view_selected_services(self):
         """Switch to services tab and filter by selected invoice"""
-        selection = self.summary_tree.selection()
+        selection = self.summary_table.selection()
         if not selection:
             messagebox.showinfo("No Selection", "Please select an invoice from the summary first.")
             return
 
-        item = selection[0]
-        invoice_no = self.summary_tree.item(item, 'values')[0]
+        invoice_id = selection[0]
+        invoice_no = self.store.summary_value(invoice_id, 'Invoice No')
 
         # Switch to services tab
         self.notebook.select(2)  # Services tab is index 2
 
-        # Filter services by invoice (you might need to store invoice mapping)
+        # Filter services to the invoice's line items (Clear shows everything again)
+        self._cancel_pending_filter('services')
+        self.services_search_var.set("")
+        self.services_min_amount.set("")
+        self.services_matches = set(self.store.invoice_services(invoice_id))
+        self.services_invoice_view = invoice_id
+        self.apply_services_view()
+        self.services_selection_label.config(text=f"Showing: {len(self.services_table.rows)} services")
         self.status_var.set(f"Viewing services for invoice: {invoice_no}")
 
     def clear_all_data(self):
         """Clear all data from the interface"""
-        if messagebox.askyesno("Clear Data", "Are you sure you want to clear all processed data?"):
-            # Clear treeviews
-            for item in self.summary_tree.get_children():
-                self.summary_tree.delete(item)
-            for item in self.services_tree.get_children():
-                self.services_tree.delete(item)
-
-            # Clear stored data
-            if hasattr(self, 'original_summary_data'):
-                self.original_summary_data = []
-            if hasattr(self, 'original_services_data'):
-                self.original_services_data = []
+        if messagebox.askyesno("Clear Data", "Are you sure you want to clear all processed data?\n\n"
+                                             "Saved invoices stay in the invoice database for searches."):
+            # Clear stored data; the database keeps it out of the working set from now on
+            self.load_generation += 1
+            self.db_cursor, self.db_pending = self.db_end, 0
+            self.db_fetched = set()
+            if self.db is not None:
+                try:
+                    self.db.clear_working_set()
+                except sqlite3.Error as e:
+                    messagebox.showerror("Database Error", str(e))
+            self.store.clear()
+            self.duplicate_index.clear()
+            self.summary_index.clear()
+            self.services_index.clear()
+            self.summary_sorter.clear()
+            self.services_sorter.clear()
+            self.summary_table.mark_sorted(None, False)
+            self.services_table.mark_sorted(None, False)
+            self.summary_order = []
+            self.services_order = []
+            self.summary_matches = None
+            self.services_matches = None
+            self.services_searched = False
+            self.services_min_scaled = None
+            self.services_invoice_view = None
+            self.summary_table.set_rows(self.summary_order)
+            self.services_table.set_rows(self.services_order)
 
             # Reset filters
             self.summary_search_var.set("")
@@ -1141,23 +1621,19 @@ Average Amount: ₹{avg_amount:,.2f}
     def export_template(self):
         """Export a template Excel file"""
         try:
-            # Create template data
-            summary_template = pd.DataFrame(
-                columns=['Invoice No', 'Invoice Date', 'Buyer', 'GSTIN', 'Line Items Count'])
-            services_template = pd.DataFrame(
-                columns=['S.No', 'Description of Services', 'Quantity', 'Rate', 'Total Amount'])
-
-            # Add sample rows
-            summary_template.loc[0] = ['INV001', '2024-01-01', 'Sample Company Ltd', '12ABCDE1234F1Z5', 1]
-            services_template.loc[0] = [1, 'Sample Service Description', '1.00 Nos', '1000.00', '1000.00']
+            # Template columns with one sample row each
+            summary_template = Sheet('Invoice_Summary_Template', invoice_pipeline.SUMMARY_COLUMNS,
+                                     [('INV001', '2024-01-01', 'Sample Company Ltd', '12ABCDE1234F1Z5', 1)])
+            services_template = Sheet('Services_Template', invoice_pipeline.SERVICE_COLUMNS,
+                                      [(1, 'Sample Service Description', '1.00 Nos', '1000.00', '1000.00')])
 
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_dir = self.config['output_directory'] or os.getcwd()
-            excel_path = os.path.join(output_dir, f"Template_{timestamp}.xlsx")
+            base_path = os.path.join(output_dir, f"Template_{timestamp}")
 
-            with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                summary_template.to_excel(writer, sheet_name='Invoice_Summary_Template', index=False)
-                services_template.to_excel(writer, sheet_name='Services_Template', index=False)
+            # Templates are always workbooks, whatever the export format
+            excel_path = export_writers.write_export(base_path, 'xlsx',
+                                                     [summary_template, services_template]).files[0][0]
 
             messagebox.showinfo("Template Export Complete", f"Template exported to:\n{excel_path}")
             self.status_var.set(f"Template exported to: {excel_path}")
@@ -1176,202 +1652,123 @@ Average Amount: ₹{avg_amount:,.2f}
             except:
                 subprocess.Popen(['xdg-open', file_path])
 
-    # Invoice processing methods
+    # Invoice processing methods (implemented in invoice_pipeline so worker processes can run them)
     def ocr_pdf(self, pdf_path):
         """Extract text from PDF using OCR or direct text extraction"""
-        try:
-            # First try direct text extraction (faster, no OCR needed)
-            with pdfplumber.open(pdf_path) as pdf:
-                text = ""
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-
-                # If we got text, return it
-                if text.strip():
-                    return text
-
-            # If no text found, try OCR as fallback
-            try:
-                poppler_path = self.config['poppler_path'] or None
-                if poppler_path and not os.path.exists(poppler_path):
-                    raise Exception(f"Poppler path not found: {poppler_path}")
-
-                pages = convert_from_path(pdf_path, dpi=300, poppler_path=poppler_path)
-                text = ""
-                for page in pages:
-                    text += pytesseract.image_to_string(page, lang="eng") + "\n"
-                return text
-            except Exception as ocr_error:
-                suggested_path = "C:\\poppler-25.07.0\\Library\\bin"
-                raise Exception(f"OCR failed: {str(ocr_error)}\n\nSuggested Poppler path: {suggested_path}")
-
-        except Exception as e:
-            raise Exception(f"Text extraction failed: {str(e)}")
+        return invoice_pipeline.ocr_pdf(pdf_path, self.config)
 
     def extract_tables(self, pdf_path):
         """Extract tables from PDF"""
-        rows = []
-        try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    tables = page.extract_tables()
-                    for table in tables:
-                        for row in table:
-                            if any(row):
-                                rows.append([c.strip() if c else "" for c in row])
-        except Exception as e:
-            raise Exception(f"Table extraction failed: {str(e)}")
-        return rows
+        return invoice_pipeline.extract_tables(pdf_path)
 
     def extract_field(self, patterns, text):
         """Extract field using regex patterns"""
-        for pat in patterns:
-            try:
-                m = re.search(pat, text, flags=re.IGNORECASE)
-                if m:
-                    # Check if pattern has groups
-                    if m.groups():
-                        return m.group(1).strip()
-                    else:
-                        # Return the entire match if no groups
-                        return m.group(0).strip()
-            except Exception as e:
-                print(f"Regex error with pattern '{pat}': {e}")
-                continue
-        return ""
+        return invoice_pipeline.extract_field(patterns, text)
 
     def parse_invoice(self, text):
         """Parse invoice header information"""
-        # Debug: Print extracted text (first 500 chars)
-        print("=== EXTRACTED TEXT (First 500 chars) ===")
-        print(text[:500])
-        print("=" * 50)
-
-        # More flexible patterns for your invoice format
-        invoice_no = self.extract_field([
-            r"(H/AMC/\d+/\d+)",  # Specific pattern for your invoice with group
-            r"Invoice\s*No\.?\s*[:\-]?\s*([A-Z0-9\/\-]+)",
-            r"Dated\s+(H/AMC/\d+/\d+)"
-        ], text)
-
-        invoice_date = self.extract_field([
-            r"(\d{1,2}[-/][A-Za-z]+[-/]\d{2,4})",  # 27-Feb-25
-            r"Ack\s*Date\s*[:\-]?\s*(\d{1,2}[-/][A-Za-z]+[-/]\d{2,4})"
-        ], text)
-
-        # Look for buyer information more specifically
-        buyer = self.extract_field([
-            r"Buyer.*?\n\s*([A-Za-z\s]+(?:Ltd|Limited|Inc|Corporation))",
-            r"Bill to.*?\n\s*([A-Za-z\s]+(?:Ltd|Limited|Inc|Corporation))",
-            r"(Bharat Electronics Ltd)"  # Specific for your invoice
-        ], text)
-
-        # Look for GSTIN with more flexible patterns
-        gstin = self.extract_field([
-            r"GSTIN/UIN\s*[:\-]?\s*([A-Z0-9]{15})",  # Standard GSTIN format
-            r"GSTIN[:\s]*([A-Z0-9]{15})",
-            r"(36AAACB5985C1ZQ)"  # Specific for your buyer
-        ], text)
-
-        print(f"Parsed Results:")
-        print(f"Invoice No: '{invoice_no}'")
-        print(f"Invoice Date: '{invoice_date}'")
-        print(f"Buyer: '{buyer}'")
-        print(f"GSTIN: '{gstin}'")
-        print("-" * 50)
-
-        return invoice_no, invoice_date, buyer, gstin
+        return invoice_pipeline.parse_invoice(text, self.config.get('field_patterns_file') or None)
 
     def parse_services(self, tables, text):
         """Parse service line items"""
-        services = []
-
-        print("=== PARSING SERVICES ===")
-        print(f"Found {len(tables)} tables")
-
-        # Debug: Print table data
-        for i, table in enumerate(tables):
-            print(f"Table {i}: {table}")
-
-        # Simple and safe approach - look for known values
-        if "AMC" in text and "4,06,450.00" in text:
-            services.append([
-                "1",
-                "AMC Services PCs,Printers,Laptops & Network (Period:01-11-2024 to 31-01-2025)",
-                "1.00 Nos",
-                "4,06,450.00",
-                "4,06,450.00"
-            ])
-            print("Added AMC service based on known values")
-
-        # Try to extract from tables
-        if not services:
-            for row in tables:
-                if row and len(row) >= 3:
-                    row_text = " ".join([str(cell) for cell in row if cell])
-                    print(f"Checking row: {row_text}")
-
-                    if "AMC" in row_text.upper() or "SERVICE" in row_text.upper():
-                        # Ensure we have 5 columns
-                        processed_row = []
-                        for i in range(5):
-                            if i < len(row):
-                                processed_row.append(str(row[i]).strip() if row[i] else "")
-                            else:
-                                processed_row.append("")
-                        services.append(processed_row)
-                        print(f"Added service from table: {processed_row}")
-
-        print(f"Final services found: {services}")
-        print("=" * 50)
-
-        return services
+        return invoice_pipeline.parse_services(tables, text)
 
     def load_config(self):
         """Load configuration from file"""
-        config_file = 'invoice_processor_config.json'
-        if os.path.exists(config_file):
-            try:
-                with open(config_file, 'r') as f:
-                    self.config.update(json.load(f))
-            except Exception:
-                pass
+        self.config.update(invoice_pipeline.load_config())
 
     def save_config(self):
         """Save configuration to file"""
         self.config['poppler_path'] = self.poppler_var.get()
         self.config['tesseract_path'] = self.tesseract_var.get()
         self.config['output_directory'] = self.output_var.get()
+        self.config['use_process_pool'] = self.use_pool_var.get()
+        try:
+            self.config['max_workers'] = max(1, int(self.max_workers_var.get()))
+        except (tk.TclError, ValueError):
+            self.config['max_workers'] = os.cpu_count() or 1
+            self.max_workers_var.set(self.config['max_workers'])
+        try:
+            self.config['raster_memory_mb'] = max(32, int(self.raster_memory_var.get()))
+        except (tk.TclError, ValueError):
+            self.raster_memory_var.set(self.config['raster_memory_mb'])
+        self.config['use_cache'] = self.use_cache_var.get()
+        database_changed = (self.use_database_var.get() != self.config.get('use_database', True) or
+                            self.database_var.get() != database_path(self.config))
+        self.config['skip_duplicates'] = self.skip_duplicates_var.get()
+        self.config['use_database'] = self.use_database_var.get()
+        self.config['database_file'] = self.database_var.get()
+        self.config['export_format'] = next((fmt for fmt, label in export_writers.FORMAT_LABELS.items()
+                                             if label == self.export_format_var.get()), 'xlsx')
+        try:
+            self.config['cache_max_mb'] = max(16, int(self.cache_max_var.get()))
+        except (tk.TclError, ValueError):
+            self.cache_max_var.set(self.config['cache_max_mb'])
 
         # Set tesseract path if provided
-        if self.config['tesseract_path']:
-            pytesseract.pytesseract.tesseract_cmd = self.config['tesseract_path']
+        invoice_pipeline.apply_tesseract_path(self.config)
+        self.configure_scheduler()
+
+        # New results go to the newly chosen database; its saved invoices are
+        # only loaded at the next start, so the working set is not mixed up
+        if database_changed:
+            self.load_generation += 1
+            self.db_cursor = self.db_end = self.db_pending = 0
+            self.db_fetched = set()
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+            if self.config['use_database']:
+                try:
+                    self.db = InvoiceDatabase(database_path(self.config))
+                except (sqlite3.Error, OSError) as e:
+                    messagebox.showerror("Database Error", f"Could not open the invoice database: {e}")
 
         try:
-            with open('invoice_processor_config.json', 'w') as f:
+            with open(invoice_pipeline.CONFIG_FILE, 'w') as f:
                 json.dump(self.config, f, indent=4)
             messagebox.showinfo("Settings Saved", "Configuration saved successfully!")
         except Exception as e:
             messagebox.showerror("Save Error", f"Failed to save configuration: {str(e)}")
 
+    def on_close(self):
+        """Confirm before quitting with exports still queued or running"""
+        if self.export_queue.active():
+            if not messagebox.askyesno("Exports Running", "Exports are still running. Cancel them and quit?"):
+                return
+            self.export_queue.cancel_all()
+            # Let the running export stop and remove its partial files
+            self.export_queue.wait(timeout=5)
+        # Files still queued stay in their batch journals and are offered for resuming at the next start
+        self.scheduler.shutdown()
+        if self.db is not None:
+            self.db.close()
+        self.root.destroy()
+
     def run(self):
         """Run the application"""
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.root.mainloop()
 
 
+def missing_dependencies():
+    """Names of required packages that are not installed (checked without importing them)"""
+    from importlib.util import find_spec
+
+    required = ['tkinterdnd2', 'pdfplumber', 'pytesseract', 'pdf2image', 'pandas', 'PIL', 'openpyxl']
+    return [name for name in required if find_spec(name) is None]
+
+
 if __name__ == "__main__":
+    import multiprocessing
+
+    # Required for the process pool in frozen Windows builds
+    multiprocessing.freeze_support()
+
     # Check dependencies
-    try:
-        import tkinterdnd2
-        import pdfplumber
-        import pytesseract
-        import pdf2image
-        import pandas
-        from PIL import Image
-    except ImportError as e:
-        print(f"Missing dependency: {e}")
+    missing = missing_dependencies()
+    if missing:
+        print(f"Missing dependency: {', '.join(missing)}")
         print("\nPlease install required packages:")
         print("pip install tkinterdnd2 pdfplumber pytesseract pdf2image pandas pillow openpyxl")
         exit(1)
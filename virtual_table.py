@@ -0,0 +1,258 @@
+"""Virtualized spreadsheet view over an in-memory list of rows.
+
+A plain ttk.Treeview keeps one Tk item per row, which gets slow and
+memory-hungry past a few tens of thousands of rows. VirtualTable keeps a
+fixed pool of Treeview items, one per row that fits on screen, and fills
+them from the model for whatever window is scrolled into view. The model
+is just a list of row ids in display order (``rows``) plus a callback that
+returns a row's values, so sorting and filtering are list operations and
+cost one re-render.
+
+Selection is tracked by row id, so it survives scrolling, sorting and
+filtering. Selection changes are announced with a ``<<TableSelect>>``
+virtual event on the VirtualTable frame. Keyboard navigation looks rows up
+in a row id -> position map, built on first use and extended as rows are
+appended, rather than scanning ``rows``.
+
+``on_end`` is called (after the render, from the event loop) whenever the
+last rows come into view, so a lazily loaded model can page more rows in.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualTable(ttk.Frame):
+    def __init__(self, parent, columns, get_values, widths=None, anchors=None, on_sort=None,
+                 on_end=None, style='Treeview'):
+        super().__init__(parent)
+        self.columns = tuple(columns)
+        self.get_values = get_values
+        self.rows = []
+        self.top = 0
+        self.selected = set()
+        self.cursor = None
+        self._anchor = None
+        self._positions = {}
+        self._slots = []
+        self._attached = 0
+        self.on_end = on_end
+        self._end_pending = False
+
+        self.tree = ttk.Treeview(self, columns=self.columns, show='headings', style=style,
+                                 selectmode='none', height=1)
+        for i, col in enumerate(self.columns):
+            command = (lambda c=col: on_sort(c)) if on_sort else ''
+            self.tree.heading(col, text=col, command=command)
+            self.tree.column(col, width=widths[i] if widths else 100,
+                             anchor=anchors[i] if anchors else 'w', minwidth=50)
+        self.tree.tag_configure('selected', background='#3498db', foreground='white')
+
+        self.row_height = int(ttk.Style().lookup(style, 'rowheight') or 20)
+
+        self.scroll_y = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scroll_x = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.scroll_x.set)
+
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self.scroll_y.grid(row=0, column=1, sticky='ns')
+        self.scroll_x.grid(row=1, column=0, sticky='ew')
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<Button-1>', self._on_click)
+        self.tree.bind('<MouseWheel>', self._on_wheel)
+        self.tree.bind('<Button-4>', lambda e: self._scroll_by(-3))
+        self.tree.bind('<Button-5>', lambda e: self._scroll_by(3))
+        for key, step in (('<Up>', -1), ('<Down>', 1)):
+            self.tree.bind(key, lambda e, s=step: self._move_cursor(s, e))
+        self.tree.bind('<Prior>', lambda e: self._move_cursor(-self.page_size(), e))
+        self.tree.bind('<Next>', lambda e: self._move_cursor(self.page_size(), e))
+        self.tree.bind('<Home>', lambda e: self._move_cursor(-len(self.rows), e))
+        self.tree.bind('<End>', lambda e: self._move_cursor(len(self.rows), e))
+        self.tree.bind('<Control-a>', self._select_all)
+
+    # Model
+
+    def set_rows(self, rows):
+        """Show ``rows`` (row ids in display order). The list is used as-is, not copied.
+
+        Rows may be appended to the list in place followed by refresh(); any
+        other change to the list must go through set_rows again.
+        """
+        self.rows = rows
+        self._positions = {}
+        if self.selected:
+            present = self.selected.intersection(rows)
+            if present != self.selected:
+                self.selected = present
+                self.event_generate('<<TableSelect>>')
+        self.refresh()
+
+    def refresh(self):
+        """Re-render the visible window, e.g. after rows were appended or their values changed"""
+        self.top = max(0, min(self.top, len(self.rows) - self.page_size()))
+        self._render()
+
+    def position(self, row_id):
+        """View position of ``row_id``, or None if it is not shown"""
+        positions = self._positions
+        if len(positions) < len(self.rows):
+            for index in range(len(positions), len(self.rows)):
+                positions[self.rows[index]] = index
+        return positions.get(row_id)
+
+    def selection(self):
+        """Selected row ids in display order"""
+        if not self.selected:
+            return []
+        if len(self.selected) == 1:
+            return list(self.selected)
+        return [row_id for row_id in self.rows if row_id in self.selected]
+
+    def clear_selection(self):
+        if self.selected:
+            self.selected = set()
+            self._render()
+            self.event_generate('<<TableSelect>>')
+
+    def see(self, index):
+        """Scroll so the row at view position ``index`` is visible"""
+        page = self.page_size()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + page:
+            self.top = index - page + 1
+        self.refresh()
+
+    def mark_sorted(self, column, reverse):
+        """Show a sort arrow on ``column``'s heading"""
+        for col in self.columns:
+            text = col + ((' \u25bc' if reverse else ' \u25b2') if col == column else '')
+            self.tree.heading(col, text=text)
+
+    # Rendering
+
+    def page_size(self):
+        """Number of rows that fit in the widget"""
+        height = self.tree.winfo_height()
+        if height <= 1:
+            return max(1, len(self._slots))
+        return max(1, (height - self._heading_height()) // self.row_height)
+
+    def _heading_height(self):
+        if self._slots:
+            bbox = self.tree.bbox(self._slots[0])
+            if bbox:
+                return bbox[1]
+        return self.row_height
+
+    def _render(self):
+        page = self.page_size()
+        while len(self._slots) < page:
+            slot = self.tree.insert('', 'end', values=())
+            self.tree.detach(slot)
+            self._slots.append(slot)
+
+        # Slots [0, _attached) are in the tree, in order; the rest are detached
+        shown = max(0, min(page, len(self.rows) - self.top))
+        for i in range(shown):
+            row_id = self.rows[self.top + i]
+            tags = ('selected',) if row_id in self.selected else ()
+            self.tree.item(self._slots[i], values=self.get_values(row_id), tags=tags)
+        for i in range(self._attached, shown):
+            self.tree.move(self._slots[i], '', i)
+        if shown < self._attached:
+            self.tree.detach(*self._slots[shown:self._attached])
+        self._attached = shown
+
+        total = len(self.rows)
+        if total:
+            self.scroll_y.set(self.top / total, min(1.0, (self.top + page) / total))
+        else:
+            self.scroll_y.set(0.0, 1.0)
+        if self.on_end is not None and not self._end_pending and self.top + page >= total:
+            self._end_pending = True
+            self.after_idle(self._reached_end)
+
+    def _reached_end(self):
+        self._end_pending = False
+        self.on_end()
+
+    def _on_resize(self, event=None):
+        self.refresh()
+
+    # Scrolling
+
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units'|'pages')"""
+        if not args:
+            return
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * len(self.rows))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            self.top += step * (self.page_size() if args[2] == 'pages' else 1)
+        self.refresh()
+
+    def _scroll_by(self, rows):
+        self.top += rows
+        self.refresh()
+        return 'break'
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_by(-3 * delta)
+
+    # Selection
+
+    def _index_at(self, y):
+        slot = self.tree.identify_row(y)
+        if not slot or slot not in self._slots[:self._attached]:
+            return None
+        index = self.top + self._slots.index(slot)
+        return index if index < len(self.rows) else None
+
+    def _on_click(self, event):
+        if self.tree.identify_region(event.x, event.y) not in ('cell', 'tree'):
+            return None
+        self.tree.focus_set()
+        index = self._index_at(event.y)
+        if index is None:
+            return 'break'
+        self._select_index(index, event)
+        return 'break'
+
+    def _move_cursor(self, step, event):
+        if not self.rows:
+            return 'break'
+        current = self.position(self.cursor) if self.cursor in self.selected else self.top - (step > 0)
+        index = max(0, min(len(self.rows) - 1, current + step))
+        self._select_index(index, event)
+        self.see(index)
+        return 'break'
+
+    def _select_index(self, index, event):
+        row_id = self.rows[index]
+        shift = event is not None and event.state & 0x0001
+        control = event is not None and event.state & 0x0004
+        if shift and self._anchor in self.selected:
+            start = self.position(self._anchor)
+            low, high = sorted((start, index))
+            self.selected = set(self.rows[low:high + 1])
+        elif control:
+            self.selected ^= {row_id}
+            self._anchor = row_id
+        else:
+            self.selected = {row_id}
+            self._anchor = row_id
+        self.cursor = row_id
+        self._render()
+        self.event_generate('<<TableSelect>>')
+
+    def _select_all(self, event=None):
+        self.selected = set(self.rows)
+        self._render()
+        self.event_generate('<<TableSelect>>')
+        return 'break'